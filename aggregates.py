@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from data_loader import compute_yield
+
+# --- 1. CUBE LAYOUT ---
+
+# Index levels of the finest-grained table; every coarser table is a prefix roll-up of it
+DISTRICT_KEYS = ['state_name', 'crop', 'crop_year', 'district_name']
+CROP_KEYS = ['state_name', 'crop', 'crop_year']
+RAINFALL_KEYS = ['state_name', 'crop_year']
+
+# Additive measures only, so any slice can be re-aggregated exactly:
+#   production / area          -> plain sums
+#   rainfall_sum / n_rainfall  -> mean annual rainfall over all rows (Q1)
+#   n_cropped                  -> rows with area > 0 (the rows the yield trends are built from)
+#   yield_sum / n_yield        -> mean per-row yield (production / area) over cropped rows (Q3/Q4)
+#   cropped_rainfall_sum / n_cropped_rainfall -> mean rainfall over cropped rows (Q3/Q4)
+MEASURE_COLUMNS = [
+    'production', 'area', 'rainfall_sum', 'n_rainfall', 'n_cropped',
+    'yield_sum', 'n_yield', 'cropped_rainfall_sum', 'n_cropped_rainfall',
+]
+
+
+class AggregateCube:
+    # Precomputed aggregate tables with sorted MultiIndexes, built once per dataset version
+    #   district_table: (state_name, crop, crop_year, district_name) -> crop_type + measures  (Q2)
+    #   crop_table:     (state_name, crop, crop_year)                -> crop_type + measures  (Q1, Q3, Q4)
+    #   rainfall_table: (state_name, crop_year)                      -> rainfall measures     (Q1)
+    def __init__(self, district_table, crop_table, rainfall_table, latest_year, latest_yield_year):
+        self.district_table = district_table
+        self.crop_table = crop_table
+        self.rainfall_table = rainfall_table
+        self.latest_year = latest_year
+        self.latest_yield_year = latest_yield_year
+        self.sensitivity = {}  # (window start year, level) -> climate sensitivity table (see correlation.py)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. CUBE CONSTRUCTION ---
+# ---------------------------------------------------------------------------------------------------
+
+def row_measures(df):
+    # Per-row additive measures (float64 accumulators regardless of the stored dtypes)
+    production = df['production'].astype('float64')
+    area = df['area'].astype('float64')
+    rainfall = df['annual_rainfall_mm'].astype('float64')
+    cropped = (area > 0).to_numpy()
+    # 'yield' is materialized by the loader (NaN where area <= 0); derive it only for frames built elsewhere
+    yield_values = df['yield'].to_numpy(dtype='float64') if 'yield' in df.columns else compute_yield(production, area)
+    cropped_rainfall = cropped & rainfall.notna().to_numpy()
+    return pd.DataFrame({
+        'production': production.fillna(0).to_numpy(),
+        'area': area.fillna(0).to_numpy(),
+        'rainfall_sum': rainfall.fillna(0).to_numpy(),
+        'n_rainfall': rainfall.notna().to_numpy().astype('int64'),
+        'n_cropped': cropped.astype('int64'),
+        'yield_sum': np.nan_to_num(yield_values, nan=0.0),
+        'n_yield': (~np.isnan(yield_values)).astype('int64'),
+        'cropped_rainfall_sum': np.where(cropped_rainfall, rainfall.to_numpy(), 0.0),
+        'n_cropped_rainfall': cropped_rainfall.astype('int64'),
+    }, index=df.index)
+
+def roll_up(table, keys):
+    # Re-aggregates a finer table onto a prefix of its index levels (crop_type is constant per crop)
+    grouped = table.groupby(level=keys, observed=True, sort=True)
+    rolled = grouped[MEASURE_COLUMNS].sum()
+    if 'crop_type' in table.columns and 'crop' in keys:
+        rolled.insert(0, 'crop_type', grouped['crop_type'].first())
+    return rolled
+
+def district_measures(df):
+    # District-level measure table (the finest cube level) for a frame of master rows
+    measures = row_measures(df)
+    for col in DISTRICT_KEYS:
+        measures[col] = df[col]
+    district_table = measures.groupby(DISTRICT_KEYS, observed=True, sort=True)[MEASURE_COLUMNS].sum()
+
+    crop_types = df[['crop', 'crop_type']].drop_duplicates('crop').set_index('crop')['crop_type']
+    district_table.insert(0, 'crop_type', district_table.index.get_level_values('crop').map(crop_types))
+    return district_table.sort_index()
+
+def merge_district_tables(tables):
+    # Sums district tables that may share keys; valid because every measure is additive
+    combined = pd.concat(tables)
+    grouped = combined.groupby(level=DISTRICT_KEYS, observed=True, sort=True)
+    merged = grouped[MEASURE_COLUMNS].sum()
+    merged.insert(0, 'crop_type', grouped['crop_type'].first())
+    return merged
+
+def assemble_cube(district_table, crop_table, rainfall_table):
+    # Wraps the three tables in a cube, deriving the latest (yield) years from them. They are kept as
+    # Python ints: crop_year is int16 in the cache, and int16 window arithmetic overflows for a large n_years
+    years = rainfall_table.index.get_level_values('crop_year')
+    latest_year = int(years.max()) if len(years) else None
+    cropped_years = crop_table.index.get_level_values('crop_year')[crop_table['n_cropped'].to_numpy() > 0]
+    latest_yield_year = int(cropped_years.max()) if len(cropped_years) else latest_year
+    return AggregateCube(district_table, crop_table, rainfall_table, latest_year, latest_yield_year)
+
+def cube_from_district_table(district_table):
+    # Rolls a district table up into the full cube
+    district_table = district_table.sort_index()
+    crop_table = roll_up(district_table, CROP_KEYS)
+    rainfall_table = roll_up(crop_table, RAINFALL_KEYS)[['rainfall_sum', 'n_rainfall']]
+    return assemble_cube(district_table, crop_table, rainfall_table)
+
+def build_aggregate_cube(df):
+    # Single pass over the master dataset; every question is answered from the resulting tables
+    return cube_from_district_table(district_measures(df))
+
+def table_partitions(table):
+    # Distinct (state_name, crop_year) partitions present in a cube table
+    return pd.MultiIndex.from_arrays([
+        table.index.get_level_values('state_name').astype(str),
+        table.index.get_level_values('crop_year').astype('int64'),
+    ], names=RAINFALL_KEYS)
+
+def replace_partitions(cube, partitions, district_table):
+    # Swaps in fresh district rows for the given (state, year) partitions. Only those partitions are
+    # rolled up again; every other row of the cube is carried over unchanged.
+    partitions = pd.MultiIndex.from_tuples(list(partitions), names=RAINFALL_KEYS) if not isinstance(partitions, pd.MultiIndex) else partitions
+    if not len(partitions): return cube
+    fresh_crops = roll_up(district_table, CROP_KEYS)
+    fresh_rainfall = roll_up(fresh_crops, RAINFALL_KEYS)[['rainfall_sum', 'n_rainfall']]
+    tables = []
+    for old, fresh in ((cube.district_table, district_table), (cube.crop_table, fresh_crops), (cube.rainfall_table, fresh_rainfall)):
+        kept = old[~table_partitions(old).isin(partitions)]
+        tables.append(pd.concat([kept, fresh]).sort_index() if len(fresh) else kept)
+    return assemble_cube(*tables)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. SLICING HELPERS ---
+# ---------------------------------------------------------------------------------------------------
+
+def slice_index(table, key):
+    # Binary-search slice of a sorted MultiIndex table; a missing key yields an empty frame
+    try:
+        rows = table.loc[key, :]
+    except KeyError:
+        return table.iloc[0:0]
+    if isinstance(rows, pd.Series):
+        # A fully specified key selects a single row; keep the frame shape for callers
+        return table.loc[[key]]
+    return rows
+
+def year_window(rows, start_year):
+    # Keeps the rows from start_year onwards of a slice still indexed by 'crop_year'
+    return rows[rows.index.get_level_values('crop_year') >= start_year]
+
+def trend_from_measures(rows):
+    # Per-year average yield and rainfall over cropped rows, re-aggregated from the cube measures
+    # (years without any cropped rows are dropped after the groupby, so the slice itself is never copied)
+    if rows.empty: return pd.DataFrame()
+    yearly = rows.groupby(level='crop_year', sort=True)[MEASURE_COLUMNS].sum()
+    yearly = yearly[yearly['n_cropped'] > 0]
+    if yearly.empty: return pd.DataFrame()
+    trend_df = pd.DataFrame({
+        'crop_year': yearly.index.to_numpy(),
+        'average_yield': (yearly['yield_sum'] / yearly['n_yield'].replace(0, np.nan)).to_numpy(),
+        'average_rainfall': (yearly['cropped_rainfall_sum'] / yearly['n_cropped_rainfall'].replace(0, np.nan)).to_numpy(),
+    })
+    return trend_df
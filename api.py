@@ -0,0 +1,189 @@
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs
+
+from metrics import QuestionMetrics, profiled, stage, tracing
+from query_engine import DEFAULT_QUESTION_PARAMS, QUESTION_FUNCTIONS, LiveCube, available_options, default_data_source, to_jsonable, year_span
+from result_cache import ResultCache, cached_question, warm_cache
+
+# Lightweight ASGI HTTP/JSON API over the headless query engine (no web framework required).
+# Queries run in a process pool; every worker loads the aggregate cube once at start-up and
+# refreshes it when the dataset version changes (e.g. after `python ingest.py add ...`).
+#
+#   uvicorn api:app --host 0.0.0.0 --port 8000
+#
+#   GET /health
+#   GET /metrics   (p50/p95 latency, stage breakdown and cache hit rate per question; SAMARTH_PROFILE adds profiles)
+#   GET /options
+#   GET /q1?state_x=Karnataka&state_y=Maharashtra&n_years=10&crop_type=Oilseed&m_crops=3
+#   GET /q2?state_x=Uttar Pradesh&state_y=Maharashtra&crop_z=Rice
+#   GET /q3?state_name=Gujarat&crop_type=Oilseed&n_years=10
+#   GET /q4?region_y=Uttar Pradesh&crop_a=Maize&crop_b=Rice&n_years=10
+
+# --- 1. CONFIGURATION ---
+
+API_DATA_FILE = os.environ.get('SAMARTH_DATA_FILE') or default_data_source()
+API_WORKERS = int(os.environ.get('SAMARTH_API_WORKERS', os.cpu_count() or 1))
+
+# Route -> (question id, {query parameter: type}); parameters are passed by keyword
+QUESTION_ROUTES = {
+    '/q1': ('q1', {'state_x': str, 'state_y': str, 'n_years': int, 'crop_type': str, 'm_crops': int}),
+    '/q2': ('q2', {'state_x': str, 'state_y': str, 'crop_z': str}),
+    '/q3': ('q3', {'state_name': str, 'crop_type': str, 'n_years': int}),
+    '/q4': ('q4', {'region_y': str, 'crop_a': str, 'crop_b': str, 'n_years': int}),
+}
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. PROCESS POOL WORKERS ---
+# ---------------------------------------------------------------------------------------------------
+
+def json_question(question):
+    # JSON encoding is this API's render stage; profiled() flags (and optionally profiles) cache misses
+    def run(cube, **params):
+        result = question(cube, **params)
+        with stage('render'):
+            return to_jsonable(result)
+    return profiled(run)
+
+JSON_QUESTION_FUNCTIONS = {name: json_question(question) for name, question in QUESTION_FUNCTIONS.items()}
+
+_worker_live_cube = None
+_worker_results = ResultCache(name='results')  # per-process; holds JSON-ready payloads
+
+def init_worker(data_file):
+    # Runs once per pool process: load the cube so each query is a pure in-memory lookup,
+    # then warm the result cache with the UI defaults
+    global _worker_live_cube
+    _worker_live_cube = LiveCube(data_file)
+    worker_cube()
+
+def worker_cube():
+    # Current (cube, version) of this worker; a new dataset version (one cheap version check per query)
+    # reloads the changed partitions and resets the result cache
+    cube, version, changed = _worker_live_cube.refresh()
+    if changed:
+        _worker_results.set_dataset_version(version)
+        warm_cache(_worker_results, cube, JSON_QUESTION_FUNCTIONS, DEFAULT_QUESTION_PARAMS)
+    return cube, version
+
+def run_question(route, query_string):
+    # Executes one question inside a worker; returns a JSON-safe payload and the request's trace.
+    # Parameters are validated here, where the cube (and so the dataset's year span) is known.
+    question, spec = QUESTION_ROUTES[route]
+    cube, version = worker_cube()
+    params = parse_params(query_string, spec, max_n_years=max(1, year_span(cube)))
+    with tracing(question) as trace:
+        payload = cached_question(_worker_results, cube, question, JSON_QUESTION_FUNCTIONS, version, **params)
+    return payload, trace
+
+def run_options():
+    return to_jsonable(available_options(worker_cube()[0]))
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. REQUEST HANDLING ---
+# ---------------------------------------------------------------------------------------------------
+
+class BadRequest(ValueError):
+    pass
+
+def parse_params(query_string, spec, max_n_years=None):
+    # Validates and coerces the query string against a route's parameter spec
+    raw = parse_qs(query_string.decode('latin-1'), keep_blank_values=True)
+    missing = [name for name in spec if not raw.get(name)]
+    if missing:
+        raise BadRequest(f"Missing query parameter(s): {', '.join(missing)}")
+    params = {}
+    for name, cast in spec.items():
+        try:
+            params[name] = cast(raw[name][-1])
+        except ValueError:
+            raise BadRequest(f"Query parameter '{name}' must be of type {cast.__name__}") from None
+    for name in ('n_years', 'm_crops'):
+        if name in params and params[name] < 1:
+            raise BadRequest(f"Query parameter '{name}' must be >= 1")
+    if max_n_years is not None and params.get('n_years', 0) > max_n_years:
+        raise BadRequest(f"Query parameter 'n_years' must be <= {max_n_years} (the dataset's year span)")
+    return params
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+class QueryAPI:
+    # ASGI application; the process pool lives for the duration of the server (lifespan events)
+    def __init__(self, data_file=API_DATA_FILE, workers=API_WORKERS):
+        self.data_file = data_file
+        self.workers = workers
+        self.pool = None
+        self.metrics = QuestionMetrics()
+
+    def start(self):
+        if self.pool is None:
+            os.stat(self.data_file)  # fail fast (FileNotFoundError) instead of breaking the pool in its initializer
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker, initargs=(self.data_file,))
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.handle_lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.handle_http(scope, send)
+
+    async def handle_lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    self.start()
+                except Exception as exc:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(exc)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle_http(self, scope, send):
+        if scope['method'] != 'GET':
+            return await send_json(send, 405, {'error': 'Only GET is supported'})
+        path = scope['path'].rstrip('/') or '/'
+        if path == '/health':
+            return await send_json(send, 200, {'status': 'ok'})
+        if path == '/metrics':
+            return await send_json(send, 200, self.metrics.summary())
+        loop = asyncio.get_running_loop()
+        try:
+            self.start()
+            if path == '/options':
+                payload = await loop.run_in_executor(self.pool, run_options)
+            elif path in QUESTION_ROUTES:
+                started = time.perf_counter()
+                payload, trace = await loop.run_in_executor(self.pool, run_question, path, scope.get('query_string', b''))
+                trace.seconds = time.perf_counter() - started  # end to end, including the pool round trip
+                self.metrics.record(trace)
+            else:
+                return await send_json(send, 404, {'error': f"Unknown route '{path}'"})
+        except BadRequest as exc:
+            return await send_json(send, 400, {'error': str(exc)})
+        except FileNotFoundError:
+            return await send_json(send, 503, {'error': f"Data file '{self.data_file}' not found"})
+        await send_json(send, 200, payload)
+
+
+app = QueryAPI()
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run('api:app', host=os.environ.get('SAMARTH_API_HOST', '127.0.0.1'), port=int(os.environ.get('SAMARTH_API_PORT', '8000')))
@@ -1,90 +1,103 @@
-import os
 import pandas as pd
-import numpy as np
 import streamlit as st
 
+from data_loader import DATA_FILE
+from query_engine import (DEFAULT_QUESTION_PARAMS, QUESTION_FUNCTIONS, LiveCube, available_options, dataset_version, default_data_source,
+                          question_3_chart, question_4_chart)
+from metrics import QuestionMetrics, profiled, stage
+from result_cache import ResultCache, cached_question, warm_cache
+
 # --- 1. CONFIGURATION AND DATA LOADING ---
 
-DATA_FILE = "Combined_Agri_and_Rainfall.csv"
+@st.cache_resource
+def get_result_caches():
+    # Process-wide caches shared by every session: structured results and rendered markdown
+    return ResultCache(name='results'), ResultCache(name='markdown')
+
+@st.cache_resource
+def get_question_metrics():
+    # Process-wide latency / stage / cache-hit statistics (SAMARTH_PROFILE enables cProfile/tracemalloc)
+    return QuestionMetrics()
+
+@st.cache_resource(max_entries=1)
+def get_live_cube(data_source):
+    # Shared across all sessions and reruns; holds the cube of the current data source
+    # Every question is answered from the precomputed aggregates; the row-level frame is not kept
+    return LiveCube(data_source)
+
+@st.cache_resource(max_entries=1)
+def prepare_dataset(data_version, _agg_cube):
+    # Runs once per dataset version: invalidates both result caches, then precomputes the UI defaults
+    for cache in get_result_caches():
+        cache.set_dataset_version(data_version)
+    warm_cache(get_result_caches()[0], _agg_cube, QUESTION_FUNCTIONS, DEFAULT_QUESTION_PARAMS)
+    return available_options(_agg_cube)
+
+def load_app_data():
+    # data_version (store version, or CSV size + mtime) is checked on every rerun, so new ingestions
+    # are picked up without restarting the app; a store only reloads the partitions that changed
+    data_source = default_data_source()
+    live_cube = get_live_cube(data_source)
+    data_version = dataset_version(data_source)
+    if live_cube.cube is None or data_version != live_cube.version:
+        with st.spinner("Loading master dataset..."):
+            live_cube.refresh(data_version)
+    agg_cube, data_version = live_cube.snapshot()
+    return agg_cube, data_version, prepare_dataset(data_version, agg_cube)
 
 # Attempt to load the data using the simple filename
 try:
-    # CRITICAL: This assumes the CSV is in the same directory as app.py
-    master_df = pd.read_csv(DATA_FILE)
-    
-except FileNotFoundError:
-    # If the file is not found, display a fatal error message and stop the app.
-    st.error(f"FATAL ERROR: Data file '{DATA_FILE}' not found. Please ensure it is in the same folder as app.py")
+    # CRITICAL: This assumes the CSV (or the samarth_store directory) is in the same directory as app.py
+    agg_cube, data_version, ui_options = load_app_data()
+    result_cache, markdown_cache = get_result_caches()
+    question_metrics = get_question_metrics()
+
+except FileNotFoundError as exc:
+    # If the data source (the CSV, or the store once seeded) is missing or empty, display a fatal error message and stop the app.
+    st.error(f"FATAL ERROR: Data source '{default_data_source()}' could not be loaded ({exc}). "
+             f"Please ensure '{DATA_FILE}' (or a seeded samarth_store directory) is in the same folder as app.py")
     st.stop() 
 
-# --- 2. GLOBAL MAPPING AND VARIABLES ---
-
-# Define Query Function for Top crops
-crop_category_map = {
-    'Rice': 'Cereal', 'Wheat': 'Cereal', 'Maize': 'Cereal', 'Jowar': 'Cereal', 'Bajra': 'Cereal', 
-    'Ragi': 'Cereal', 'Barley': 'Cereal', 'Total Foodgrain': 'Aggregate', 'Millets Total': 'Aggregate',
-    'Arhar': 'Pulse', 'Moong': 'Pulse', 'Black Gram': 'Pulse', 'Lentil': 'Pulse', 'Gram': 'Pulse', 
-    'Peas & Beans': 'Pulse', 'Other Pulses': 'Pulse', 'Pulses Total': 'Aggregate',
-    'Groundnut': 'Oilseed', 'Rapeseed & Mustard': 'Oilseed', 'Soyabean': 'Oilseed', 'Sunflower': 'Oilseed', 
-    'Oilseeds Total': 'Aggregate', 'Castor Seed': 'Oilseed', 'Sesamum': 'Oilseed', 'Niger Seed': 'Oilseed', 
-    'Linseed': 'Oilseed', 'Sugarcane': 'Commercial', 'Cotton': 'Commercial', 'Jute': 'Commercial', 
-    'Sannhamp': 'Commercial', 'Potato': 'Vegetable', 'Onion': 'Vegetable', 'Tomato': 'Vegetable', 
-    'Cabbage': 'Vegetable', 'Brinjal': 'Vegetable', 'Garlic': 'Vegetable', 'Bhindi': 'Vegetable', 
-    'Peas': 'Vegetable', 'Other Vegetables': 'Vegetable', 'Mango': 'Fruit', 'Banana': 'Fruit', 
-    'Citrus Fruit': 'Fruit', 'Other Fruits': 'Fruit', 'Papaya': 'Fruit', 'Watermelon': 'Fruit',
-    'Turmeric': 'Spice', 'Ginger': 'Spice', 'Chillies': 'Spice', 'Black Pepper': 'Spice', 'Cardamom': 'Spice',
-}
-
-# Apply the mapping to create the new 'crop_type' column
-master_df['crop_type'] = master_df['crop'].map(crop_category_map)
-
-# Define global lists for UI selection
-ALL_STATES = sorted(master_df['state_name'].unique())
-ALL_CROP_TYPES = sorted(master_df['crop_type'].dropna().unique())
-ALL_CROPS = sorted(master_df['crop'].dropna().unique())
-MAX_YEAR_SPAN = master_df['crop_year'].max() - master_df['crop_year'].min()
-ALL_SINGLE_CROPS = sorted([c for c in master_df['crop'].unique() if c not in ['Oilseeds Total',' Total Foodgrain', 'Pulses Total']])
+# --- 2. GLOBAL VARIABLES ---
+
+# Define global lists for UI selection ('crop_type' is added by the loader from crop_category_map)
+ALL_STATES = ui_options['states']
+ALL_CROP_TYPES = ui_options['crop_types']
+ALL_CROPS = ui_options['crops']
+MAX_YEAR_SPAN = ui_options['max_year_span']
+ALL_SINGLE_CROPS = ui_options['single_crops']
+
+# Question functions flagged (and, when enabled, profiled) on a cache miss
+PROFILED_QUESTION_FUNCTIONS = {name: profiled(question) for name, question in QUESTION_FUNCTIONS.items()}
+
+
+def answer_with_cache(question, renderer, **params):
+    # Structured result and its rendered markdown, each served from its own cache when possible.
+    # Both are keyed on this run's cube version, so answers from a cube another session has replaced are never stored.
+    result = cached_question(result_cache, agg_cube, question, PROFILED_QUESTION_FUNCTIONS, data_version, **params)
+    with stage('render'):
+        return result, markdown_cache.get_or_compute(question, params, lambda: renderer(result), data_version)
 
 
 # ---------------------------------------------------------------------------------------------------
-# --- 3. CORE ANALYTICAL FUNCTIONS ---
+# --- 3. ANSWER RENDERING (analytics live in query_engine.py) ---
 # ---------------------------------------------------------------------------------------------------
 
-def compare_recent_avg_rainfall(df,state_list,n_years):
-    # Calculates the average annual rainfall for a list of states
-    latest_year = df['crop_year'].max()
-    start_year = latest_year - n_years + 1
-    filtered_df = df[(df['state_name'].isin(state_list)) & (df['crop_year'] >= start_year )].copy()
-    state_annual_rainfall = filtered_df.groupby(['state_name','crop_year'])['annual_rainfall_mm'].mean().reset_index()
-    avg_rainfall_result = state_annual_rainfall.groupby("state_name")['annual_rainfall_mm'].mean().round(2)
-    return avg_rainfall_result.to_dict()
-
-def get_top_m_crops(df,state_list, crop_type , n_years, M):
-    # Identifies the top M crops (by production) of a specified crop_type
-    latest_year = df['crop_year'].max()
-    start_year = latest_year - n_years + 1
-    filtered_df = df[(df['state_name'].isin(state_list)) & (df['crop_type'] == crop_type) & (df['crop_year'] >= start_year)]
-    production_summary = filtered_df.groupby(['state_name','crop'])['production'].sum().reset_index()
-    top_crops_by_state = {}
-    for state in state_list:
-        state_data = production_summary[production_summary['state_name'] == state]
-        top_m = state_data.sort_values(by='production',ascending = False).head(M)['crop'].tolist()
-        top_crops_by_state[state] = top_m
-    return top_crops_by_state
-
-def answer_question_1(df,state_x , state_y,n_years,crop_type_c,m_crops):
+def answer_question_1(result):
     # Synthesizes the answer for the first complex question (Q1)
-    rainfall_results = compare_recent_avg_rainfall(df, state_list=[state_x,state_y], n_years= n_years)
-    top_crop_results = get_top_m_crops(df, state_list=[state_x,state_y], crop_type = crop_type_c, n_years = n_years, M = m_crops)
-    rainfall_x = rainfall_results.get(state_x,'N/A')
-    rainfall_y = rainfall_results.get(state_y,'N/A')
-    crops_x = ', '.join(top_crop_results.get(state_x,['N/A']))
-    crops_y = ', '.join(top_crop_results.get(state_y,['N/A']))
+    state_x, state_y = result.states
+    n_years, crop_type_c, m_crops = result.n_years, result.crop_type, result.m_crops
+    rainfall_x = result.average_rainfall[state_x]
+    rainfall_y = result.average_rainfall[state_y]
+    crops_x = ', '.join(result.top_crops[state_x] or ['N/A'])
+    crops_y = ', '.join(result.top_crops[state_y] or ['N/A'])
     response = f"--- Analysis for Last {n_years} Years --\n\n"
     response += f"1.Average Annual Rainfall Comparison: \n"
-    response += f"  - **{state_x}:** {rainfall_x} mm\n"
-    response += f"  - **{state_y}:** {rainfall_y} mm\n"
-    if rainfall_x > rainfall_y:
+    response += f"  - **{state_x}:** {rainfall_x if rainfall_x is not None else 'N/A'} mm\n"
+    response += f"  - **{state_y}:** {rainfall_y if rainfall_y is not None else 'N/A'} mm\n"
+    if rainfall_x is None or rainfall_y is None:
+        higher_state = "Neither"
+    elif rainfall_x > rainfall_y:
         higher_state = state_x
     elif rainfall_y > rainfall_x:
         higher_state = state_y
@@ -97,59 +110,24 @@ def answer_question_1(df,state_x , state_y,n_years,crop_type_c,m_crops):
     response += f"**Data Source Citattion:** All data synthesized from the integrated master dataset from the Ministry of Agriculture & Farmer Welfate and the India Meteorlogical Department (IMD) from the data.gov.in portal."
     return response
 
-def get_max_min_district_production(df,state_x,state_y,crop_z):
-    # Identifies the district with the highest/lowest production (Q2)
-    latest_year = df['crop_year'].max()
-    filtered_df = df[(df['crop_year'] == latest_year) & (df['crop'] == crop_z)].copy()
-    district_summary = filtered_df.groupby(['state_name','district_name'])['production'].sum().reset_index()
-    df_x = district_summary[district_summary['state_name'] == state_x]
-    if df_x.empty:
-        max_district, max_production = 'N/A', 0.0
-    else:
-        max_row = df_x.loc[df_x['production'].idxmax()]
-        max_district, max_production = max_row['district_name'], max_row['production']
-    df_y = district_summary[district_summary['state_name'] == state_y]
-    if df_y.empty:
-        min_district, min_production = 'N/A', 0.0
-    else:
-        df_y_producers = df_y[df_y['production'] > 0]
-        min_row = df_y_producers.loc[df_y['production'].idxmin()] if not df_y_producers.empty else df_y.loc[df_y['production'].idxmin()]
-        min_district, min_production = min_row['district_name'], min_row['production']
-    return {'latest_year' : latest_year, state_x : {'district': max_district, 'production': max_production}, state_y : {'district': min_district, 'production': min_production}}
-
-def answer_question_2(production_dict, state_x, state_y, crop_z):
+def answer_question_2(result):
     # Synthesizes the answer for Q2
-    latest_year = production_dict['latest_year']
-    x_data, y_data = production_dict[state_x], production_dict[state_y]
-    max_district, max_production = x_data['district'], x_data['production']
-    min_district, min_production = y_data['district'], y_data['production']
+    latest_year, crop_z = result.latest_year, result.crop
+    state_x, state_y = result.max_state, result.min_state
+    max_district, max_production = result.max_district or 'N/A', result.max_production
+    min_district, min_production = result.min_district or 'N/A', result.min_production
     response = f"--- District Production Analysis for {crop_z} (Latest Year: {latest_year}) --\n\n"
     response += f"1. Highest Production District in {state_x}: \n - The district with the maximum production of {crop_z} was **{max_district}** (Total Production: {max_production:,.2f} units).\n\n"
     response += f"2. Lowest Production District in {state_y}: \n - The district with the minimum production of {crop_z} was **{min_district}** (Total Production: {min_production:,.2f} units). \n\n"
-    production_difference = max_production - min_production
+    production_difference = result.production_difference
     response += f"3. Comparative Summary: \n  - Th highest producing district in {state_x} produced approximately ** {production_difference:,.2f}** more units than the lowest producing district in {state_y} in {latest_year}."
     return response
 
-def get_yield_and_rainfall_trend(df, state_name, crop_type, n_years):
-    # Calculates the annual average crop yield and rainfall (Q3/Q4 helper)
-    df_with_yield = df[df['area'] > 0].copy()
-    df_with_yield['yield'] = df_with_yield['production'] / df_with_yield['area']
-    latest_year = df_with_yield['crop_year'].max()
-    start_year = latest_year - n_years + 1
-    filtered_df = df_with_yield[(df_with_yield['state_name'] == state_name) & (df_with_yield['crop_type'] == crop_type) & (df_with_yield['crop_year'] >= start_year)]
-    if filtered_df.empty: return pd.DataFrame()
-    trend_df = filtered_df.groupby('crop_year').agg(average_yield = ('yield','mean'), average_rainfall = ('annual_rainfall_mm','mean')).reset_index()
-    return trend_df
-
-def calculate_correlation(trend_df, metric_1 = 'average_yield', metric_2 = 'average_rainfall'):
-    # Calculates the Pearson correlation coefficient
-    if trend_df.empty or len(trend_df) < 2: return np.nan
-    correlation = trend_df[metric_1].corr(trend_df[metric_2])
-    return correlation
-
-def answer_question_3(trend_df, correlation_value , state_name, crop_type):
-    # Synthesizes the answer and plots for Q3
-    if trend_df.empty: return f"Analysis failed: No data found for {crop_type} in {state_name} over the requested period."
+def answer_question_3(result):
+    # Synthesizes the answer for Q3 (charts are drawn by plot_question_3)
+    state_name, crop_type, correlation_value = result.state, result.label, result.correlation
+    if result.trend.empty: return f"Analysis failed: No data found for {crop_type} in {state_name} over the requested period."
+    trend_df = result.trend.to_frame()
     start_year, end_year = trend_df['crop_year'].min(), trend_df['crop_year'].max()
     corr_abs = abs(correlation_value)
     if corr_abs >= 0.7: strength = "strong"
@@ -158,42 +136,25 @@ def answer_question_3(trend_df, correlation_value , state_name, crop_type):
     if correlation_value >0: direction, impact_summary = "positive", "Suggests that higher rainfall years tend to coincide with higer average yields."
     elif correlation_value <0: direction, impact_summary = "negative", "Suggests that higher rainfall years tend to coincide with lower average yields (possibly due to flooding or excess moisture)."
     else: direction, impact_summary = "no linear", "No clear linear relationship is apparent in the historical data."
-    avg_yield, avg_rainfall = trend_df['average_yield'].mean(), trend_df['average_rainfall'].mean()
+    avg_yield, avg_rainfall = result.average_yield, result.average_rainfall
     response = f"--- Correlation Analysis: {crop_type} in {state_name} ({start_year}-{end_year}) ---\n\n"
-    
-    st.markdown("### Trend Visualization:")
-    st.line_chart(trend_df, x = 'crop_year', y='average_yield', color='#4CAF50')
-    st.caption('Annual Average Yield Trend (Units per Area)')
-    st.line_chart(trend_df, x='crop_year', y='average_rainfall', color='#0077b6')
-    st.caption('Annual Average Rainfall (mm)')
-    
+
     response += f"1. Correlation Summary:\n  - **Pearson Correlation Coefficient (Yield vs. Rainfall):**{correlation_value:.4f}\n  - **Interpretation: ** The relationship between annual average yield and annual average rainfall is {strength} and {direction}.\n\n"
     response += f"2. Apparent Impact:\n  - The data shows a {strength} {direction} correlation.{impact_summary}\n  - Over the analyzed period, the average annual yield was {avg_yield:.3f} units, corresponding to an average annual rainfall of {avg_rainfall:.2f} mm.\n\n"
     response += "3. Trend Data Summary (Visualization):\n  -Year with high yield/rainfall volatility should be further investigated (e.g., 2012, which had the lowest rainfall ({trend_df['average_rainfall'].min():.2f} mm) but an anomalous spike in yield ({trend_df['average_yield'].max():.3f})).\n"
     return response
 
-def get_single_crop_trend(df,state_name, crop_name, n_years):
-    # Calculates the annual average crop yield and rainfall for a single crop (Q4 helper)
-    df_with_yield = df[df['area'] >0].copy()
-    df_with_yield['yield'] = df_with_yield['production'] / df_with_yield['area']
-    latest_year = df_with_yield['crop_year'].max()
-    start_year = latest_year - n_years + 1
-    filtered_df = df_with_yield[(df_with_yield['state_name'] == state_name) & (df_with_yield['crop'] == crop_name) & (df_with_yield['crop_year'] >= start_year)]
-    if filtered_df.empty: return pd.DataFrame()
-    trend_df = filtered_df.groupby("crop_year").agg(average_yield = ('yield', 'mean'), average_rainfall = ('annual_rainfall_mm', 'mean')).reset_index()
-    return trend_df
-
-def answer_question_4(df, region_y, crop_a,crop_b, n_years):
-    # Synthesizes the policy arguments and plots for Q4
-    trend_a = get_single_crop_trend(df, region_y, crop_a, n_years)
-    trend_b = get_single_crop_trend(df, region_y, crop_b, n_years)
-    if trend_a.empty or trend_b.empty:
+def answer_question_4(result):
+    # Synthesizes the policy arguments for Q4 (charts are drawn by plot_question_4)
+    region_y, n_years = result.region, result.n_years
+    crop_a, crop_b = result.crop_a.label, result.crop_b.label
+    if result.crop_a.trend.empty or result.crop_b.trend.empty:
         missing_crop = ""
-        if trend_a.empty: missing_crop += f"{crop_a} "
-        if trend_b.empty: missing_crop += f"{crop_b}"
+        if result.crop_a.trend.empty: missing_crop += f"{crop_a} "
+        if result.crop_b.trend.empty: missing_crop += f"{crop_b}"
         return f"Policy analysis failed: Insufficient data (no recorded production/area) found for {missing_crop} in {region_y} over the last {n_years} years. Please select different crops or adjust the time period."
-    corr_a, avg_yield_a, avg_rainfall_a = calculate_correlation(trend_a), trend_a['average_yield'].mean(), trend_a['average_rainfall'].mean()
-    corr_b, avg_yield_b, avg_rainfall_b = calculate_correlation(trend_b), trend_b['average_yield'].mean(), trend_b['average_rainfall'].mean()
+    corr_a, avg_yield_a, avg_rainfall_a = result.crop_a.correlation, result.crop_a.average_yield, result.crop_a.average_rainfall
+    corr_b, avg_yield_b, avg_rainfall_b = result.crop_b.correlation, result.crop_b.average_yield, result.crop_b.average_rainfall
     arguments = []
     if abs(corr_a) < abs(corr_b):
         arg1 = f"**1. Enhanced Climate Resilience:** Crop **{crop_a}** exhibits a **weaker correlation ({corr_a:.2f})** between yield and rainfall than Crop **{crop_b}** ({corr_b:.2f}). This suggests that {crop_a} is inherently more resilient to rainfall variability (droughts or floods) in {region_y}, mitigating risk for farmers."
@@ -203,7 +164,7 @@ def answer_question_4(df, region_y, crop_a,crop_b, n_years):
     if avg_rainfall_a < avg_rainfall_b:
         arg2 = f"**2. Water Conservation:** The data shows that **{crop_a}** achieved its average yield (**{avg_yield_a:.2f}** units) with a lower average annual rainfall (**{avg_rainfall_a:.2f} mm**) over the last {n_years} years, whereas **{crop_b}** required **{avg_rainfall_b:.2f} mm**. This confirms **{crop_a}** is the less water-intensive choice for the region."
     else:
-        yield_per_rainfall_a, yield_per_rainfall_b = avg_yield_a / avg_rainfall_a, avg_yield_b / avg_rainfall_b
+        yield_per_rainfall_a, yield_per_rainfall_b = result.crop_a.yield_per_rainfall, result.crop_b.yield_per_rainfall
         arg2 = f"**2. Superior Water Productivity:** **{crop_a}** demonstrates higher water productivity ({yield_per_rainfall_a:.4f} yield units per mm of rainfall) compared to **{crop_b}** ({yield_per_rainfall_b:.4f}), signifying a more efficient use of available water resources in {region_y}."
     arguments.append(arg2)
     if avg_yield_a > avg_yield_b:
@@ -213,23 +174,60 @@ def answer_question_4(df, region_y, crop_a,crop_b, n_years):
     arguments.append(arg3)
     response = f"--- Policy Recommendation for Promoting {crop_a} over {crop_b} in {region_y} (Based on Last {n_years} Years) ---\n\n"
     
-    # Plotting for Q4
-    st.markdown("#### 📉 Yield Trend Comparison:")
-    yield_compare = trend_a[['crop_year', 'average_yield']].rename(columns={'average_yield': crop_a})
-    yield_compare[crop_b] = trend_b['average_yield']
-    st.line_chart(yield_compare.set_index('crop_year'), y=[crop_a, crop_b])
-    st.caption(f"Annual Average Yield Trend ({crop_a} vs. {crop_b})")
-    st.markdown("#### 🌧️ Rainfall Trend (Context):")
-    rainfall_context = trend_a[['crop_year', 'average_rainfall']].set_index('crop_year')
-    st.line_chart(rainfall_context, use_container_width=True)
-    st.caption(f"Average Annual Rainfall in {region_y}")
-    
     response += "The following are the three most compelling data-backed arguments to support the proposed policy:\n\n"
     response += "\n\n".join(arguments)
     response += "\n\n**Data Synthesis Source:** Integrated Master Dataset (Agri Prod & IMD Rainfall)."
     return response
 
 
+def plot_question_3(result):
+    # Trend plots for Q3, drawn after the text answer from the year-indexed, downsampled chart payload
+    chart = question_3_chart(result)
+    if chart.empty: return
+    st.markdown("### Trend Visualization:")
+    st.line_chart(chart[['average_yield']], color='#4CAF50')
+    st.caption('Annual Average Yield Trend (Units per Area)')
+    st.line_chart(chart[['average_rainfall']], color='#0077b6')
+    st.caption('Annual Average Rainfall (mm)')
+
+def plot_question_4(result):
+    # Trend plots for Q4; both crops are aligned on crop_year (outer join) rather than by row position
+    chart = question_4_chart(result)
+    if chart.empty: return
+    region_y, crop_a, crop_b = result.region, result.crop_a.label, result.crop_b.label
+    st.markdown("#### 📉 Yield Trend Comparison:")
+    st.line_chart(chart[[crop_a, crop_b]])
+    st.caption(f"Annual Average Yield Trend ({crop_a} vs. {crop_b})")
+    st.markdown("#### 🌧️ Rainfall Trend (Context):")
+    st.line_chart(chart[['average_rainfall']].dropna(), width='stretch')
+    st.caption(f"Average Annual Rainfall in {region_y}")
+
+def render_metrics_panel():
+    # Sidebar panel: p50/p95 latency, cache hit rate and per-stage breakdown per question type
+    summary = question_metrics.summary(caches=get_result_caches())
+    with st.sidebar.expander("⏱️ Performance Metrics", expanded=False):
+        st.caption(f"Rolling window: last {summary['window']} requests per question · profiling: {summary['profile_mode']}")
+        if not summary['questions']:
+            st.caption("No questions answered yet.")
+        for question, entry in summary['questions'].items():
+            latency = entry['latency']
+            st.markdown(f"**{question.upper()}** · {entry['requests']} requests · cache hit rate {entry['cache_hit_rate']:.0%}  \n"
+                        f"p50 {latency['p50_ms']:.2f} ms · p95 {latency['p95_ms']:.2f} ms")
+            stages = pd.DataFrame([{'stage': name, 'p50_ms': values['p50_ms'], 'p95_ms': values['p95_ms'], 'rows': values['rows']}
+                                   for name, values in entry['stages'].items()])
+            if not stages.empty:
+                st.dataframe(stages, hide_index=True, width='stretch')
+        st.markdown("**Result caches**")
+        st.dataframe(pd.DataFrame(summary['caches'])[['name', 'entries', 'hits', 'misses', 'hit_rate', 'evictions']],
+                     hide_index=True, width='stretch')
+        for question, profile in summary.get('profiles', {}).items():
+            st.markdown(f"**Last profiled {question.upper()} miss**")
+            if 'peak_bytes' in profile:
+                st.caption(f"tracemalloc peak: {profile['peak_bytes'] / 1024:.1f} KiB")
+            if 'cprofile' in profile:
+                st.code(profile['cprofile'], language=None)
+
+
 # ---------------------------------------------------------------------------------------------------
 # --- 4. STREAMLIT UI LAYOUT (MAIN APP LOGIC) ---
 # ---------------------------------------------------------------------------------------------------
@@ -248,7 +246,8 @@ with st.container():
     # State and Time Inputs
     with col1:
         state_x_input = st.selectbox('State X (Max Rainfall)', options=ALL_STATES, index=ALL_STATES.index('Karnataka') if 'Karnataka' in ALL_STATES else 0, key='q1_x')
-        state_y_input = st.selectbox('State Y (Compare Against)', options=[s for s in ALL_STATES if s != state_x_input], index=ALL_STATES.index('Maharashtra') if 'Maharashtra' in ALL_STATES else 0, key='q1_y')
+        state_y_options = [s for s in ALL_STATES if s != state_x_input]
+        state_y_input = st.selectbox('State Y (Compare Against)', options=state_y_options, index=state_y_options.index('Maharashtra') if 'Maharashtra' in state_y_options else 0, key='q1_y')
         n_years_input = st.number_input('Analyze over N Years:', min_value=1, max_value=MAX_YEAR_SPAN, value=10, key='q1_n')
 
     # Crop Type and M Inputs
@@ -258,9 +257,10 @@ with st.container():
 
 # Button to run the analysis
 if st.button('Answer Question 1: Compare Rainfall & Crops'):
-    with st.spinner(f'Synthesizing data for {state_x_input} and {state_y_input}...'):
-        final_answer = answer_question_1(master_df, state_x_input, state_y_input, n_years_input, crop_type_c_input, m_crops_input)
-        st.markdown(final_answer)
+    with st.spinner(f'Synthesizing data for {state_x_input} and {state_y_input}...'), question_metrics.observe('q1'):
+        _, final_answer = answer_with_cache('q1', answer_question_1, state_x=state_x_input, state_y=state_y_input, n_years=n_years_input, crop_type=crop_type_c_input, m_crops=m_crops_input)
+        with stage('render'):
+            st.markdown(final_answer)
 
 # ---------------------------------------------------------------------------------------------------
 
@@ -273,16 +273,17 @@ with st.container():
     
     with col1:
         state_x_q2_input = st.selectbox('State X (Max Producer)', options = ALL_STATES, key = 'q2_x', index=ALL_STATES.index('Uttar Pradesh'))
-        state_y_q2_input = st.selectbox('State Y (Min Producer)', options=[s for s in ALL_STATES if s != state_x_q2_input], key='q2_y', index= ALL_STATES.index('Maharashtra'))
+        state_y_q2_options = [s for s in ALL_STATES if s != state_x_q2_input]
+        state_y_q2_input = st.selectbox('State Y (Min Producer)', options=state_y_q2_options, key='q2_y', index=state_y_q2_options.index('Maharashtra') if 'Maharashtra' in state_y_q2_options else 0)
 
     with col2:
         crop_z_input = st.selectbox('Crop Z (Specific Crop Name):', options = ALL_CROPS, key='q2_crop', index=ALL_CROPS.index('Rice') if 'Rice' in ALL_CROPS else 0)
 
 if st.button('Answer Question 2: Compare Max/Min District'):
-    with st.spinner(f"Analyzing production data for {crop_z_input}..."):
-        production_results = get_max_min_district_production(master_df, state_x = state_x_q2_input, state_y = state_y_q2_input, crop_z = crop_z_input)
-        final_answer = answer_question_2(production_results, state_x_q2_input, state_y_q2_input, crop_z_input)
-        st.markdown(final_answer)
+    with st.spinner(f"Analyzing production data for {crop_z_input}..."), question_metrics.observe('q2'):
+        _, final_answer = answer_with_cache('q2', answer_question_2, state_x = state_x_q2_input, state_y = state_y_q2_input, crop_z = crop_z_input)
+        with stage('render'):
+            st.markdown(final_answer)
 
 # ---------------------------------------------------------------------------------------------------
 
@@ -301,15 +302,16 @@ with st.container():
         crop_type_c_q3_input = st.selectbox('Crop Type for Correlation:', options = ALL_CROP_TYPES, key = 'q3_crop_type', index=ALL_CROP_TYPES.index('Oilseed'))
 
 if st.button('Answer Question 3: Analyze Correlation'):
-    with st.spinner(f'Calculating trend and correlation for {crop_type_c_q3_input} in {state_y_q3_input}...'):
-        trend_data = get_yield_and_rainfall_trend(master_df, state_name=state_y_q3_input, crop_type=crop_type_c_q3_input, n_years = n_years_q3_input)
+    with st.spinner(f'Calculating trend and correlation for {crop_type_c_q3_input} in {state_y_q3_input}...'), question_metrics.observe('q3'):
+        trend_result, final_answer = answer_with_cache('q3', answer_question_3, state_name=state_y_q3_input, crop_type=crop_type_c_q3_input, n_years = n_years_q3_input)
         
-        if trend_data.empty:
-            st.error(f"Analysis Failed: No data found for {crop_type_c_q3_input} in {state_y_q3_input} for the requested period.")
-        else:
-            correlation_value = calculate_correlation(trend_data)
-            final_answer = answer_question_3(trend_data, correlation_value, state_y_q3_input, crop_type_c_q3_input)
-            st.markdown(final_answer)
+        with stage('render'):
+            if trend_result.trend.empty:
+                st.error(f"Analysis Failed: No data found for {crop_type_c_q3_input} in {state_y_q3_input} for the requested period.")
+            else:
+                # Text first, so the answer shows up before the chart payloads are built and sent
+                st.markdown(final_answer)
+                plot_question_3(trend_result)
 
 # ---------------------------------------------------------------------------------------------------
 
@@ -326,11 +328,15 @@ with st.container():
 
     with col2:
         crop_a_input = st.selectbox('Crop A (To Promote - e.g., Drought Resistant):', options = ALL_SINGLE_CROPS, key='q4_crop_a', index=ALL_SINGLE_CROPS.index('Maize') if 'Maize' in ALL_SINGLE_CROPS else 0)
-        crop_b_input = st.selectbox('Crop B (To Replace - e.g., Water Intensive):', options = [c for c in ALL_SINGLE_CROPS if c != crop_a_input], key = 'q4_crop_b', index = ALL_SINGLE_CROPS.index('Rice') if 'Rice' in ALL_SINGLE_CROPS else 0)
+        crop_b_options = [c for c in ALL_SINGLE_CROPS if c != crop_a_input]
+        crop_b_input = st.selectbox('Crop B (To Replace - e.g., Water Intensive):', options = crop_b_options, key = 'q4_crop_b', index = crop_b_options.index('Rice') if 'Rice' in crop_b_options else 0)
 
 if st.button('Answer Question 4: Generate Policy Arguments' ):
-    with st.spinner(f'Synthesizing policy arguments for {crop_a_input} vs {crop_b_input} in {region_y_input}...'):
-        final_answer = answer_question_4(master_df, region_y_input, crop_a_input, crop_b_input, n_years_q4_input)
-
-        st.markdown(final_answer)
+    with st.spinner(f'Synthesizing policy arguments for {crop_a_input} vs {crop_b_input} in {region_y_input}...'), question_metrics.observe('q4'):
+        policy_result, final_answer = answer_with_cache('q4', answer_question_4, region_y=region_y_input, crop_a=crop_a_input, crop_b=crop_b_input, n_years=n_years_q4_input)
+        with stage('render'):
+            st.markdown(final_answer)
+            plot_question_4(policy_result)
 
+# Drawn last so the panel already includes the request answered in this run
+render_metrics_panel()
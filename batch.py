@@ -0,0 +1,276 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from correlation import SERIES_LEVELS, sensitivity_level
+from query_engine import available_options, default_data_source, load_cube
+
+# Batch / scenario-sweep mode for Q1-Q4.
+# Each (question, N) task answers every state / crop combination of the grid with a handful of
+# vectorized groupbys over the aggregate cube, instead of one engine call per combination.
+#
+#   python batch.py --questions 1 4 --n-years 5 10 15 --out-dir sweep_results --format parquet --workers 4
+
+# --- 1. CONFIGURATION ---
+
+DEFAULT_N_YEARS = [5, 10, 15]
+DEFAULT_M_CROPS = 3
+QUESTIONS = [1, 2, 3, 4]
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. VECTORIZED BUILDING BLOCKS ---
+# ---------------------------------------------------------------------------------------------------
+
+def cube_rows(table, states, start_year):
+    # Flattens a cube table to rows for the requested states from start_year onwards
+    rows = table[table.index.get_level_values('crop_year') >= start_year]
+    if states is not None:
+        rows = rows[rows.index.get_level_values('state_name').isin(states)]
+    return rows.reset_index()
+
+def trend_statistics(cube, level, states, n_years, labels=None):
+    # Per-series yield/rainfall trend summary (the Q3/Q4 statistics), read from the climate sensitivity table
+    table = sensitivity_level(cube, level, n_years).reset_index()
+    key = SERIES_LEVELS[level][-1]
+    table = table.rename(columns={'label': key, 'pearson': 'correlation'})
+    table = table[table['state_name'].isin(states)]
+    if labels is not None:
+        table = table[table[key].isin([str(label) for label in labels])]
+    stats = table[['state_name', key, 'start_year', 'end_year', 'years_observed', 'average_yield', 'average_rainfall', 'correlation']].copy()
+    stats['yield_per_rainfall'] = stats['average_yield'] / stats['average_rainfall'].replace(0, np.nan)
+    stats.insert(0, 'n_years', n_years)
+    return stats.reset_index(drop=True)
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. QUESTION SWEEPS ---
+# ---------------------------------------------------------------------------------------------------
+
+def sweep_question_1(cube, states, crop_types, n_years, m_crops=DEFAULT_M_CROPS):
+    # Q1 for every ordered state pair x every crop type over the last n_years
+    start_year = cube.latest_year - n_years + 1
+    rainfall = cube_rows(cube.rainfall_table, states, start_year)
+    rainfall = rainfall[rainfall['n_rainfall'] > 0]
+    rainfall['annual_rainfall_mm'] = rainfall['rainfall_sum'] / rainfall['n_rainfall']
+    avg_rainfall = rainfall.groupby('state_name', observed=True)['annual_rainfall_mm'].mean().round(2)
+
+    crops = cube_rows(cube.crop_table, states, start_year)
+    crops = crops[crops['crop_type'].isin(crop_types)]
+    production = crops.groupby(['state_name', 'crop_type', 'crop'], observed=True, sort=True)['production'].sum().reset_index()
+    production = production.sort_values(['state_name', 'crop_type', 'production'], ascending=[True, True, False], kind='stable')
+    top_crops = production.groupby(['state_name', 'crop_type'], observed=True).head(m_crops)
+    top_crops = top_crops.groupby(['state_name', 'crop_type'], observed=True)['crop'].agg(lambda c: ', '.join(map(str, c)))
+
+    grid = pd.MultiIndex.from_product([states, states, crop_types], names=['state_x', 'state_y', 'crop_type']).to_frame(index=False)
+    grid = grid[grid['state_x'] != grid['state_y']].reset_index(drop=True)
+    result = grid.assign(
+        n_years=n_years, start_year=start_year, end_year=cube.latest_year, m_crops=m_crops,
+        avg_rainfall_x=grid['state_x'].map(avg_rainfall), avg_rainfall_y=grid['state_y'].map(avg_rainfall),
+        top_crops_x=pd.Series(list(zip(grid['state_x'], grid['crop_type']))).map(top_crops),
+        top_crops_y=pd.Series(list(zip(grid['state_y'], grid['crop_type']))).map(top_crops),
+    )
+    result['higher_rainfall_state'] = np.select(
+        [result['avg_rainfall_x'] > result['avg_rainfall_y'], result['avg_rainfall_y'] > result['avg_rainfall_x']],
+        [result['state_x'], result['state_y']], default='Neither')
+    return result
+
+def sweep_question_2(cube, states, crops):
+    # Q2 for every ordered state pair x every crop (latest year; n_years does not apply)
+    latest = cube.district_table[cube.district_table.index.get_level_values('crop_year') == cube.latest_year]
+    rows = latest.reset_index()
+    rows = rows[rows['state_name'].isin(states) & rows['crop'].isin(crops)]
+    rows = rows[['state_name', 'crop', 'district_name', 'production']].sort_values(['state_name', 'crop', 'district_name'], kind='stable')
+
+    by_production = rows.sort_values(['state_name', 'crop', 'production'], ascending=[True, True, False], kind='stable')
+    max_rows = by_production.drop_duplicates(['state_name', 'crop'], keep='first')
+    # Lowest producing district, ignoring zero-production districts unless nothing was produced
+    rows['non_producer'] = rows['production'] <= 0
+    by_min = rows.sort_values(['state_name', 'crop', 'non_producer', 'production'], kind='stable')
+    min_rows = by_min.drop_duplicates(['state_name', 'crop'], keep='first')
+
+    grid = pd.MultiIndex.from_product([states, states, crops], names=['state_x', 'state_y', 'crop']).to_frame(index=False)
+    grid = grid[grid['state_x'] != grid['state_y']]
+    result = grid.merge(
+        max_rows.rename(columns={'state_name': 'state_x', 'district_name': 'max_district', 'production': 'max_production'}),
+        on=['state_x', 'crop'], how='left',
+    ).merge(
+        min_rows.drop(columns='non_producer').rename(columns={'state_name': 'state_y', 'district_name': 'min_district', 'production': 'min_production'}),
+        on=['state_y', 'crop'], how='left',
+    )
+    result[['max_production', 'min_production']] = result[['max_production', 'min_production']].fillna(0.0)
+    result['production_difference'] = result['max_production'] - result['min_production']
+    result.insert(3, 'latest_year', cube.latest_year)
+    return result
+
+def sweep_question_3(cube, states, crop_types, n_years):
+    # Q3 for every state x crop type
+    return trend_statistics(cube, 'crop_type', states, n_years, labels=crop_types)
+
+def sweep_question_4(cube, states, crops, n_years):
+    # Q4 for every state x ordered pair of crops with data for both crops
+    stats = trend_statistics(cube, 'crop', states, n_years, labels=crops)
+    stats = stats.drop(columns=['n_years'])
+    pairs = stats.merge(stats, on='state_name', suffixes=('_a', '_b'))
+    pairs = pairs[pairs['crop_a'] != pairs['crop_b']].rename(columns={'state_name': 'region'})
+    pairs.insert(3, 'n_years', n_years)
+    pairs['a_more_resilient'] = pairs['correlation_a'].abs() < pairs['correlation_b'].abs()
+    pairs['a_less_water_intensive'] = pairs['average_rainfall_a'] < pairs['average_rainfall_b']
+    pairs['a_higher_yield'] = pairs['average_yield_a'] > pairs['average_yield_b']
+    return pairs.reset_index(drop=True)
+
+def run_sweep_task(cube, question, n_years, grid):
+    # Computes one (question, N) block of the sweep
+    if question == 1:
+        return sweep_question_1(cube, grid['states'], grid['crop_types'], n_years, grid['m_crops'])
+    if question == 2:
+        return sweep_question_2(cube, grid['states'], grid['crops'])
+    if question == 3:
+        return sweep_question_3(cube, grid['states'], grid['crop_types'], n_years)
+    return sweep_question_4(cube, grid['states'], grid['crops'], n_years)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. STREAMING OUTPUT ---
+# ---------------------------------------------------------------------------------------------------
+
+class SweepWriter:
+    # Appends result blocks to one file per question (CSV or Parquet) as soon as they are ready
+    def __init__(self, out_dir, fmt='csv'):
+        if fmt not in ('csv', 'parquet'):
+            raise ValueError(f"Unsupported output format '{fmt}' (expected 'csv' or 'parquet')")
+        self.out_dir, self.fmt = out_dir, fmt
+        self.parquet_writers = {}
+        self.csv_started = set()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def path_for(self, question):
+        return os.path.join(self.out_dir, f"q{question}.{self.fmt}")
+
+    def write(self, question, block):
+        if block.empty: return
+        path = self.path_for(question)
+        if self.fmt == 'csv':
+            block.to_csv(path, mode='a' if question in self.csv_started else 'w', header=question not in self.csv_started, index=False)
+            self.csv_started.add(question)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = self.parquet_writers.get(question)
+        table = pa.Table.from_pandas(block, preserve_index=False)
+        if writer is None:
+            # All-missing columns in the first block would otherwise pin the file schema to the null type
+            schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f for f in table.schema])
+            writer = self.parquet_writers[question] = pq.ParquetWriter(path, schema)
+        writer.write_table(table.cast(writer.schema))
+
+    def close(self):
+        for writer in self.parquet_writers.values():
+            writer.close()
+        self.parquet_writers.clear()
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 5. PYTHON API ---
+# ---------------------------------------------------------------------------------------------------
+
+def build_grid(cube, states=None, crops=None, crop_types=None, m_crops=DEFAULT_M_CROPS):
+    # Fills unspecified grid axes with everything available in the dataset
+    options = available_options(cube)
+    return {
+        'states': list(states) if states else options['states'],
+        'crops': list(crops) if crops else options['single_crops'],
+        'crop_types': list(crop_types) if crop_types else options['crop_types'],
+        'm_crops': m_crops,
+    }
+
+def sweep_tasks(questions, n_years_list):
+    # Q2 always uses the latest year, so it is computed once regardless of N
+    tasks = []
+    for question in questions:
+        for n_years in ([None] if question == 2 else n_years_list):
+            tasks.append((question, n_years))
+    return tasks
+
+def iter_sweep(cube, questions=QUESTIONS, n_years_list=DEFAULT_N_YEARS, **grid_axes):
+    # Yields (question, n_years, result_frame) blocks computed in-process
+    grid = build_grid(cube, **grid_axes)
+    for question, n_years in sweep_tasks(questions, n_years_list):
+        yield question, n_years, run_sweep_task(cube, question, n_years, grid)
+
+_worker_cube = None
+
+def init_worker(data_file):
+    global _worker_cube
+    _worker_cube = load_cube(data_file)
+
+def run_worker_task(question, n_years, grid):
+    return question, n_years, run_sweep_task(_worker_cube, question, n_years, grid)
+
+def run_sweep(out_dir, questions=QUESTIONS, n_years_list=DEFAULT_N_YEARS, fmt='csv', workers=1,
+              data_file=None, cube=None, progress=None, **grid_axes):
+    # Runs the full sweep and streams every block to out_dir; returns the written file paths.
+    # data_file defaults to the partitioned store once seeded, else the CSV (as in the app and API).
+    # With workers > 1 the (question, N) blocks are spread over a process pool whose workers load their
+    # own cube from data_file, so a prebuilt cube can only be used in-process.
+    if cube is not None and workers > 1:
+        raise ValueError("run_sweep(cube=...) runs in-process; pass data_file instead to use workers > 1")
+    data_file = data_file or default_data_source()
+    if cube is None:
+        cube = load_cube(data_file)
+    writer = SweepWriter(out_dir, fmt)
+    try:
+        if workers <= 1:
+            blocks = iter_sweep(cube, questions, n_years_list, **grid_axes)
+            for question, n_years, block in blocks:
+                writer.write(question, block)
+                if progress: progress(question, n_years, len(block))
+        else:
+            grid = build_grid(cube, **grid_axes)
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(data_file,)) as pool:
+                futures = [pool.submit(run_worker_task, question, n_years, grid) for question, n_years in sweep_tasks(questions, n_years_list)]
+                for future in as_completed(futures):
+                    question, n_years, block = future.result()
+                    writer.write(question, block)
+                    if progress: progress(question, n_years, len(block))
+    finally:
+        writer.close()
+    return {question: writer.path_for(question) for question in questions}
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 6. COMMAND LINE ---
+# ---------------------------------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep Q1-Q4 over a grid of states, crops, crop types and N years.")
+    parser.add_argument('--data-file', help="Merged CSV or store directory (default: the store once seeded, else the CSV)")
+    parser.add_argument('--out-dir', default='sweep_results')
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--questions', type=int, nargs='+', choices=QUESTIONS, default=QUESTIONS)
+    parser.add_argument('--n-years', type=int, nargs='+', default=DEFAULT_N_YEARS)
+    parser.add_argument('--states', nargs='+', help="Default: every state in the dataset")
+    parser.add_argument('--crops', nargs='+', help="Default: every single (non-aggregate) crop")
+    parser.add_argument('--crop-types', nargs='+', help="Default: every crop type")
+    parser.add_argument('--m-crops', type=int, default=DEFAULT_M_CROPS)
+    parser.add_argument('--workers', type=int, default=1, help="Process pool size (1 = run in-process)")
+    args = parser.parse_args(argv)
+
+    def progress(question, n_years, rows):
+        label = f"N={n_years}" if n_years is not None else "latest year"
+        print(f"Q{question} ({label}): {rows} rows written", file=sys.stderr)
+
+    paths = run_sweep(
+        args.out_dir, questions=args.questions, n_years_list=args.n_years, fmt=args.format, workers=args.workers,
+        data_file=args.data_file, progress=progress,
+        states=args.states, crops=args.crops, crop_types=args.crop_types, m_crops=args.m_crops,
+    )
+    for question, path in paths.items():
+        print(f"Q{question}: {path}")
+
+
+if __name__ == '__main__':
+    main()
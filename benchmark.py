@@ -0,0 +1,281 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from aggregates import build_aggregate_cube
+from chunked import load_cube_chunked
+from data_loader import cache_paths, crop_category_map, load_master_df
+from query_engine import (
+    DEFAULT_QUESTION_PARAMS, QUESTION_FUNCTIONS, calculate_correlation, compare_recent_avg_rainfall,
+    get_max_min_district_production, get_single_crop_trend, get_top_m_crops, get_yield_and_rainfall_trend,
+)
+
+try:
+    import resource  # Unix only; the RSS high-water mark is simply omitted elsewhere
+except ImportError:
+    resource = None
+
+# Benchmark harness: synthetic data with the schema of Combined_Agri_and_Rainfall.csv at growing
+# sizes, load time, and latency + peak memory of every analytical function, written as a JSON report.
+#
+#   python benchmark.py --sizes 1e5 1e6 1e7 --repeat 5 --out benchmark_results/report.json
+#   python benchmark.py --sizes 1e5 1e6 --baseline benchmark_results/report.json
+
+# --- 1. CONFIGURATION ---
+
+DEFAULT_SIZES = [10**5, 10**6]
+DEFAULT_REPEAT = 5
+CHUNK_ROWS = 1_000_000  # rows generated and written per chunk, so 10^8 rows never sit in memory at once
+BENCH_DIR = "benchmark_data"
+RESULTS_DIR = "benchmark_results"
+
+BENCH_STATES = ['Uttar Pradesh', 'Madhya Pradesh', 'Maharashtra', 'Karnataka', 'Gujarat',
+                'Punjab', 'West Bengal', 'Rajasthan', 'Haryana', 'Andhra Pradesh']
+BENCH_YEARS = range(1997, 2015)
+BENCH_SEASONS = ['Kharif', 'Rabi', 'Whole Year', 'Summer']
+BENCH_CROPS = list(crop_category_map)
+SUBDIVISIONS_PER_STATE = 3  # distinct rainfall series per state, like the merged IMD sub-divisions
+
+CSV_COLUMNS = ['state_name', 'district_name', 'crop_year', 'season', 'crop', 'area', 'production',
+               'annual_rainfall_mm', 'kharif_season_rainfall']
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. SYNTHETIC DATA ---
+# ---------------------------------------------------------------------------------------------------
+
+def districts_per_state(n_rows):
+    # More rows -> more districts, so the district table grows with the data as it would in reality
+    return int(np.clip(n_rows ** 0.5 / 20, 5, 100))
+
+def generate_chunks(n_rows, chunk_rows=CHUNK_ROWS, seed=0):
+    # Yields DataFrames with the master CSV schema; rainfall is fixed per (state, sub-division, year)
+    rng = np.random.default_rng(seed)
+    n_districts = districts_per_state(n_rows)
+    districts = np.array([[f"{state} District {i + 1}" for i in range(n_districts)] for state in BENCH_STATES])
+    years = np.array(BENCH_YEARS)
+    rainfall = rng.uniform(400, 2500, size=(len(BENCH_STATES), SUBDIVISIONS_PER_STATE, len(years))).round(1)
+    states, crops, seasons = np.array(BENCH_STATES), np.array(BENCH_CROPS), np.array(BENCH_SEASONS)
+    for start in range(0, n_rows, chunk_rows):
+        size = min(chunk_rows, n_rows - start)
+        state = rng.integers(len(states), size=size)
+        year = rng.integers(len(years), size=size)
+        subdivision = rng.integers(SUBDIVISIONS_PER_STATE, size=size)
+        area = np.where(rng.random(size) < 0.08, 0.0, rng.uniform(1, 5000, size).round(1))
+        production = np.where(rng.random(size) < 0.05, 0.0, (area * rng.uniform(0.3, 4.0, size)).round(1))
+        annual = rainfall[state, subdivision, year]
+        yield pd.DataFrame({
+            'state_name': states[state],
+            'district_name': districts[state, rng.integers(n_districts, size=size)],
+            'crop_year': years[year],
+            'season': seasons[rng.integers(len(seasons), size=size)],
+            'crop': crops[rng.integers(len(crops), size=size)],
+            'area': area,
+            'production': production,
+            'annual_rainfall_mm': annual,
+            'kharif_season_rainfall': (annual * 0.7).round(1),
+        }, columns=CSV_COLUMNS)
+
+def write_synthetic_csv(path, n_rows, chunk_rows=CHUNK_ROWS, seed=0):
+    # Streams the generated chunks to one CSV; returns its size in bytes
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    for i, chunk in enumerate(generate_chunks(n_rows, chunk_rows, seed)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    return os.path.getsize(path)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. MEASUREMENT ---
+# ---------------------------------------------------------------------------------------------------
+
+def max_rss_bytes():
+    if resource is None: return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def measure(fn, repeat=1, memory=True, setup=None):
+    # Timing runs are untraced (tracemalloc slows allocation-heavy code); one extra traced run gives
+    # the peak Python/NumPy heap allocated by the call. The first call is reported separately (cold).
+    # setup (untimed) runs before every call, e.g. to drop state the previous call cached.
+    setup = setup or (lambda: None)
+    gc.collect()
+    setup()
+    started = time.perf_counter()
+    result = fn()
+    cold = time.perf_counter() - started
+    timings = []
+    for _ in range(repeat - 1):
+        setup()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    stats = {'cold_seconds': cold}
+    if timings:
+        timings.sort()
+        stats['median_seconds'] = statistics.median(timings)
+        stats['p95_seconds'] = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    if memory:
+        gc.collect()
+        setup()
+        tracemalloc.start()
+        try:
+            fn()
+            stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, stats
+
+def benchmark_functions(cube, repeat, memory):
+    # Every analytical helper and question function, called with the UI defaults. Q3/Q4 cache their
+    # climate sensitivity table on the cube, so it is dropped before each call to keep
+    # correlation.compute_sensitivity (their dominant cost) in every measurement.
+    q1, q2, q3, q4 = (DEFAULT_QUESTION_PARAMS[q] for q in ('q1', 'q2', 'q3', 'q4'))
+    states = [q1['state_x'], q1['state_y']]
+    trend = get_yield_and_rainfall_trend(cube, q3['state_name'], q3['crop_type'], q3['n_years'])
+    calls = {
+        'compare_recent_avg_rainfall': lambda: compare_recent_avg_rainfall(cube, states, q1['n_years']),
+        'get_top_m_crops': lambda: get_top_m_crops(cube, states, q1['crop_type'], q1['n_years'], q1['m_crops']),
+        'get_max_min_district_production': lambda: get_max_min_district_production(cube, q2['state_x'], q2['state_y'], q2['crop_z']),
+        'get_yield_and_rainfall_trend': lambda: get_yield_and_rainfall_trend(cube, q3['state_name'], q3['crop_type'], q3['n_years']),
+        'get_single_crop_trend': lambda: get_single_crop_trend(cube, q4['region_y'], q4['crop_a'], q4['n_years']),
+        'calculate_correlation': lambda: calculate_correlation(trend),
+    }
+    calls.update({
+        f"question_{question[1]}": (lambda question=question: QUESTION_FUNCTIONS[question](cube, **DEFAULT_QUESTION_PARAMS[question]))
+        for question in QUESTION_FUNCTIONS
+    })
+    return {name: measure(call, repeat, memory, setup=cube.sensitivity.clear)[1] for name, call in calls.items()}
+
+def benchmark_size(n_rows, data_dir=BENCH_DIR, repeat=DEFAULT_REPEAT, memory=True, seed=0, keep_data=False, mode='memory'):
+    # One report entry: generation, cold (CSV parse + cache build) and warm (Parquet cache) load,
+    # cube build, then every function. In 'chunked' mode the CSV is streamed straight into the cube
+    # (load_cold covers the build). Errors such as MemoryError are recorded instead of aborting.
+    path = os.path.join(data_dir, f"synthetic_{n_rows}.csv")
+    entry = {'rows': n_rows, 'districts_per_state': districts_per_state(n_rows)}
+    try:
+        started = time.perf_counter()
+        entry['csv_bytes'] = write_synthetic_csv(path, n_rows, seed=seed)
+        entry['generate_seconds'] = time.perf_counter() - started
+        for cache_file in cache_paths(path):
+            if os.path.exists(cache_file): os.remove(cache_file)
+
+        if mode == 'chunked':
+            cube, entry['load_cold'] = measure(lambda: load_cube_chunked(path), memory=memory)
+        else:
+            _, entry['load_cold'] = measure(lambda: load_master_df(path), memory=False)
+            df, entry['load_warm'] = measure(lambda: load_master_df(path), repeat=3, memory=memory)
+            entry['master_df_bytes'] = int(df.memory_usage(deep=True).sum())
+            cube, entry['build_cube'] = measure(lambda: build_aggregate_cube(df), memory=memory)
+            del df
+        entry['cube_rows'] = {name: len(getattr(cube, name)) for name in ('district_table', 'crop_table', 'rainfall_table')}
+        entry['functions'] = benchmark_functions(cube, repeat, memory)
+    except MemoryError as exc:
+        entry['error'] = f"MemoryError: {exc}"
+    finally:
+        if not keep_data:
+            for cache_file in cache_paths(path):
+                if os.path.exists(cache_file): os.remove(cache_file)
+            if os.path.exists(path): os.remove(path)
+            for directory in (os.path.dirname(cache_paths(path)[0]), data_dir):
+                with contextlib.suppress(OSError):
+                    os.rmdir(directory)  # only when empty
+    entry['max_rss_bytes'] = max_rss_bytes()
+    return entry
+
+def run_benchmark(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, memory=True, data_dir=BENCH_DIR, seed=0, keep_data=False,
+                  progress=None, mode='memory'):
+    report = {
+        'mode': mode,
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+        'platform': platform.platform(), 'repeat': repeat, 'sizes': [],
+    }
+    for n_rows in sizes:
+        entry = benchmark_size(n_rows, data_dir, repeat, memory, seed, keep_data, mode)
+        report['sizes'].append(entry)
+        if progress: progress(entry)
+    return report
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. REPORT COMPARISON ---
+# ---------------------------------------------------------------------------------------------------
+
+def flatten_timings(report):
+    # {(rows, measurement): seconds} using the median where available, else the cold time
+    timings = {}
+    for entry in report['sizes']:
+        stages = {'load_cold': entry.get('load_cold'), 'load_warm': entry.get('load_warm'), 'build_cube': entry.get('build_cube'),
+                  **entry.get('functions', {})}
+        for name, stats in stages.items():
+            if stats:
+                timings[(entry['rows'], name)] = stats.get('median_seconds', stats['cold_seconds'])
+    return timings
+
+def compare_reports(baseline, current, threshold=1.25):
+    # Rows of (rows, measurement, baseline s, current s, ratio, flag) for measurements in both reports
+    old, new = flatten_timings(baseline), flatten_timings(current)
+    rows = []
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key] / old[key] if old[key] else float('inf')
+        flag = 'SLOWER' if ratio > threshold else 'FASTER' if ratio < 1 / threshold else ''
+        rows.append((key[0], key[1], old[key], new[key], ratio, flag))
+    return rows
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 5. COMMAND LINE ---
+# ---------------------------------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading and Q1-Q4 analytics on synthetic data of growing size.")
+    parser.add_argument('--sizes', type=float, nargs='+', default=DEFAULT_SIZES, help="Row counts, e.g. 1e5 1e6 1e7 1e8")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="Calls per function (first one reported as cold)")
+    parser.add_argument('--no-memory', action='store_true', help="Skip the traced peak-memory runs")
+    parser.add_argument('--data-dir', default=BENCH_DIR)
+    parser.add_argument('--keep-data', action='store_true', help="Keep the generated CSVs and caches")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--mode', choices=['memory', 'chunked'], default='memory', help="In-memory or out-of-core (chunked.py) loading")
+    parser.add_argument('--out', default=os.path.join(RESULTS_DIR, f"report-{datetime.now():%Y%m%d-%H%M%S}.json"))
+    parser.add_argument('--baseline', help="Earlier report to compare against")
+    args = parser.parse_args(argv)
+
+    def progress(entry):
+        if 'error' in entry:
+            print(f"{entry['rows']:>12,} rows: {entry['error']}", file=sys.stderr)
+            return
+        slowest = max(entry['functions'].items(), key=lambda item: item[1].get('median_seconds', item[1]['cold_seconds']))
+        if 'load_warm' in entry:
+            load = (f"load {entry['load_cold']['cold_seconds']:.2f}s cold / {entry['load_warm']['median_seconds']:.2f}s warm, "
+                    f"cube {entry['build_cube']['cold_seconds']:.2f}s")
+        else:
+            load = f"chunked load + cube {entry['load_cold']['cold_seconds']:.2f}s (peak {entry['load_cold'].get('peak_bytes', 0) / 2**20:.0f} MiB)"
+        print(f"{entry['rows']:>12,} rows: {load}, slowest function {slowest[0]} "
+              f"{slowest[1].get('median_seconds', slowest[1]['cold_seconds']) * 1000:.2f}ms", file=sys.stderr)
+
+    report = run_benchmark([int(n) for n in args.sizes], args.repeat, not args.no_memory, args.data_dir, args.seed, args.keep_data, progress, args.mode)
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as handle:
+        json.dump(report, handle, indent=2)
+    print(f"Report written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        for rows, name, old, new, ratio, flag in compare_reports(baseline, report):
+            print(f"{rows:>12,} {name:<34} {old * 1000:>10.2f}ms -> {new * 1000:>10.2f}ms  x{ratio:.2f} {flag}")
+
+
+if __name__ == '__main__':
+    main()
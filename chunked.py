@@ -0,0 +1,179 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from aggregates import DISTRICT_KEYS, MEASURE_COLUMNS, cube_from_district_table, district_measures, merge_district_tables
+from data_loader import DATA_FILE, cache_paths, crop_category_map, is_cache_valid
+from partition_store import is_store, manifest_partitions, read_aggregates, read_manifest
+
+# Out-of-core execution mode: the aggregate cube is built from a stream of bounded chunks instead of
+# a fully resident master frame. Every cube measure is additive, so per-chunk district tables are
+# summed into a running total and the resulting cube answers Q1-Q4 exactly like the in-memory one.
+# Peak memory is one chunk plus the cube itself, independent of the number of rows.
+#
+# Sources, cheapest first:
+#   partitioned store -> per-partition aggregates only; state/year predicates prune partitions
+#   Parquet cache     -> pyarrow dataset scan with the predicates pushed down to row-group statistics
+#   CSV               -> pandas chunked reader, filtering each chunk before it is aggregated
+#
+# Predicates (states, crops, year range) shrink the cube to the rows a deployment needs. The latest
+# year / latest yield year always come from the whole dataset, so the Q1-Q4 windows are unchanged
+# and answers inside the predicate's scope are identical to the unfiltered ones.
+
+# --- 1. CONFIGURATION ---
+
+CHUNK_ROWS = 500_000
+SCAN_COLUMNS = ['state_name', 'district_name', 'crop', 'crop_year', 'area', 'production', 'annual_rainfall_mm']
+MERGE_EVERY = 8  # partial district tables folded into the running total at a time
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. PREDICATES AND YEAR BOUNDS ---
+# ---------------------------------------------------------------------------------------------------
+
+def has_predicates(states=None, crops=None, start_year=None, end_year=None):
+    return any(value is not None for value in (states, crops, start_year, end_year))
+
+def row_mask(df, states=None, crops=None, start_year=None, end_year=None):
+    # Boolean mask of the rows matching every given predicate
+    mask = np.ones(len(df), dtype=bool)
+    if states is not None:
+        mask &= df['state_name'].isin(states).to_numpy()
+    if crops is not None:
+        mask &= df['crop'].isin(crops).to_numpy()
+    if start_year is not None:
+        mask &= (df['crop_year'] >= start_year).to_numpy()
+    if end_year is not None:
+        mask &= (df['crop_year'] <= end_year).to_numpy()
+    return mask
+
+def arrow_filter(states=None, crops=None, start_year=None, end_year=None):
+    # The same predicates as a pyarrow expression (None when there is nothing to push down)
+    terms = []
+    if states is not None:
+        terms.append(ds.field('state_name').isin(list(states)))
+    if crops is not None:
+        terms.append(ds.field('crop').isin(list(crops)))
+    if start_year is not None:
+        terms.append(ds.field('crop_year') >= start_year)
+    if end_year is not None:
+        terms.append(ds.field('crop_year') <= end_year)
+    expression = None
+    for term in terms:
+        expression = term if expression is None else expression & term
+    return expression
+
+class YearBounds:
+    # Latest year and latest year with a cropped (area > 0) row, tracked over unfiltered rows
+    def __init__(self):
+        self.latest_year = None
+        self.latest_yield_year = None
+
+    def update(self, chunk):
+        # Python ints, like assemble_cube (int16 years would overflow in the window arithmetic)
+        years = chunk['crop_year'].to_numpy()
+        if not len(years): return
+        self.latest_year = max(self.latest_year or int(years.max()), int(years.max()))
+        cropped = years[chunk['area'].to_numpy(dtype='float64') > 0]
+        if len(cropped):
+            self.latest_yield_year = max(self.latest_yield_year or int(cropped.max()), int(cropped.max()))
+
+    def apply(self, cube):
+        # Overrides the cube's own (possibly predicate-narrowed) windows with the dataset-wide ones
+        if self.latest_year is not None:
+            cube.latest_year = self.latest_year
+            cube.latest_yield_year = self.latest_yield_year if self.latest_yield_year is not None else self.latest_year
+        return cube
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. CHUNK SOURCES ---
+# ---------------------------------------------------------------------------------------------------
+
+def scan_csv(path, bounds, chunk_rows=CHUNK_ROWS, **predicates):
+    # One pass over the CSV: bounds see every row, aggregation only the matching ones
+    for chunk in pd.read_csv(path, usecols=SCAN_COLUMNS, chunksize=chunk_rows):
+        bounds.update(chunk)
+        yield chunk[row_mask(chunk, **predicates)] if has_predicates(**predicates) else chunk
+
+def scan_parquet(path, bounds, chunk_rows=CHUNK_ROWS, **predicates):
+    # Columnar scan; with predicates, a cheap (crop_year, area) projection supplies the bounds first
+    dataset = ds.dataset(path, format='parquet')
+    columns = [col for col in SCAN_COLUMNS + ['yield'] if col in dataset.schema.names]
+    expression = arrow_filter(**predicates)
+    if expression is not None:
+        for batch in dataset.to_batches(columns=['crop_year', 'area'], batch_size=chunk_rows):
+            bounds.update(batch.to_pandas())
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=chunk_rows):
+        chunk = batch.to_pandas()
+        if expression is None:
+            bounds.update(chunk)
+        yield chunk
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. INCREMENTAL CUBE CONSTRUCTION ---
+# ---------------------------------------------------------------------------------------------------
+
+def chunk_district_table(chunk):
+    chunk = chunk.assign(crop_type=chunk['crop'].map(crop_category_map))
+    return district_measures(chunk)
+
+def build_cube_from_chunks(chunks):
+    # Sums per-chunk district tables into a running total (folded every MERGE_EVERY chunks)
+    total, partials = None, []
+    for chunk in chunks:
+        if not len(chunk): continue
+        partials.append(chunk_district_table(chunk))
+        if len(partials) >= MERGE_EVERY:
+            total = merge_district_tables(([total] if total is not None else []) + partials)
+            partials = []
+    if partials:
+        total = merge_district_tables(([total] if total is not None else []) + partials)
+    if total is None:
+        index = pd.MultiIndex.from_arrays([[] for _ in DISTRICT_KEYS], names=DISTRICT_KEYS)
+        return cube_from_district_table(pd.DataFrame(columns=['crop_type'] + MEASURE_COLUMNS, index=index))
+    return cube_from_district_table(total)
+
+def load_store_cube_filtered(store_dir, states=None, crops=None, start_year=None, end_year=None):
+    # Store source: partitions outside the state/year predicates are never opened
+    manifest = read_manifest(store_dir)
+    partitions = manifest_partitions(manifest)
+    if not partitions:
+        raise FileNotFoundError(f"Store '{store_dir}' has no data yet")
+    selected = [(state, year) for state, year in partitions
+                if (states is None or state in states)
+                and (start_year is None or year >= start_year) and (end_year is None or year <= end_year)]
+    district_table = read_aggregates(store_dir, manifest, selected)
+    if crops is not None:
+        district_table = district_table[district_table.index.get_level_values('crop').isin(crops)]
+    cube = cube_from_district_table(district_table)
+
+    # Dataset-wide windows: latest partition year, and the newest year with any cropped row
+    bounds = YearBounds()
+    bounds.latest_year = max(year for _, year in partitions)
+    for year in sorted({year for _, year in partitions}, reverse=True):
+        year_rows = read_aggregates(store_dir, manifest, [(state, y) for state, y in partitions if y == year])
+        if (year_rows['n_cropped'] > 0).any():
+            bounds.latest_yield_year = year
+            break
+    return bounds.apply(cube)
+
+def load_cube_chunked(path=DATA_FILE, chunk_rows=CHUNK_ROWS, states=None, crops=None, start_year=None, end_year=None):
+    # Out-of-core counterpart of query_engine.load_cube; raises FileNotFoundError when the source is missing
+    predicates = {'states': states, 'crops': crops, 'start_year': start_year, 'end_year': end_year}
+    if is_store(path):
+        return load_store_cube_filtered(path, **predicates)
+    bounds = YearBounds()
+    if path.endswith('.parquet'):
+        chunks = scan_parquet(path, bounds, chunk_rows, **predicates)
+    else:
+        parquet_path, meta_path = cache_paths(path)
+        os.stat(path)
+        if is_cache_valid(path, parquet_path, meta_path):
+            chunks = scan_parquet(parquet_path, bounds, chunk_rows, **predicates)
+        else:
+            chunks = scan_csv(path, bounds, chunk_rows, **predicates)
+    return bounds.apply(build_cube_from_chunks(chunks))
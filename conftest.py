@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import build_aggregate_cube
+from data_loader import crop_category_map, load_master_df
+from ingest import seed_store
+
+# Shared fixtures: a generated master dataset (schema of Combined_Agri_and_Rainfall.csv), its cube and
+# a partitioned store seeded from it.
+
+STATES = {'Karnataka': ['Hassan', 'Mysore', 'Tumkur'], 'Maharashtra': ['Pune', 'Nagpur'], 'Gujarat': ['Surat', 'Rajkot']}
+CROPS = ['Rice', 'Wheat', 'Maize', 'Groundnut', 'Soyabean', 'Arhar', 'Potato', 'Coconut', 'Oilseeds Total', 'Sugarcane']
+YEARS = range(1997, 2015)
+
+def generate_master_df(seed=0):
+    # Master rows with gaps, zero areas / productions, NaN rainfall, unmapped crops, and a last year
+    # without any cropped row (so the latest yield year differs from the latest year)
+    rng = np.random.default_rng(seed)
+    rows = []
+    for state_name, districts in STATES.items():
+        for crop_year in YEARS:
+            rainfall = rng.uniform(400, 2500)
+            for district_name in districts:
+                for crop in CROPS:
+                    for season in ['Kharif', 'Rabi']:
+                        if rng.random() < 0.15: continue
+                        area = 0.0 if crop_year == YEARS[-1] or rng.random() < 0.08 else round(rng.uniform(10, 5000), 1)
+                        production = round(area * rng.uniform(0.5, 4), 1) if rng.random() > 0.05 else 0.0
+                        annual = np.nan if rng.random() < 0.02 else round(rainfall + rng.normal(0, 30), 1)
+                        rows.append((state_name, district_name, crop_year, season, crop, area, production, annual, round(rainfall * 0.7, 1)))
+    return pd.DataFrame(rows, columns=['state_name', 'district_name', 'crop_year', 'season', 'crop', 'area', 'production',
+                                       'annual_rainfall_mm', 'kharif_season_rainfall'])
+
+@pytest.fixture(scope='session')
+def master_csv(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'Combined_Agri_and_Rainfall.csv'
+    generate_master_df().to_csv(path, index=False)
+    return str(path)
+
+@pytest.fixture(scope='session')
+def memory_cube(master_csv):
+    return build_aggregate_cube(load_master_df(master_csv))
+
+@pytest.fixture(scope='session')
+def raw_df():
+    # The generated rows as app.py used to hold them: the raw CSV frame plus crop_type
+    df = generate_master_df()
+    df['crop_type'] = df['crop'].map(crop_category_map)
+    return df
+
+@pytest.fixture(scope='session')
+def seeded_store(master_csv, tmp_path_factory):
+    store_dir = str(tmp_path_factory.mktemp('store') / 'samarth_store')
+    seed_store(master_csv, store_dir)
+    return store_dir
+
+def flat_table(table):
+    # Cube table as a sorted plain frame (categorical / object dtypes differ between the sources)
+    flat = table.reset_index()
+    for col in flat.columns:
+        if not pd.api.types.is_numeric_dtype(flat[col]):
+            flat[col] = flat[col].astype(object).where(flat[col].notna(), None)
+    return flat.sort_values([col for col in table.index.names]).reset_index(drop=True)
+
+def assert_tables_equal(actual, expected):
+    pd.testing.assert_frame_equal(flat_table(actual), flat_table(expected), check_dtype=False, check_like=True)
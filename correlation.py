@@ -0,0 +1,177 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from aggregates import MEASURE_COLUMNS
+
+# Vectorized yield-rainfall correlation engine.
+# Trends for every series (state x crop, state x crop_type, or national crop / crop type) are laid
+# out as a (series x year) matrix and Pearson / Spearman / rolling coefficients are computed for all
+# rows at once with NumPy, instead of one Series.corr per trend frame.
+
+# --- 1. CONFIGURATION ---
+
+# Series granularity -> grouping keys over the crop table
+SERIES_LEVELS = {
+    'crop': ['state_name', 'crop'],
+    'crop_type': ['state_name', 'crop_type'],
+    'national_crop': ['crop'],
+    'national_crop_type': ['crop_type'],
+}
+
+CORRELATION_METHODS = ['pearson', 'spearman']
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. TREND PANELS ---
+# ---------------------------------------------------------------------------------------------------
+
+def window_start_year(cube, n_years=None):
+    # First year of the trailing n_years window (the Q3/Q4 convention), clamped to the data
+    first_year = int(cube.crop_table.index.get_level_values('crop_year').min())
+    if n_years is None: return first_year
+    return max(int(cube.latest_yield_year) - n_years + 1, first_year)
+
+def yearly_trends(cube, keys, start_year):
+    # Long (keys..., crop_year) frame of annual average yield and rainfall over cropped rows
+    table = cube.crop_table
+    rows = table[table.index.get_level_values('crop_year') >= start_year].reset_index()
+    yearly = rows.groupby(keys + ['crop_year'], observed=True, sort=True)[MEASURE_COLUMNS].sum().reset_index()
+    yearly = yearly[yearly['n_cropped'] > 0]
+    yearly['average_yield'] = yearly['yield_sum'] / yearly['n_yield'].replace(0, np.nan)
+    yearly['average_rainfall'] = yearly['cropped_rainfall_sum'] / yearly['n_cropped_rainfall'].replace(0, np.nan)
+    return yearly[keys + ['crop_year', 'average_yield', 'average_rainfall']]
+
+def trend_panel(cube, keys, start_year):
+    # (series x year) matrices of average yield and rainfall, plus which cells have a trend row
+    yearly = yearly_trends(cube, keys, start_year).set_index(keys + ['crop_year'])
+    if yearly.empty:
+        empty = np.empty((0, 0))
+        return pd.MultiIndex.from_arrays([[] for _ in keys], names=keys), np.array([], dtype=int), empty, empty, empty.astype(bool)
+    yield_wide = yearly['average_yield'].unstack('crop_year')
+    years = np.arange(int(yield_wide.columns.min()), int(yield_wide.columns.max()) + 1)
+    yield_wide = yield_wide.reindex(columns=years)
+    rainfall_wide = yearly['average_rainfall'].unstack('crop_year').reindex(index=yield_wide.index, columns=years)
+    present = pd.Series(True, index=yearly.index).unstack('crop_year').reindex(index=yield_wide.index, columns=years).notna()
+    series_index = yield_wide.index if isinstance(yield_wide.index, pd.MultiIndex) else pd.MultiIndex.from_arrays([yield_wide.index], names=keys)
+    return series_index, years, yield_wide.to_numpy(dtype='float64'), rainfall_wide.to_numpy(dtype='float64'), present.to_numpy()
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. VECTORIZED COEFFICIENTS ---
+# ---------------------------------------------------------------------------------------------------
+
+def pearson_rows(x, y, min_periods=2):
+    # Pearson coefficient along the last axis for every leading index, using pairwise-complete cells
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_x = np.where(valid, x, 0.0).sum(axis=-1) / n
+        mean_y = np.where(valid, y, 0.0).sum(axis=-1) / n
+        dx = np.where(valid, x - mean_x[..., None], 0.0)
+        dy = np.where(valid, y - mean_y[..., None], 0.0)
+        denominator = np.sqrt((dx * dx).sum(axis=-1) * (dy * dy).sum(axis=-1))
+        r = (dx * dy).sum(axis=-1) / denominator
+    r = np.where((n >= max(min_periods, 2)) & (denominator > 0), r, np.nan)
+    return np.clip(r, -1.0, 1.0), n
+
+def rank_rows(values, valid):
+    # Average ranks along the last axis over the valid cells (NaN elsewhere)
+    shape = values.shape
+    flat = pd.DataFrame(np.where(valid, values, np.nan).reshape(-1, shape[-1]))
+    return flat.rank(axis=1, method='average').to_numpy().reshape(shape)
+
+def spearman_rows(x, y, min_periods=2):
+    # Spearman coefficient = Pearson over the ranks of the pairwise-complete cells
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return pearson_rows(rank_rows(x, valid), rank_rows(y, valid), min_periods)
+
+def correlate_rows(x, y, method='pearson', min_periods=2):
+    if method == 'pearson': return pearson_rows(x, y, min_periods)
+    if method == 'spearman': return spearman_rows(x, y, min_periods)
+    raise ValueError(f"Unknown correlation method '{method}' (expected one of {CORRELATION_METHODS})")
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. CLIMATE SENSITIVITY TABLES ---
+# ---------------------------------------------------------------------------------------------------
+
+def compute_sensitivity(cube, level, n_years=None, methods=CORRELATION_METHODS):
+    # Correlation and period averages for every series of one level over the trailing window
+    keys = SERIES_LEVELS[level]
+    start_year = window_start_year(cube, n_years)
+    series_index, years, yields, rainfall, present = trend_panel(cube, keys, start_year)
+    table = series_index.to_frame(index=False)
+    table.insert(0, 'level', level)
+    table['label'] = table[keys[-1]].astype(str)
+    if len(years):
+        year_grid = np.where(present, years, np.nan)
+        table['start_year'] = np.nanmin(year_grid, axis=1).astype(int)
+        table['end_year'] = np.nanmax(year_grid, axis=1).astype(int)
+    else:
+        table['start_year'] = table['end_year'] = np.array([], dtype=int)
+    table['years_observed'] = present.sum(axis=1)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # "Mean of empty slice" for series absent from the window
+        table['average_yield'] = np.nanmean(np.where(present, yields, np.nan), axis=1) if len(years) else []
+        table['average_rainfall'] = np.nanmean(np.where(present, rainfall, np.nan), axis=1) if len(years) else []
+    for method in methods:
+        table[method], _ = correlate_rows(yields, rainfall, method)
+    if 'pearson' in methods:
+        table['abs_pearson'] = table['pearson'].abs()
+    if 'state_name' not in table.columns:
+        table.insert(1, 'state_name', 'All India')
+    return table
+
+SENSITIVITY_COLUMNS = ['state_name', 'label', 'start_year', 'end_year', 'years_observed',
+                       'average_yield', 'average_rainfall', 'pearson', 'spearman', 'abs_pearson']
+
+def sensitivity_level(cube, level, n_years=None):
+    # Climate sensitivity table of one level, computed on first use and cached on the cube per
+    # (window start, level). Indexed by (state_name, label) so Q3/Q4 can look up a single coefficient.
+    key = (window_start_year(cube, n_years), level)
+    table = cube.sensitivity.get(key)
+    if table is None:
+        table = compute_sensitivity(cube, level, n_years)[SENSITIVITY_COLUMNS]
+        table['state_name'] = table['state_name'].astype(str)
+        table = table.set_index(['state_name', 'label']).sort_index()
+        cube.sensitivity[key] = table
+    return table
+
+def sensitivity_table(cube, n_years=None):
+    # Every level's table in one frame, indexed by (level, state_name, label)
+    return pd.concat({level: sensitivity_level(cube, level, n_years) for level in SERIES_LEVELS}, names=['level'])
+
+def lookup_correlation(cube, level, state_name, label, n_years, method='pearson'):
+    # Single coefficient from the level's table (NaN when the series has no data in the window)
+    table = sensitivity_level(cube, level, n_years)
+    try:
+        return float(table.at[(state_name, label), method])
+    except KeyError:
+        return np.nan
+
+def rank_climate_sensitivity(cube, level='national_crop', n_years=None, method='pearson', min_years=5, top=None):
+    # Series ordered from most to least rainfall-sensitive (|coefficient|), ignoring short series
+    table = sensitivity_level(cube, level, n_years).reset_index()
+    table = table[(table['years_observed'] >= min_years) & table[method].notna()]
+    table = table.assign(sensitivity=table[method].abs()).sort_values('sensitivity', ascending=False, kind='stable')
+    table = table.reset_index(drop=True)
+    return table.head(top) if top else table
+
+def rolling_correlation(cube, level, window, n_years=None, method='pearson', min_periods=None):
+    # Correlation over every `window`-year span ending at each year, for all series of a level at once
+    keys = SERIES_LEVELS[level]
+    series_index, years, yields, rainfall, _ = trend_panel(cube, keys, window_start_year(cube, n_years))
+    if len(years) < window:
+        return pd.DataFrame(columns=keys + ['window_end_year', method, 'pairs'])
+    x = np.lib.stride_tricks.sliding_window_view(yields, window, axis=1)
+    y = np.lib.stride_tricks.sliding_window_view(rainfall, window, axis=1)
+    coefficients, pairs = correlate_rows(x, y, method, min_periods or window)
+    end_years = years[window - 1:]
+    rolled = series_index.to_frame(index=False).iloc[np.repeat(np.arange(len(series_index)), len(end_years))]
+    rolled = rolled.reset_index(drop=True).assign(
+        window_end_year=np.tile(end_years, len(series_index)),
+        **{method: coefficients.ravel(), 'pairs': pairs.ravel()},
+    )
+    return rolled
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# --- 1. CONFIGURATION ---
+
+DATA_FILE = "Combined_Agri_and_Rainfall.csv"
+
+# Columnar cache lives next to the source CSV and is rebuilt whenever the source changes
+CACHE_DIR = ".samarth_cache"
+CACHE_SCHEMA_VERSION = 3  # bump whenever optimize_master_df changes the cached layout
+
+# The cache is sorted by (state_name, crop_year) and written in row groups of this many rows, so
+# chunked scans (see chunked.py) can stream it and skip row groups outside a state/year predicate
+CACHE_ROW_GROUP_ROWS = 100_000
+
+# Low-cardinality text columns stored as pandas categoricals (dictionary-encoded in Parquet)
+CATEGORICAL_COLUMNS = ['state_name', 'district_name', 'crop', 'crop_type', 'season']
+
+# Any other text column is categorized when its unique values make up less than this share of rows
+CATEGORY_RATIO_THRESHOLD = 0.5
+
+# Crop -> Crop Type mapping used for multi-criteria analysis (Q1, Q3)
+crop_category_map = {
+    'Rice': 'Cereal', 'Wheat': 'Cereal', 'Maize': 'Cereal', 'Jowar': 'Cereal', 'Bajra': 'Cereal',
+    'Ragi': 'Cereal', 'Barley': 'Cereal', 'Total Foodgrain': 'Aggregate', 'Millets Total': 'Aggregate',
+    'Arhar': 'Pulse', 'Moong': 'Pulse', 'Black Gram': 'Pulse', 'Lentil': 'Pulse', 'Gram': 'Pulse',
+    'Peas & Beans': 'Pulse', 'Other Pulses': 'Pulse', 'Pulses Total': 'Aggregate',
+    'Groundnut': 'Oilseed', 'Rapeseed & Mustard': 'Oilseed', 'Soyabean': 'Oilseed', 'Sunflower': 'Oilseed',
+    'Oilseeds Total': 'Aggregate', 'Castor Seed': 'Oilseed', 'Sesamum': 'Oilseed', 'Niger Seed': 'Oilseed',
+    'Linseed': 'Oilseed', 'Sugarcane': 'Commercial', 'Cotton': 'Commercial', 'Jute': 'Commercial',
+    'Sannhamp': 'Commercial', 'Potato': 'Vegetable', 'Onion': 'Vegetable', 'Tomato': 'Vegetable',
+    'Cabbage': 'Vegetable', 'Brinjal': 'Vegetable', 'Garlic': 'Vegetable', 'Bhindi': 'Vegetable',
+    'Peas': 'Vegetable', 'Other Vegetables': 'Vegetable', 'Mango': 'Fruit', 'Banana': 'Fruit',
+    'Citrus Fruit': 'Fruit', 'Other Fruits': 'Fruit', 'Papaya': 'Fruit', 'Watermelon': 'Fruit',
+    'Turmeric': 'Spice', 'Ginger': 'Spice', 'Chillies': 'Spice', 'Black Pepper': 'Spice', 'Cardamom': 'Spice',
+}
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. SOURCE FINGERPRINTING ---
+# ---------------------------------------------------------------------------------------------------
+
+def file_fingerprint(path):
+    # Cheap identity of the source file (size + mtime); safe to call on every Streamlit rerun
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+def file_sha256(path, chunk_size=1 << 20):
+    # Content hash of the source file, only computed when the size/mtime check is inconclusive
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. DTYPE OPTIMIZATION ---
+# ---------------------------------------------------------------------------------------------------
+
+def downcast_numeric(series):
+    # Integers shrink to the smallest dtype that holds them; floats only drop to float32 when lossless
+    if pd.api.types.is_integer_dtype(series):
+        return pd.to_numeric(series, downcast='integer')
+    if pd.api.types.is_float_dtype(series) and series.dtype != np.float32:
+        as_float32 = series.astype(np.float32)
+        if np.array_equal(as_float32.astype(series.dtype).to_numpy(), series.to_numpy(), equal_nan=True):
+            return as_float32
+    return series
+
+def compute_yield(production, area):
+    # Per-row yield (production / area); rows without a positive area get NaN instead of inf/0
+    production = np.asarray(production, dtype='float64')
+    area = np.asarray(area, dtype='float64')
+    cropped = area > 0
+    return np.where(cropped, production / np.where(cropped, area, 1.0), np.nan)
+
+def optimize_master_df(df):
+    # Adds 'crop_type' and the materialized 'yield' column, then converts the raw CSV frame
+    # to its compact in-memory representation
+    df['crop_type'] = df['crop'].map(crop_category_map)
+    df['yield'] = compute_yield(df['production'], df['area'])
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORICAL_COLUMNS:
+            df[col] = series.astype('category')
+        elif pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique(dropna=True) < CATEGORY_RATIO_THRESHOLD * len(series):
+                df[col] = series.astype('category')
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            df[col] = downcast_numeric(series)
+    return df
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. COLUMNAR CACHE ---
+# ---------------------------------------------------------------------------------------------------
+
+def cache_paths(path):
+    # Returns the (parquet, metadata) cache locations for a given source CSV
+    source_dir, source_name = os.path.split(os.path.abspath(path))
+    cache_dir = os.path.join(source_dir, CACHE_DIR)
+    return os.path.join(cache_dir, f"{source_name}.parquet"), os.path.join(cache_dir, f"{source_name}.meta.json")
+
+def read_cache_meta(meta_path):
+    try:
+        with open(meta_path) as handle:
+            return json.load(handle)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def write_cache_meta(meta_path, meta):
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, 'w') as handle:
+        json.dump(meta, handle)
+    os.replace(tmp_path, meta_path)
+
+def is_cache_valid(path, parquet_path, meta_path):
+    # Size + mtime match is trusted; otherwise the content hash decides (e.g. after a `touch` or a re-copy)
+    meta = read_cache_meta(meta_path)
+    if meta is None or meta.get('schema_version') != CACHE_SCHEMA_VERSION or not os.path.exists(parquet_path):
+        return False
+    stat = os.stat(path)
+    if meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+    if meta.get('size') != stat.st_size or meta.get('sha256') != file_sha256(path):
+        return False
+    meta['mtime_ns'] = stat.st_mtime_ns
+    write_cache_meta(meta_path, meta)
+    return True
+
+def build_cache(path):
+    # Parses the CSV once, optimizes dtypes and writes the Parquet cache atomically
+    stat = os.stat(path)
+    df = optimize_master_df(pd.read_csv(path))
+    df = df.sort_values(['state_name', 'crop_year'], kind='stable', ignore_index=True)
+    parquet_path, meta_path = cache_paths(path)
+    try:
+        os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+        tmp_path = f"{parquet_path}.tmp"
+        df.to_parquet(tmp_path, index=False, row_group_size=CACHE_ROW_GROUP_ROWS)
+        os.replace(tmp_path, parquet_path)
+    except (ImportError, OSError):
+        # No Parquet engine installed or read-only deployment: serve the optimized frame uncached
+        return df
+    write_cache_meta(meta_path, {
+        'schema_version': CACHE_SCHEMA_VERSION,
+        'source': os.path.basename(path),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': file_sha256(path),
+        'rows': len(df),
+    })
+    return df
+
+def load_master_df(path=DATA_FILE):
+    # Loads the master dataset from the columnar cache, rebuilding it if the source CSV changed
+    # Raises FileNotFoundError when the source CSV itself is missing
+    parquet_path, meta_path = cache_paths(path)
+    if is_cache_valid(path, parquet_path, meta_path):
+        try:
+            return pd.read_parquet(parquet_path)
+        except (ImportError, OSError, ValueError):
+            pass
+    return build_cache(path)
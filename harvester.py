@@ -0,0 +1,311 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import aiohttp
+import pandas as pd
+
+from ingest import ingest_batches
+from partition_store import STORE_DIR
+
+# Concurrent, resumable harvester for the data.gov.in crop production resource (replaces the serial
+# state -> district -> year loop in Data_analysis.ipynb).
+# Every (state, district, year) slice is paged through concurrently over one pooled HTTP session,
+# with bounded concurrency, a request rate limit and retry/backoff. Completed slices are streamed into
+# the partitioned store in small batches and recorded in a checkpoint file, so an interrupted harvest
+# resumes where it stopped.
+#
+#   export DATA_GOV_API_KEY=...
+#   python harvester.py --start-year 1997 --end-year 2014 --concurrency 8 --rate 10
+#   python mock_datagov.py --port 8089 &   # offline testing / benchmarking
+#   python harvester.py --base-url http://127.0.0.1:8089/resource --store-dir harvest_store
+
+# --- 1. CONFIGURATION ---
+
+RESOURCE_ID = "35be999b-0208-4354-b557-f6ca9a5355de"
+API_BASE_URL = "https://api.data.gov.in/resource"
+API_KEY_ENV = "DATA_GOV_API_KEY"  # the key is never hard-coded or written to the checkpoint
+LIMIT = 500  # records per page (the API maximum used by the notebook)
+
+DEFAULT_CONCURRENCY = 8     # requests in flight
+DEFAULT_RATE = 10.0         # requests per second (0 = unlimited)
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5          # seconds; doubled on each retry, plus jitter
+REQUEST_TIMEOUT = 30        # seconds per request
+FLUSH_ROWS = 5000           # harvested rows buffered before they are appended to the store
+CHECKPOINT_FILE = "harvest_checkpoint.json"
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Target geographies, as harvested for the master dataset
+TARGET_STATES_DISTRICTS = {
+    "Uttar Pradesh": ["MEERUT", "AGRA", "LUCKNOW", "GHAZIABAD", "KANPUR NAGAR",
+                      "VARANASI", "ALIGARH", "MORADABAD", "GORAKHPUR", "ALLAHABAD"],
+    "Madhya Pradesh": ["HOSHANGABAD", "VIDISHA", "SEHORE", "BHOPAL", "INDORE",
+                       "JABALPUR", "GWALIOR", "UJJAIN", "SAGAR", "RATLAM"],
+    "Maharashtra": ["KOLHAPUR", "AHMEDNAGAR", "NAGPUR", "NASHIK", "AURANGABAD",
+                    "SOLAPUR", "AMRAVATI", "THANE", "RAIGAD", "PUNE"],
+    "Karnataka": ["HASSAN", "CHICKMAGALUR", "MYSORE", "DAVANGERE", "SHIMOGA",
+                  "BELGAUM", "GULBARGA", "TUMKUR", "BIJAPUR", "BANGALORE RURAL"],
+    "Gujarat": ["KACHCHH", "SURENDRANAGAR", "SURAT", "VADODARA", "RAJKOT",
+                "BHAVNAGAR", "JAMNAGAR", "GANDHINAGAR", "JUNAGADH"],
+    "Punjab": ["LUDHIANA", "PATIALA", "AMRITSAR", "JALANDHAR", "SANGRUR"],
+    "West Bengal": ["BIRBHUM", "BURDWAN", "HOOGHLY", "NADIA", "MURSHIDABAD", "DARJEELING"],
+    "Rajasthan": ["BARMER", "JODHPUR", "BHARATPUR", "JAIPUR", "DHOLPUR", "KOTA", "BIKANER"],
+    "Haryana": ["KARNAL", "KURUKSHETRA", "PANIPAT", "HISAR", "YAMUNANAGAR", "SIRSA"],
+    "Andhra Pradesh": ["EAST GODAVARI", "WEST GODAVARI", "KRISHNA", "KURNOOL", "ANANTAPUR", "GUNTUR"],
+}
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. RATE LIMITING AND CHECKPOINTS ---
+# ---------------------------------------------------------------------------------------------------
+
+class RateLimiter:
+    # Token bucket shared by all requests: at most `rate` per second, bursts of up to `burst`
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate or 1.0)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if not self.rate: return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Checkpoint:
+    # Slices whose records are already in the store; saved atomically after every flush
+    def __init__(self, path, resource_id=RESOURCE_ID):
+        self.path = path
+        self.resource_id = resource_id
+        self.done = set()
+        self.rows = 0
+        try:
+            with open(path) as handle:
+                state = json.load(handle)
+        except FileNotFoundError:
+            return
+        if state.get('resource_id') != resource_id:
+            raise ValueError(f"Checkpoint '{path}' belongs to resource {state.get('resource_id')}, not {resource_id}")
+        self.done = set(state['done'])
+        self.rows = state['rows']
+
+    def mark_done(self, keys, rows):
+        self.done.update(keys)
+        self.rows += rows
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as handle:
+            json.dump({'resource_id': self.resource_id, 'rows': self.rows, 'done': sorted(self.done)}, handle)
+        os.replace(tmp_path, self.path)
+
+def slice_key(state, district, year):
+    return f"{state}|{district}|{int(year)}"
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. FETCHING ---
+# ---------------------------------------------------------------------------------------------------
+
+class Harvester:
+    # One harvest run: a pooled aiohttp session, a request semaphore, a rate limiter and run statistics
+    def __init__(self, api_key, base_url=API_BASE_URL, resource_id=RESOURCE_ID, concurrency=DEFAULT_CONCURRENCY,
+                 rate=DEFAULT_RATE, max_retries=MAX_RETRIES, limit=LIMIT):
+        self.url = f"{base_url.rstrip('/')}/{resource_id}"
+        self.api_key = api_key
+        self.concurrency = concurrency
+        self.limit = limit
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = RateLimiter(rate)
+        self.stats = {'requests': 0, 'retries': 0, 'failed_slices': 0, 'empty_slices': 0, 'records': 0}
+
+    async def fetch_page(self, session, state, district, year, offset):
+        # One page of records; retries transient failures with exponential backoff + jitter
+        params = {
+            'api-key': self.api_key, 'format': 'json', 'limit': self.limit, 'offset': offset,
+            'filters[state_name]': state, 'filters[district_name]': district, 'filters[crop_year]': str(year),
+        }
+        for attempt in range(self.max_retries + 1):
+            delay = BACKOFF_BASE * 2 ** attempt * (1 + random.random())
+            await self.limiter.acquire()
+            async with self.semaphore:
+                self.stats['requests'] += 1
+                try:
+                    async with session.get(self.url, params=params) as response:
+                        if response.status in RETRY_STATUSES:
+                            retry_after = response.headers.get('Retry-After')
+                            if retry_after and retry_after.isdigit():
+                                delay = max(delay, float(retry_after))
+                            error = f"HTTP {response.status}"
+                        else:
+                            response.raise_for_status()
+                            return await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                    if isinstance(exc, aiohttp.ClientResponseError) and exc.status not in RETRY_STATUSES:
+                        raise RuntimeError(f"HTTP {exc.status} for {state}/{district}/{year}") from None
+                    error = type(exc).__name__
+            if attempt < self.max_retries:
+                self.stats['retries'] += 1
+                await asyncio.sleep(delay)
+        raise RuntimeError(f"{error} after {self.max_retries} retries for {state}/{district}/{year} offset {offset}")
+
+    async def fetch_slice(self, session, state, district, year):
+        # Every record of one (state, district, year): the first page reports the total, the rest are fetched concurrently
+        first = await self.fetch_page(session, state, district, year, 0)
+        records = list(first.get('records', []))
+        total = int(first.get('total', len(records)) or 0)
+        pages = await asyncio.gather(*[
+            self.fetch_page(session, state, district, year, offset) for offset in range(self.limit, total, self.limit)
+        ])
+        for page in pages:
+            records.extend(page.get('records', []))
+        return records
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. HARVEST LOOP ---
+# ---------------------------------------------------------------------------------------------------
+
+def harvest_slices(targets, years):
+    return [(state, district, year) for state, districts in targets.items() for district in districts for year in years]
+
+async def run_harvest(api_key, store_dir=STORE_DIR, checkpoint_path=CHECKPOINT_FILE, targets=TARGET_STATES_DISTRICTS,
+                      years=range(1997, 2015), base_url=API_BASE_URL, resource_id=RESOURCE_ID,
+                      concurrency=DEFAULT_CONCURRENCY, rate=DEFAULT_RATE, flush_rows=FLUSH_ROWS, progress=None):
+    # Harvests every slice not yet in the checkpoint and returns the run statistics.
+    # Fetchers hand finished slices to a single writer, which appends them to the store in batches of
+    # ~flush_rows records and only then checkpoints them; a crash at worst re-fetches unflushed slices.
+    # Every record is tagged with its slice and the store records the slices it holds, so slices that
+    # were stored but not yet checkpointed when the harvest died are skipped on the next run.
+    checkpoint = Checkpoint(checkpoint_path, resource_id)
+    harvester = Harvester(api_key, base_url, resource_id, concurrency, rate)
+    todo = [s for s in harvest_slices(targets, years) if slice_key(*s) not in checkpoint.done]
+    harvester.stats.update(slices=len(todo), skipped_slices=len(harvest_slices(targets, years)) - len(todo), stored_rows=0)
+    started = time.monotonic()
+
+    slices = asyncio.Queue()
+    for item in todo:
+        slices.put_nowait(item)
+    finished = asyncio.Queue(maxsize=concurrency * 2)  # back-pressure: fetchers wait while the writer flushes
+
+    async def fetcher(session):
+        while True:
+            try:
+                state, district, year = slices.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                records = await harvester.fetch_slice(session, state, district, year)
+            except RuntimeError as exc:
+                # Left out of the checkpoint, so the next run retries it
+                harvester.stats['failed_slices'] += 1
+                print(f"Skipping {state}/{district}/{year}: {exc}", file=sys.stderr)
+                continue
+            await finished.put((slice_key(state, district, year), records))
+
+    async def writer():
+        keys, buffered, sources = [], [], []
+        def store_batch(keys, records, sources):
+            # Append + checkpoint in one thread call, so cancelling the harvest cannot separate them
+            report = {'stored_rows': 0}
+            if records:
+                batch = pd.DataFrame(records).assign(harvest_slice=sources)
+                report = ingest_batches(agri=batch, store_dir=store_dir, source_column='harvest_slice')
+            checkpoint.mark_done(keys, len(records))
+            return report
+        async def flush():
+            report = await asyncio.to_thread(store_batch, list(keys), list(buffered), list(sources))
+            harvester.stats['stored_rows'] += report['stored_rows']
+            if progress: progress(len(checkpoint.done), len(buffered), harvester.stats)
+            keys.clear()
+            buffered.clear()
+            sources.clear()
+        while True:
+            item = await finished.get()
+            if item is None: break
+            key, records = item
+            keys.append(key)
+            buffered.extend(records)
+            sources.extend([f"{resource_id}/{key}"] * len(records))
+            harvester.stats['records'] += len(records)
+            if not records:
+                harvester.stats['empty_slices'] += 1
+            if len(buffered) >= flush_rows:
+                await flush()
+        if keys:
+            await flush()
+
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+    connector = aiohttp.TCPConnector(limit=concurrency, limit_per_host=concurrency, keepalive_timeout=60)
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        writing = asyncio.create_task(writer())
+        fetching = asyncio.gather(*[fetcher(session) for _ in range(concurrency)])
+        await asyncio.wait([writing, fetching], return_when=asyncio.FIRST_COMPLETED)
+        if writing.done():
+            # The writer only stops early when appending to the store failed
+            fetching.cancel()
+            await asyncio.gather(fetching, return_exceptions=True)
+            writing.result()
+        try:
+            await fetching
+        finally:
+            await finished.put(None)
+            await writing
+
+    elapsed = time.monotonic() - started
+    harvester.stats.update(elapsed_seconds=round(elapsed, 3), requests_per_second=round(harvester.stats['requests'] / elapsed, 1) if elapsed else None)
+    return harvester.stats
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 5. COMMAND LINE ---
+# ---------------------------------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Harvest crop production records from data.gov.in into the partitioned store.")
+    parser.add_argument('--api-key', default=os.environ.get(API_KEY_ENV), help=f"Default: ${API_KEY_ENV}")
+    parser.add_argument('--base-url', default=API_BASE_URL)
+    parser.add_argument('--resource-id', default=RESOURCE_ID)
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    parser.add_argument('--checkpoint', default=CHECKPOINT_FILE)
+    parser.add_argument('--start-year', type=int, default=1997)
+    parser.add_argument('--end-year', type=int, default=2014)
+    parser.add_argument('--states', nargs='+', help="Default: every state in TARGET_STATES_DISTRICTS")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=DEFAULT_RATE, help="Requests per second (0 = unlimited)")
+    parser.add_argument('--flush-rows', type=int, default=FLUSH_ROWS)
+    args = parser.parse_args(argv)
+
+    api_key = args.api_key
+    if not api_key:
+        if args.base_url == API_BASE_URL:
+            parser.error(f"an API key is required: set ${API_KEY_ENV} or pass --api-key")
+        api_key = 'offline'  # the mock server does not check keys unless started with one
+    targets = {state: TARGET_STATES_DISTRICTS[state] for state in args.states} if args.states else TARGET_STATES_DISTRICTS
+
+    def progress(done, rows, stats):
+        print(f"{done} slices checkpointed (+{rows} records, {stats['requests']} requests, {stats['retries']} retries)", file=sys.stderr)
+
+    stats = asyncio.run(run_harvest(
+        api_key, store_dir=args.store_dir, checkpoint_path=args.checkpoint, targets=targets,
+        years=range(args.start_year, args.end_year + 1), base_url=args.base_url, resource_id=args.resource_id,
+        concurrency=args.concurrency, rate=args.rate, flush_rows=args.flush_rows, progress=progress,
+    ))
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
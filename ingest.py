@@ -0,0 +1,284 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DATA_FILE, crop_category_map, load_master_df
+from partition_store import (
+    STORE_DIR, append_rows, commit_version, empty_manifest, is_store, partition_key, read_manifest, read_partition_parts,
+    read_pending, read_reference, rewrite_partition, store_lock, write_pending, write_reference,
+)
+
+# Incremental ingestion of crop production and IMD rainfall batches into the partitioned store.
+# Batches go through the same cleaning as EDA_crop_production.ipynb / EDA_IMD_Rainfall.ipynb, are
+# merged on (state_name, crop_year) and appended to their (state, year) partitions; only the touched
+# partitions are re-aggregated. A running app picks the new store version up on its next rerun.
+#
+# Every ingested row keeps the sub-division it was merged with, so a partition is always its agriculture
+# rows x every reference rainfall row of its (state, year). Rainfall that adds or corrects a sub-division
+# of an already stored (state, year) rebuilds that partition, and the result does not depend on the
+# order in which batches arrive. Rows seeded from the merged CSV have no sub-division (the CSV does not
+# record it); they keep the rainfall of the notebook merge and are carried over unchanged by rebuilds.
+#
+#   python ingest.py seed --csv Combined_Agri_and_Rainfall.csv
+#   python ingest.py add --agri crop_production_2015.csv --rainfall imd_rainfall_2015.csv
+#   python ingest.py status
+
+# --- 1. NORMALIZATION MAPPINGS (from the EDA notebooks) ---
+
+AGRI_RENAME = {'area_': 'area', 'production_': 'production'}
+
+# Key = non-standard crop name (after title-casing), Value = standard name
+crop_mapping = {
+    'Arhar/Tur': 'Arhar', 'Moong(Green Gram)': 'Moong', 'Urad': 'Black Gram', 'Masoor': 'Lentil',
+    'Peas & Beans (Pulses)': 'Peas & Beans', 'Paddy': 'Rice', 'Dry Chillies': 'Chillies', 'Dry Ginger': 'Ginger',
+    'Sweet Potato': 'Sweetpotato', 'Other Kharif Pulses': 'Other Pulses', 'Other Rabi Pulses': 'Other Pulses',
+    'Other Misc. Pulses': 'Other Pulses', 'Pulses Total': 'Pulses Total', 'Cashewnut Processed': 'Cashewnut',
+    'Cashewnut Raw': 'Cashewnut', 'Atcanut (Raw)': 'Arecanut', 'Other Oilseeds': 'Oilseeds Total',
+    'Small Millets': 'Millets Total', 'Other Cereals & Millets': 'Millets Total', 'Horse-Gram': 'Horse Gram',
+    'Cowpea(Lobia)': 'Cowpea', 'Other Fresh Fruits': 'Other Fruits', 'Pome Granet': 'Pomegranate',
+    'Peas  (Vegetable)': 'Peas', 'Beans & Mutter(Vegetable)': 'Beans & Mutter', 'Cotton(Lint)': 'Cotton',
+    'Rapeseed &Mustard': 'Rapeseed & Mustard', 'Other  Rabi Pulses': 'Other Pulses', 'Arcanut (Processed)': 'Arecanut',
+}
+
+# IMD column names (both the MAM/JJAS/OND and the month-range spellings) -> master column names
+RAINFALL_RENAME = {
+    'SUBDIVISION': 'subdivision', 'YEAR': 'crop_year', 'ANNUAL': 'annual_rainfall_mm',
+    'MAM': 'summer_rainfall', 'Mar-May': 'summer_rainfall',
+    'JJAS': 'kharif_season_rainfall', 'Jun-Sep': 'kharif_season_rainfall',
+    'OND': 'rabi_start_rainfall', 'Oct-Dec': 'rabi_start_rainfall',
+}
+
+# IMD sub-division (title case) -> agricultural state name
+state_consolidation_mapping = {
+    'East Uttar Pradesh': 'Uttar Pradesh', 'West Uttar Pradesh': 'Uttar Pradesh',
+    'West Madhya Pradesh': 'Madhya Pradesh', 'East Madhya Pradesh': 'Madhya Pradesh',
+    'Konkan & Goa': 'Maharashtra', 'Madhya Maharashtra': 'Maharashtra', 'Matathwada': 'Maharashtra', 'Vidarbha': 'Maharashtra',
+    'Coastal Karnataka': 'Karnataka', 'North Interior Karnataka': 'Karnataka', 'South Interior Karnataka': 'Karnataka',
+    'Gujarat Region': 'Gujarat', 'Saurashtra & Kutch': 'Gujarat',
+    'Sub Himalayan West Bengal & Sikkim': 'West Bengal', 'Gangetic West Bengal': 'West Bengal',
+    'West Rajasthan': 'Rajasthan', 'East Rajasthan': 'Rajasthan',
+    'Haryana Delhi & Chandigarh': 'Haryana',
+    'Coastal Andhra Pradesh': 'Andhra Pradesh', 'Rayalseema': 'Andhra Pradesh', 'Telangana': 'Andhra Pradesh',
+    'Punjab': 'Punjab',
+    'Orissa': 'Odisha', 'Naga Mani Mizo Tripura': 'North East States',
+}
+
+# Rainfall rows missing any of these are dropped (as in the notebook)
+KEY_RAINFALL_COLUMNS = ['annual_rainfall_mm', 'kharif_season_rainfall', 'rabi_start_rainfall']
+
+AGRI_COLUMNS = ['state_name', 'district_name', 'crop_year', 'season', 'crop', 'crop_type', 'area', 'production']
+RAINFALL_COLUMNS = ['subdivision', 'state_name', 'crop_year', 'annual_rainfall_mm', 'summer_rainfall',
+                    'kharif_season_rainfall', 'rabi_start_rainfall']
+RAINFALL_VALUES = RAINFALL_COLUMNS[3:]
+MERGE_KEYS = ['state_name', 'crop_year']
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. BATCH NORMALIZATION ---
+# ---------------------------------------------------------------------------------------------------
+
+def normalize_agri_batch(df):
+    # Crop production rows -> AGRI_COLUMNS (renames, numeric coercion, crop synonyms, crop_type)
+    df = df.rename(columns=AGRI_RENAME).copy()
+    missing = [col for col in AGRI_COLUMNS if col not in df.columns and col != 'crop_type']
+    if missing:
+        raise ValueError(f"Agriculture batch is missing column(s): {', '.join(missing)}")
+    df['production'] = pd.to_numeric(df['production'], errors='coerce')
+    df['area'] = pd.to_numeric(df['area'], errors='coerce')
+    df['crop_year'] = pd.to_numeric(df['crop_year'], errors='coerce')
+    df = df.dropna(subset=['production', 'crop_year'])
+    df['crop_year'] = df['crop_year'].astype('int64')
+    df['district_name'] = df['district_name'].astype(str).str.strip().str.title()
+    df['crop'] = df['crop'].astype(str).str.strip().str.title().replace(crop_mapping)
+    df['state_name'] = df['state_name'].astype(str).str.strip()
+    df['season'] = df['season'].astype(str).str.strip()
+    df['crop_type'] = df['crop'].map(crop_category_map)
+    return df[AGRI_COLUMNS].reset_index(drop=True)
+
+def normalize_rainfall_batch(df):
+    # IMD sub-division rows -> RAINFALL_COLUMNS, with every sub-division mapped onto its state
+    df = df.rename(columns=RAINFALL_RENAME).copy()
+    missing = [col for col in ['subdivision', 'crop_year', 'annual_rainfall_mm'] if col not in df.columns]
+    if missing:
+        raise ValueError(f"Rainfall batch is missing column(s): {', '.join(missing)}")
+    df = df.reindex(columns=[col for col in RAINFALL_COLUMNS if col != 'state_name'])
+    for col in RAINFALL_COLUMNS[2:]:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    df[RAINFALL_VALUES] = df[RAINFALL_VALUES].astype('float64')
+    df = df.dropna(subset=['crop_year'] + KEY_RAINFALL_COLUMNS)
+    df['crop_year'] = df['crop_year'].astype('int64')
+    df['subdivision'] = df['subdivision'].astype(str).str.strip().str.title()
+    df['state_name'] = df['subdivision'].replace(state_consolidation_mapping).str.strip().str.title()
+    return df[RAINFALL_COLUMNS].reset_index(drop=True)
+
+def merge_batches(agri, rainfall):
+    # Inner merge on (state_name, crop_year) exactly like the notebook: one row per agriculture row
+    # and rainfall sub-division of its state (the sub-division is kept so the partition can be rebuilt)
+    master = pd.merge(agri, rainfall, on=MERGE_KEYS, how='inner')
+    master['production'] = master['production'].fillna(0)
+    master['area'] = master['area'].fillna(0)
+    return master
+
+def stored_agri_rows(part):
+    # Agriculture rows of one ingested part file: each was merged with the same sub-divisions, so the
+    # rows of any one sub-division are exactly the part's agriculture rows (duplicates included)
+    if part.empty: return part.reindex(columns=AGRI_COLUMNS)
+    return part.loc[part['subdivision'] == part['subdivision'].iloc[0], AGRI_COLUMNS]
+
+def rebuild_partitions(store_dir, manifest, partitions, reference, new_rows=None):
+    # Re-merges the ingested agriculture rows of the given partitions with their current reference
+    # rainfall; seeded rows (no sub-division) are kept as they are. new_rows (already merged with the
+    # same reference) are folded into the rebuilt partitions instead of being appended separately.
+    rebuilt = {}
+    for state_name, crop_year in partitions:
+        parts = read_partition_parts(store_dir, manifest, state_name, crop_year)
+        seeded = [part[part['subdivision'].isna()] for part in parts]
+        agri = [stored_agri_rows(part[part['subdivision'].notna()]) for part in parts]
+        rainfall = reference[(reference['state_name'] == state_name) & (reference['crop_year'] == crop_year)]
+        added = [] if new_rows is None else [new_rows[(new_rows['state_name'] == state_name) & (new_rows['crop_year'] == crop_year)]]
+        rows = pd.concat(seeded + [merge_batches(pd.concat(agri, ignore_index=True), rainfall)] + added, ignore_index=True)
+        rebuilt[(state_name, crop_year)] = rewrite_partition(store_dir, state_name, crop_year, rows)
+    return rebuilt
+
+def read_batch(path):
+    # CSV or Parquet batch file
+    return pd.read_parquet(path) if path.endswith('.parquet') else pd.read_csv(path)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. INGESTION ---
+# ---------------------------------------------------------------------------------------------------
+
+def ingest_batches(agri=None, rainfall=None, store_dir=STORE_DIR, source_column=None):
+    # Normalizes and appends one agriculture and/or rainfall batch, returning an ingestion report.
+    # Agriculture rows whose (state, year) has no rainfall yet wait in pending files and are
+    # materialized by the rainfall batch that completes them. Rainfall that is new or corrected
+    # (the latest value of a sub-division wins) for an already stored (state, year) rebuilds that partition.
+    # With source_column, agriculture rows whose source (e.g. harvest slice) an earlier ingestion already
+    # stored are skipped and the new sources are recorded in the same manifest commit, so re-ingesting a
+    # batch is a no-op.
+    with store_lock(store_dir):
+        try:
+            manifest = read_manifest(store_dir)
+        except FileNotFoundError:
+            manifest = empty_manifest()
+
+        reference = read_reference(store_dir, manifest)
+        known_rainfall = 0 if reference is None else len(reference)
+        changed_rainfall, touched, rainfall_file = 0, [], None
+        if rainfall is not None:
+            batch = normalize_rainfall_batch(rainfall).drop_duplicates(['subdivision', 'crop_year'], keep='last')
+            if reference is not None:
+                unchanged = batch.merge(reference, on=RAINFALL_COLUMNS, how='left', indicator=True)['_merge'].eq('both').to_numpy()
+                batch = batch[~unchanged]
+            changed_rainfall = len(batch)
+            if len(batch):
+                reference = batch if reference is None else pd.concat([reference, batch], ignore_index=True)
+                reference = reference.drop_duplicates(['subdivision', 'crop_year'], keep='last').reset_index(drop=True)
+                rainfall_file = write_reference(store_dir, reference)
+                touched = sorted({(str(state_name), int(crop_year)) for state_name, crop_year in batch[MERGE_KEYS].itertuples(index=False)
+                                  if partition_key(state_name, crop_year) in manifest['partitions']})
+
+        sources, skipped = set(), 0
+        if agri is not None and source_column is not None:
+            fresh = ~agri[source_column].isin(manifest['sources'])
+            sources, skipped = set(agri.loc[fresh, source_column]), int((~fresh).sum())
+            agri = agri[fresh]
+        # Pending files are only re-read when the reference gained rainfall that may complete them
+        gained_rainfall = reference is not None and len(reference) > known_rainfall
+        pending = read_pending(store_dir, manifest) if gained_rainfall else None
+        candidates = [frame for frame in (pending, None if agri is None else normalize_agri_batch(agri)) if frame is not None]
+        candidates = pd.concat(candidates, ignore_index=True) if candidates else pd.DataFrame(columns=AGRI_COLUMNS)
+
+        if reference is not None and len(candidates):
+            covered = pd.MultiIndex.from_frame(reference[MERGE_KEYS].drop_duplicates())
+            ready = pd.MultiIndex.from_frame(candidates[MERGE_KEYS]).isin(covered)
+        else:
+            ready = pd.Series(False, index=candidates.index).to_numpy()
+        rows = merge_batches(candidates[ready], reference) if ready.any() else candidates.iloc[:0]
+        waiting = candidates[~ready].reset_index(drop=True)
+        if pending is not None:
+            # Rewritten as a single file: whatever the new rainfall did not complete
+            pending_files = [write_pending(store_dir, waiting)] if len(waiting) else []
+        else:
+            pending_files = manifest['pending'] + [write_pending(store_dir, waiting)] if len(waiting) else None
+
+        # Partitions whose rainfall changed are rebuilt together with this batch's rows for them, so
+        # their aggregates are computed once from the final rows
+        in_rebuilt = pd.MultiIndex.from_frame(rows[MERGE_KEYS]).isin(touched) if len(rows) and touched else np.zeros(len(rows), dtype=bool)
+        rebuilt = rebuild_partitions(store_dir, manifest, touched, reference, rows[in_rebuilt])
+        appended = rows[~in_rebuilt]
+        partition_rows = append_rows(store_dir, manifest, appended) if len(appended) else {}
+        if partition_rows or rebuilt or pending_files is not None or sources or rainfall_file is not None:
+            manifest = commit_version(store_dir, manifest, partition_rows, rebuilt, pending_files, sources, rainfall_file)
+        return {
+            'version': manifest['version'],
+            'agri_rows': 0 if agri is None else len(agri),
+            'skipped_rows': skipped,
+            'rainfall_rows': changed_rainfall,
+            'stored_rows': len(rows),
+            'pending_agri_rows': sum(item['rows'] for item in manifest['pending']),
+            'partitions': [f"{state_name} {crop_year}" for state_name, crop_year in partition_rows],
+            'rebuilt_partitions': [f"{state_name} {crop_year}" for state_name, crop_year in rebuilt],
+        }
+
+def seed_store(csv_path=DATA_FILE, store_dir=STORE_DIR):
+    # One-off import of the existing merged CSV as the store's first version
+    with store_lock(store_dir):
+        try:
+            manifest = read_manifest(store_dir)
+        except FileNotFoundError:
+            manifest = empty_manifest()
+        if manifest['partitions']:
+            raise ValueError(f"Store '{store_dir}' already holds data; use 'add' for new batches")
+        partition_rows = append_rows(store_dir, manifest, load_master_df(csv_path))
+        manifest = commit_version(store_dir, manifest, partition_rows)
+        return {'version': manifest['version'], 'stored_rows': sum(written['rows'] for written in partition_rows.values()),
+                'partitions': len(partition_rows)}
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. COMMAND LINE ---
+# ---------------------------------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incrementally ingest crop production and IMD rainfall batches.")
+    parser.add_argument('--store-dir', default=STORE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    seed = commands.add_parser('seed', help="Import the existing merged CSV as the first store version")
+    seed.add_argument('--csv', default=DATA_FILE)
+    add = commands.add_parser('add', help="Append agriculture and/or rainfall batch files (CSV or Parquet)")
+    add.add_argument('--agri', nargs='+', default=[])
+    add.add_argument('--rainfall', nargs='+', default=[])
+    commands.add_parser('status', help="Show the store version and partition counts")
+    args = parser.parse_args(argv)
+
+    if args.command == 'seed':
+        print(seed_store(args.csv, args.store_dir))
+    elif args.command == 'add':
+        if not args.agri and not args.rainfall:
+            parser.error("add needs at least one --agri or --rainfall file")
+        if not is_store(args.store_dir) and os.path.exists(DATA_FILE):
+            # Otherwise the first batch alone would replace the CSV as the app's data source
+            sys.exit(f"No store at '{args.store_dir}' yet: run 'python ingest.py seed' to import '{DATA_FILE}' first")
+        # Rainfall first, so agriculture rows of the same delivery find their rainfall immediately
+        for path in args.rainfall:
+            print(os.path.basename(path), ingest_batches(rainfall=read_batch(path), store_dir=args.store_dir))
+        for path in args.agri:
+            print(os.path.basename(path), ingest_batches(agri=read_batch(path), store_dir=args.store_dir))
+    else:
+        try:
+            manifest = read_manifest(args.store_dir)
+        except FileNotFoundError:
+            sys.exit(f"No store at '{args.store_dir}' (run 'python ingest.py seed' first)")
+        print(f"version {manifest['version']} (updated {manifest['updated_at']}): "
+              f"{len(manifest['partitions'])} partitions, {sum(p['rows'] for p in manifest['partitions'].values())} rows, "
+              f"{sum(item['rows'] for item in manifest['pending'])} pending agriculture rows "
+              f"in {len(manifest['pending'])} file(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Hot-path instrumentation for the Q1-Q4 pipelines. A request is traced with `tracing(question)`;
+# the analytical helpers mark their filter / aggregate / compute steps with `stage(...)` and the
+# UI (or the API's JSON encoding) marks render. Outside a trace `stage` is a no-op, so batch runs
+# and benchmarks pay nothing. QuestionMetrics keeps rolling p50/p95 latencies, per-stage timings,
+# row counts and cache hit rates per question type, for the sidebar panel and GET /metrics.
+#
+# Profiling is opt-in (SAMARTH_PROFILE=cprofile|tracemalloc|all): each cache miss is then run under
+# cProfile and/or tracemalloc and the last report per question is kept next to its metrics.
+
+# --- 1. CONFIGURATION ---
+
+PROFILE_MODES = ('off', 'cprofile', 'tracemalloc', 'all')
+PROFILE_MODE = os.environ.get('SAMARTH_PROFILE', 'off')
+LATENCY_WINDOW = 1024  # most recent requests kept per question for the percentiles
+PROFILE_TOP = 25       # functions listed in a cProfile report
+STAGES = ('filter', 'aggregate', 'compute', 'render')
+
+_local = threading.local()
+_profile_lock = threading.Lock()  # cProfile and tracemalloc are process-wide; one capture at a time
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. REQUEST TRACES ---
+# ---------------------------------------------------------------------------------------------------
+
+class Trace:
+    # Timings of one question request: total seconds, {stage: [seconds, rows]}, cache outcome, profile
+    def __init__(self, question, profile_mode=PROFILE_MODE):
+        self.question = question
+        self.profile_mode = profile_mode
+        self.seconds = 0.0
+        self.stages = {}
+        self.cache_hit = True   # flipped by profiled() when the question function actually runs
+        self.profile = None     # {'cprofile': report text, 'peak_bytes': int} for profiled misses
+
+    def add(self, name, seconds, rows=None):
+        entry = self.stages.setdefault(name, [0.0, None])
+        entry[0] += seconds
+        if rows is not None:
+            entry[1] = (entry[1] or 0) + int(rows)
+
+def current_trace():
+    return getattr(_local, 'trace', None)
+
+@contextmanager
+def tracing(question, profile_mode=PROFILE_MODE):
+    # Installs a Trace for the current thread; its total time is set when the block exits
+    trace, previous = Trace(question, profile_mode), current_trace()
+    _local.trace = trace
+    started = time.perf_counter()
+    try:
+        yield trace
+    finally:
+        trace.seconds = time.perf_counter() - started
+        _local.trace = previous
+
+class StageTimer:
+    # Times one stage of the active trace; assign .rows inside the block to record the rows it produced
+    __slots__ = ('name', 'rows', 'trace', 'started')
+
+    def __init__(self, name, rows=None):
+        self.name, self.rows = name, rows
+
+    def __enter__(self):
+        self.trace = current_trace()
+        if self.trace is not None:
+            self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.trace is not None:
+            self.trace.add(self.name, time.perf_counter() - self.started, self.rows)
+        return False
+
+def stage(name, rows=None):
+    return StageTimer(name, rows)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. PROFILING ---
+# ---------------------------------------------------------------------------------------------------
+
+def run_profiled(trace, function, args, kwargs):
+    # Runs function under the trace's profilers; skipped (plain call) while another request holds them
+    use_cprofile = trace.profile_mode in ('cprofile', 'all')
+    use_tracemalloc = trace.profile_mode in ('tracemalloc', 'all')
+    if not (use_cprofile or use_tracemalloc) or not _profile_lock.acquire(blocking=False):
+        return function(*args, **kwargs)
+    profiler = cProfile.Profile() if use_cprofile else None
+    started_tracing = use_tracemalloc and not tracemalloc.is_tracing()
+    try:
+        if use_tracemalloc:
+            if started_tracing: tracemalloc.start()
+            tracemalloc.reset_peak()
+        if profiler is not None: profiler.enable()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            if profiler is not None: profiler.disable()
+            trace.profile = {}
+            if use_tracemalloc:
+                trace.profile['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+                if started_tracing: tracemalloc.stop()
+            if profiler is not None:
+                report = io.StringIO()
+                pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(PROFILE_TOP)
+                trace.profile['cprofile'] = report.getvalue()
+    finally:
+        _profile_lock.release()
+
+def profiled(function):
+    # Wraps a question function: a call inside a trace marks a cache miss and is profiled when enabled
+    @functools.wraps(function)
+    def run(*args, **kwargs):
+        trace = current_trace()
+        if trace is None:
+            return function(*args, **kwargs)
+        trace.cache_hit = False
+        return run_profiled(trace, function, args, kwargs)
+    return run
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. ROLLING METRICS ---
+# ---------------------------------------------------------------------------------------------------
+
+def percentiles_ms(samples):
+    if not samples: return {'p50_ms': None, 'p95_ms': None, 'max_ms': None}
+    values = np.fromiter(samples, dtype='float64') * 1000
+    p50, p95 = np.percentile(values, [50, 95])
+    return {'p50_ms': round(float(p50), 3), 'p95_ms': round(float(p95), 3), 'max_ms': round(float(values.max()), 3)}
+
+class QuestionMetrics:
+    # Thread-safe rolling latency, stage, row-count and cache-hit statistics per question type
+    def __init__(self, window=LATENCY_WINDOW, profile_mode=PROFILE_MODE):
+        self.window = window
+        self.profile_mode = profile_mode
+        self._lock = threading.Lock()
+        self._latency = defaultdict(lambda: deque(maxlen=window))
+        self._stages = defaultdict(lambda: deque(maxlen=window))   # (question, stage) -> seconds
+        self._rows = {}                                             # (question, stage) -> rows of the last miss
+        self._requests = defaultdict(int)
+        self._hits = defaultdict(int)
+        self._profiles = {}
+
+    @contextmanager
+    def observe(self, question):
+        # Traces one request in this process and records it when the block exits
+        with tracing(question, self.profile_mode) as trace:
+            yield trace
+        self.record(trace)
+
+    def record(self, trace):
+        # Also used for traces shipped back from worker processes (see api.py)
+        with self._lock:
+            question = trace.question
+            self._requests[question] += 1
+            self._hits[question] += trace.cache_hit
+            self._latency[question].append(trace.seconds)
+            for name, (seconds, rows) in trace.stages.items():
+                self._stages[question, name].append(seconds)
+                if rows is not None:
+                    self._rows[question, name] = rows
+            if trace.profile:
+                self._profiles[question] = trace.profile
+
+    def reset(self):
+        with self._lock:
+            for store in (self._latency, self._stages, self._rows, self._requests, self._hits, self._profiles):
+                store.clear()
+
+    def summary(self, caches=()):
+        # JSON-ready snapshot: per question latency percentiles, hit rate and per-stage breakdown
+        with self._lock:
+            questions = {}
+            for question in sorted(self._requests):
+                requests, hits = self._requests[question], self._hits[question]
+                stages = {}
+                for name in STAGES + tuple(sorted({s for q, s in self._stages if q == question} - set(STAGES))):
+                    samples = self._stages.get((question, name))
+                    if samples:
+                        stages[name] = {**percentiles_ms(samples), 'rows': self._rows.get((question, name))}
+                questions[question] = {
+                    'requests': requests, 'cache_hits': hits, 'cache_hit_rate': hits / requests if requests else 0.0,
+                    'latency': percentiles_ms(self._latency[question]), 'stages': stages,
+                }
+            payload = {'profile_mode': self.profile_mode, 'window': self.window, 'questions': questions}
+            if self._profiles:
+                payload['profiles'] = dict(self._profiles)
+        if caches:
+            payload['caches'] = [cache.stats() for cache in caches]
+        return payload
@@ -0,0 +1,117 @@
+import argparse
+import asyncio
+import random
+import zlib
+
+from aiohttp import web
+
+from harvester import RESOURCE_ID, TARGET_STATES_DISTRICTS
+
+# Local stand-in for the data.gov.in crop production resource, for testing and benchmarking the
+# harvester offline. Records are generated deterministically per (state, district, year) slice, so
+# repeated or resumed harvests see exactly the same data.
+#
+#   python mock_datagov.py --port 8089 --latency 0.05 --failure-rate 0.05
+#   GET /resource/<resource id>?api-key=...&format=json&limit=500&offset=0
+#       &filters[state_name]=Karnataka&filters[district_name]=HASSAN&filters[crop_year]=2005
+
+# --- 1. CONFIGURATION ---
+
+MOCK_YEARS = range(1997, 2015)
+MIN_RECORDS, MAX_RECORDS = 0, 1200  # per slice, so both empty slices and multi-page slices occur
+
+# Raw crop spellings as served by the API (normalized later by ingest.py)
+MOCK_CROPS = ['Rice', 'Paddy', 'Wheat', 'Maize', 'Jowar', 'Bajra', 'Arhar/Tur', 'Moong(Green Gram)', 'Urad',
+              'Groundnut', 'Soyabean', 'Sunflower', 'Rapeseed &Mustard', 'Sugarcane', 'Cotton(lint)', 'Potato',
+              'Onion', 'Banana', 'Turmeric', 'Dry chillies']
+MOCK_SEASONS = ['Kharif     ', 'Rabi       ', 'Whole Year ', 'Summer     ']
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. SYNTHETIC RECORDS ---
+# ---------------------------------------------------------------------------------------------------
+
+def slice_records(state, district, year):
+    # Deterministic records of one (state, district, year) slice; empty for unknown slices
+    if district not in TARGET_STATES_DISTRICTS.get(state, []) or year not in MOCK_YEARS:
+        return []
+    rng = random.Random(zlib.crc32(f"{state}|{district}|{year}".encode()))
+    records = []
+    for _ in range(rng.randint(MIN_RECORDS, MAX_RECORDS)):
+        area = round(rng.uniform(1, 5000), 1)
+        production = 'NA' if rng.random() < 0.03 else str(round(area * rng.uniform(0.3, 4.0), 1))
+        records.append({
+            'state_name': state, 'district_name': district, 'crop_year': str(year),
+            'season': rng.choice(MOCK_SEASONS), 'crop': rng.choice(MOCK_CROPS),
+            'area_': str(area), 'production_': production,
+        })
+    return records
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. SERVER ---
+# ---------------------------------------------------------------------------------------------------
+
+def make_app(api_key=None, latency=0.0, failure_rate=0.0, seed=0):
+    # aiohttp application serving the resource with optional latency, injected failures and key check
+    rng = random.Random(seed)
+    cache = {}
+    stats = {'requests': 0, 'failures': 0}
+
+    async def resource(request):
+        stats['requests'] += 1
+        if request.match_info['resource_id'] != RESOURCE_ID:
+            return web.json_response({'error': 'Resource not found'}, status=404)
+        if api_key is not None and request.query.get('api-key') != api_key:
+            return web.json_response({'error': 'Invalid API key'}, status=403)
+        if latency:
+            await asyncio.sleep(latency * rng.uniform(0.5, 1.5))
+        if rng.random() < failure_rate:
+            stats['failures'] += 1
+            status = rng.choice([429, 502, 503])
+            return web.json_response({'error': 'Injected failure'}, status=status, headers={'Retry-After': '0'} if status == 429 else None)
+        try:
+            limit = int(request.query.get('limit', 10))
+            offset = int(request.query.get('offset', 0))
+            year = int(request.query.get('filters[crop_year]', 0))
+        except ValueError:
+            return web.json_response({'error': 'Bad limit/offset/crop_year'}, status=400)
+        key = (request.query.get('filters[state_name]'), request.query.get('filters[district_name]'), year)
+        if key not in cache:
+            cache[key] = slice_records(*key)
+        records = cache[key]
+        page = records[offset:offset + limit]
+        return web.json_response({
+            'index_name': RESOURCE_ID, 'total': len(records), 'count': len(page),
+            'limit': str(limit), 'offset': str(offset), 'records': page,
+        })
+
+    async def health(request):
+        return web.json_response({'status': 'ok', **stats})
+
+    app = web.Application()
+    app.router.add_get('/resource/{resource_id}', resource)
+    app.router.add_get('/health', health)
+    return app
+
+async def start_mock_server(host='127.0.0.1', port=8089, **options):
+    # Starts the server inside the running event loop (for tests/benchmarks); returns the runner to clean up
+    runner = web.AppRunner(make_app(**options))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline mock of the data.gov.in crop production API.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--api-key', help="Require this key (default: accept any)")
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean response delay in seconds")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered with 429/502/503")
+    args = parser.parse_args(argv)
+    web.run_app(make_app(args.api_key, args.latency, args.failure_rate), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
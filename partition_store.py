@@ -0,0 +1,324 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aggregates import DISTRICT_KEYS, MEASURE_COLUMNS, cube_from_district_table, district_measures, merge_district_tables, replace_partitions
+
+# Partitioned Parquet store for the merged agriculture + rainfall rows (written by ingest.py).
+#
+#   samarth_store/
+#     manifest.json                                   version counter, per-partition files, pending files,
+#                                                     ingested sources and change log
+#     rows/state_name=<state>/crop_year=<year>/
+#       part-<batch>.parquet                          merged master rows (with their sub-division) of one batch
+#       _aggregates-<batch>.parquet                   district-level cube rows for the whole partition
+#     reference/rainfall-<batch>.parquet              every normalized IMD rainfall row seen so far
+#     pending/part-<batch>.parquet                    agriculture rows still waiting for their rainfall
+#
+# Each partition keeps its own slice of the aggregate cube, so an ingestion only re-aggregates the
+# (state, year) partitions it touches, and a running app only reloads those slices. Every file, the
+# rainfall reference included, is written under a new name and only becomes part of the store when
+# the manifest lists it, so an ingestion that dies half-way leaves the store exactly at its previous
+# version (its unlisted files are ignored) and retrying it redoes the same work. A rebuilt partition
+# (new or corrected rainfall) is rewritten as one part file. Files the manifest no longer lists are
+# deleted after it has been written; replaced aggregates one commit later, as readers may still hold
+# the previous manifest.
+
+# --- 1. CONFIGURATION ---
+
+STORE_DIR = "samarth_store"
+STORE_SCHEMA_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".ingest.lock"
+ROWS_DIR = "rows"
+REFERENCE_DIR = "reference"
+PENDING_DIR = "pending"
+AGGREGATES_PREFIX = "_aggregates"  # leading underscore: skipped by pyarrow dataset discovery
+
+# Manifest change-log entries kept for incremental refreshes; older readers fall back to a full load
+CHANGE_LOG_LENGTH = 256
+
+# Fixed schema of the row files (state_name / crop_year live in the partition path), so every
+# part file of the store can be scanned as one dataset
+ROW_SCHEMA = pa.schema([
+    ('district_name', pa.string()),
+    ('season', pa.string()),
+    ('crop', pa.string()),
+    ('crop_type', pa.string()),
+    ('subdivision', pa.string()),
+    ('area', pa.float64()),
+    ('production', pa.float64()),
+    ('annual_rainfall_mm', pa.float64()),
+    ('summer_rainfall', pa.float64()),
+    ('kharif_season_rainfall', pa.float64()),
+    ('rabi_start_rainfall', pa.float64()),
+])
+ROW_COLUMNS = ROW_SCHEMA.names
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. MANIFEST ---
+# ---------------------------------------------------------------------------------------------------
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+def empty_manifest():
+    return {'schema_version': STORE_SCHEMA_VERSION, 'version': 0, 'updated_at': None, 'partitions': {}, 'changes': [],
+            'rainfall': None, 'pending': [], 'sources': [], 'garbage': []}
+
+def read_manifest(store_dir=STORE_DIR):
+    # Raises FileNotFoundError when the directory is not a store (yet)
+    with open(os.path.join(store_dir, MANIFEST_FILE)) as handle:
+        return json.load(handle)
+
+def write_manifest(store_dir, manifest):
+    # Written last and atomically: readers only ever see fully written partitions
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as handle:
+        json.dump(manifest, handle)
+    os.replace(tmp_path, path)
+
+def store_version(store_dir=STORE_DIR):
+    # Dataset version of the store; bumped by every ingestion that changes a partition
+    return f"store-v{read_manifest(store_dir)['version']}"
+
+def partition_key(state_name, crop_year):
+    return f"{state_name}|{int(crop_year)}"
+
+def remove_store_files(store_dir, paths):
+    for path in paths:
+        try:
+            os.remove(os.path.join(store_dir, path))
+        except FileNotFoundError:
+            pass
+
+def commit_version(store_dir, manifest, appended=None, rebuilt=None, pending=None, sources=(), rainfall=None):
+    # Records an ingestion in one manifest write.
+    #   appended / rebuilt: (state, year) -> {'rows', 'part', 'aggregates'}; an appended part is added to
+    #                       its partition, a rebuilt part replaces every part the partition had
+    #   pending:            the new list of pending agriculture files ({'file', 'rows'}), None = unchanged
+    #   sources:            source keys (e.g. harvest slices) whose rows this ingestion stored
+    #   rainfall:           the new rainfall reference file, None = unchanged
+    # The version (and change log) only moves when a partition changed.
+    appended, rebuilt = appended or {}, rebuilt or {}
+    removed, garbage = [], []
+    for (state_name, crop_year), written in rebuilt.items():
+        entry = manifest['partitions'][partition_key(state_name, crop_year)]
+        directory = os.path.relpath(partition_dir(store_dir, state_name, crop_year), store_dir)
+        removed += [os.path.join(directory, part) for part in entry['parts']]
+        garbage.append(os.path.join(directory, entry['aggregates']))
+        entry.update(rows=written['rows'], parts=[written['part']], aggregates=written['aggregates'])
+    for (state_name, crop_year), written in appended.items():
+        entry = manifest['partitions'].setdefault(partition_key(state_name, crop_year), {
+            'state_name': state_name, 'crop_year': int(crop_year), 'rows': 0, 'parts': [], 'aggregates': None,
+        })
+        if entry['aggregates'] is not None:
+            garbage.append(os.path.join(os.path.relpath(partition_dir(store_dir, state_name, crop_year), store_dir), entry['aggregates']))
+        entry['rows'] += written['rows']
+        entry['parts'].append(written['part'])
+        entry['aggregates'] = written['aggregates']
+    if pending is not None:
+        kept = {item['file'] for item in pending}
+        removed += [os.path.join(PENDING_DIR, item['file']) for item in manifest['pending'] if item['file'] not in kept]
+        manifest['pending'] = pending
+    manifest['sources'] = sorted(set(manifest['sources']).union(sources))
+    if rainfall is not None:
+        # Only ingestions (under the store lock) read the reference, so the old one can go right away
+        if manifest.get('rainfall'):
+            removed.append(os.path.join(REFERENCE_DIR, manifest['rainfall']))
+        manifest['rainfall'] = rainfall
+    if appended or rebuilt:
+        manifest['version'] += 1
+        manifest['changes'].append({
+            'version': manifest['version'],
+            'partitions': [[state_name, int(crop_year)] for state_name, crop_year in dict.fromkeys([*rebuilt, *appended])],
+        })
+        del manifest['changes'][:-CHANGE_LOG_LENGTH]
+    manifest['updated_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    removed += manifest['garbage']
+    manifest['garbage'] = garbage
+    write_manifest(store_dir, manifest)
+    remove_store_files(store_dir, removed)
+    return manifest
+
+@contextmanager
+def store_lock(store_dir=STORE_DIR, timeout=60.0, poll_interval=0.1):
+    # Single-writer lock (a lock file created with O_EXCL, portable across platforms); readers never lock
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, LOCK_FILE)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Store '{store_dir}' is locked by another ingestion (remove '{path}' if it is stale)")
+            time.sleep(poll_interval)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. PARTITION FILES ---
+# ---------------------------------------------------------------------------------------------------
+
+def partition_dir(store_dir, state_name, crop_year):
+    # Hive-style directory; the state name is URI-encoded so any name is a valid path segment
+    return os.path.join(store_dir, ROWS_DIR, f"state_name={quote(state_name, safe='')}", f"crop_year={int(crop_year)}")
+
+def write_parquet_atomic(table, path):
+    tmp_path = f"{path}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+def rows_table(rows):
+    # Conforms a frame of merged rows to ROW_SCHEMA (missing optional columns become nulls)
+    frame = rows.reindex(columns=ROW_COLUMNS)
+    for field in ROW_SCHEMA:
+        if pa.types.is_string(field.type):
+            frame[field.name] = frame[field.name].astype(object).where(frame[field.name].notna(), None)
+        else:
+            frame[field.name] = pd.to_numeric(frame[field.name], errors='coerce').astype('float64')
+    return pa.Table.from_pandas(frame, schema=ROW_SCHEMA, preserve_index=False)
+
+def read_partition_aggregates(store_dir, entry):
+    # District-level cube rows of one partition, given its manifest entry
+    table = pd.read_parquet(os.path.join(partition_dir(store_dir, entry['state_name'], entry['crop_year']), entry['aggregates']))
+    table.insert(0, 'state_name', entry['state_name'])
+    table.insert(2, 'crop_year', int(entry['crop_year']))
+    return table.set_index(DISTRICT_KEYS)
+
+def write_partition_aggregates(store_dir, state_name, crop_year, district_table, batch_id):
+    aggregates = f"{AGGREGATES_PREFIX}-{batch_id}.parquet"
+    flat = district_table.reset_index().drop(columns=['state_name', 'crop_year'])
+    flat['crop'] = flat['crop'].astype(str)
+    flat['district_name'] = flat['district_name'].astype(str)
+    flat['crop_type'] = flat['crop_type'].astype(object).where(flat['crop_type'].notna(), None)
+    write_parquet_atomic(pa.Table.from_pandas(flat, preserve_index=False), os.path.join(partition_dir(store_dir, state_name, crop_year), aggregates))
+    return aggregates
+
+def write_part(store_dir, state_name, crop_year, rows, batch_id):
+    directory = partition_dir(store_dir, state_name, crop_year)
+    os.makedirs(directory, exist_ok=True)
+    part = f"part-{batch_id}.parquet"
+    write_parquet_atomic(rows_table(rows), os.path.join(directory, part))
+    return part
+
+def append_rows(store_dir, manifest, rows, batch_id=None):
+    # Appends merged master rows to their (state, year) partitions and folds them into each
+    # partition's aggregates. Returns {(state, year): {'rows', 'part', 'aggregates'}}; the caller commits the manifest.
+    batch_id = batch_id or uuid.uuid4().hex[:12]
+    partition_rows = {}
+    for (state_name, crop_year), part in rows.groupby(['state_name', 'crop_year'], observed=True, sort=True):
+        state_name, crop_year = str(state_name), int(crop_year)
+        part_file = write_part(store_dir, state_name, crop_year, part, batch_id)
+        batch_table = district_measures(part)
+        entry = manifest['partitions'].get(partition_key(state_name, crop_year))
+        if entry is not None and entry['aggregates'] is not None:
+            batch_table = merge_district_tables([read_partition_aggregates(store_dir, entry), batch_table])
+        aggregates = write_partition_aggregates(store_dir, state_name, crop_year, batch_table, batch_id)
+        partition_rows[(state_name, crop_year)] = {'rows': len(part), 'part': part_file, 'aggregates': aggregates}
+    return partition_rows
+
+def rewrite_partition(store_dir, state_name, crop_year, rows, batch_id=None):
+    # Replaces a partition's rows and aggregates with `rows` (one new part file; commit it as rebuilt)
+    batch_id = batch_id or uuid.uuid4().hex[:12]
+    part_file = write_part(store_dir, state_name, crop_year, rows, batch_id)
+    aggregates = write_partition_aggregates(store_dir, state_name, crop_year, district_measures(rows), batch_id)
+    return {'rows': len(rows), 'part': part_file, 'aggregates': aggregates}
+
+def read_partition_parts(store_dir, manifest, state_name, crop_year):
+    # Row files of one partition as listed in the manifest, one frame per part (with state_name / crop_year)
+    entry = manifest['partitions'][partition_key(state_name, crop_year)]
+    directory = partition_dir(store_dir, state_name, crop_year)
+    return [pd.read_parquet(os.path.join(directory, part)).assign(state_name=state_name, crop_year=int(crop_year))
+            for part in entry['parts']]
+
+def write_pending(store_dir, rows, batch_id=None):
+    # Agriculture rows still waiting for rainfall, as one new pending file (listed by commit_version)
+    directory = os.path.join(store_dir, PENDING_DIR)
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{batch_id or uuid.uuid4().hex[:12]}.parquet"
+    write_parquet_atomic(pa.Table.from_pandas(rows, preserve_index=False), os.path.join(directory, name))
+    return {'file': name, 'rows': len(rows)}
+
+def read_pending(store_dir, manifest):
+    # Every pending agriculture row (None when nothing is pending)
+    frames = [pd.read_parquet(os.path.join(store_dir, PENDING_DIR, item['file'])) for item in manifest['pending']]
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. REFERENCE TABLES ---
+# ---------------------------------------------------------------------------------------------------
+
+def read_reference(store_dir, manifest):
+    # Rainfall reference of the committed version (None before the first rainfall batch)
+    if not manifest.get('rainfall'): return None
+    return pd.read_parquet(os.path.join(store_dir, REFERENCE_DIR, manifest['rainfall']))
+
+def write_reference(store_dir, df, batch_id=None):
+    # Writes a new reference file and returns its name; it replaces the current one once commit_version lists it
+    directory = os.path.join(store_dir, REFERENCE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    name = f"rainfall-{batch_id or uuid.uuid4().hex[:12]}.parquet"
+    write_parquet_atomic(pa.Table.from_pandas(df, preserve_index=False), os.path.join(directory, name))
+    return name
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 5. CUBE LOADING ---
+# ---------------------------------------------------------------------------------------------------
+
+def read_aggregates(store_dir, manifest, partitions):
+    # Concatenated district rows of the given [(state, year), ...] partitions (skipping unknown ones)
+    entries = [manifest['partitions'].get(partition_key(state_name, crop_year)) for state_name, crop_year in partitions]
+    tables = [read_partition_aggregates(store_dir, entry) for entry in entries if entry is not None]
+    if not tables:
+        index = pd.MultiIndex.from_arrays([[] for _ in DISTRICT_KEYS], names=DISTRICT_KEYS)
+        return pd.DataFrame(columns=['crop_type'] + MEASURE_COLUMNS, index=index)
+    return pd.concat(tables).sort_index()
+
+def manifest_partitions(manifest):
+    return [(entry['state_name'], entry['crop_year']) for entry in manifest['partitions'].values()]
+
+def load_store_cube(store_dir=STORE_DIR):
+    # Full cube from the per-partition aggregates (no row files are read). Returns (cube, version).
+    manifest = read_manifest(store_dir)
+    partitions = manifest_partitions(manifest)
+    if not partitions:
+        raise FileNotFoundError(f"Store '{store_dir}' has no data yet")
+    cube = cube_from_district_table(read_aggregates(store_dir, manifest, partitions))
+    return cube, f"store-v{manifest['version']}"
+
+def refresh_store_cube(store_dir, cube, version):
+    # Brings a cube loaded at `version` up to date. When the change log covers every version since,
+    # only the touched partitions are re-read and spliced in; otherwise the cube is reloaded.
+    # Returns (cube, version).
+    manifest = read_manifest(store_dir)
+    current = f"store-v{manifest['version']}"
+    if current == version: return cube, version
+    try:
+        loaded = int(version.removeprefix('store-v')) if cube is not None and version else None
+    except ValueError:
+        loaded = None
+    changes = [change for change in manifest['changes'] if loaded is not None and change['version'] > loaded]
+    if loaded is None or len(changes) != manifest['version'] - loaded:
+        return load_store_cube(store_dir)
+    partitions = sorted({(state_name, int(crop_year)) for change in changes for state_name, crop_year in change['partitions']})
+    return replace_partitions(cube, partitions, read_aggregates(store_dir, manifest, partitions)), current
@@ -0,0 +1,384 @@
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass, field, is_dataclass
+
+import numpy as np
+import pandas as pd
+
+from aggregates import AggregateCube, build_aggregate_cube, slice_index, trend_from_measures, year_window
+from chunked import CHUNK_ROWS, load_cube_chunked
+from correlation import lookup_correlation
+from data_loader import DATA_FILE, file_fingerprint, load_master_df
+from metrics import stage
+from partition_store import STORE_DIR, is_store, load_store_cube, refresh_store_cube, store_version
+
+# UI-free query engine: Q1-Q4 as typed functions returning structured results.
+# Nothing in here imports Streamlit, so the same answers can be served over HTTP or in batch.
+
+# --- 1. CONFIGURATION AND DATA LOADING ---
+
+# Aggregate rows excluded from the single-crop pickers (Q4)
+AGGREGATE_CROP_NAMES = ['Oilseeds Total',' Total Foodgrain', 'Pulses Total']
+
+# 'memory' loads the whole master frame once; 'chunked' streams it in bounded chunks (see chunked.py)
+EXECUTION_MODE = os.environ.get('SAMARTH_EXECUTION_MODE', 'memory')
+SCAN_CHUNK_ROWS = int(os.environ.get('SAMARTH_CHUNK_ROWS', CHUNK_ROWS))
+
+# Upper bound on the rows of a chart payload; longer series are downsampled before they reach the browser
+MAX_CHART_POINTS = 240
+
+def load_cube(path: str = DATA_FILE, mode: str | None = None) -> AggregateCube:
+    # Builds the aggregate cube from the merged CSV (via the columnar cache) or from a partitioned store
+    # Raises FileNotFoundError when the source is missing
+    if is_store(path):
+        return load_store_cube(path)[0]
+    if (mode or EXECUTION_MODE) == 'chunked':
+        return load_cube_chunked(path, chunk_rows=SCAN_CHUNK_ROWS)
+    return build_aggregate_cube(load_master_df(path))
+
+def default_data_source() -> str:
+    # The partitioned store (see ingest.py) takes over from the monolithic CSV once it has been seeded
+    return STORE_DIR if is_store(STORE_DIR) else DATA_FILE
+
+def dataset_version(path: str = DATA_FILE) -> str:
+    # Cheap identity of the current data (store version or CSV size + mtime); safe to call on every request
+    return store_version(path) if is_store(path) else file_fingerprint(path)
+
+class LiveCube:
+    # The current cube of one data source, refreshed in place when the dataset version moves on.
+    # For a store, only the partitions touched since the loaded version are re-read.
+    def __init__(self, path: str = DATA_FILE):
+        self.path = path
+        self.cube = None
+        self.version = None
+        self._lock = threading.Lock()
+
+    def refresh(self, version: str | None = None) -> tuple[AggregateCube, str, bool]:
+        # Returns (cube, version, changed); raises FileNotFoundError when the source is missing
+        version = version or dataset_version(self.path)
+        with self._lock:
+            if self.cube is not None and version == self.version:
+                return self.cube, self.version, False
+            if is_store(self.path):
+                self.cube, self.version = refresh_store_cube(self.path, self.cube, self.version)
+            else:
+                self.cube, self.version = load_cube(self.path), version
+            return self.cube, self.version, True
+
+    def snapshot(self) -> tuple[AggregateCube, str]:
+        # Consistent (cube, version) pair, even while another session is refreshing
+        with self._lock:
+            return self.cube, self.version
+
+def year_span(cube: AggregateCube) -> int:
+    # Largest meaningful n_years (the UI's upper bound, also enforced by the HTTP API)
+    years = cube.rainfall_table.index.get_level_values('crop_year')
+    return int(years.max() - years.min()) if len(years) else 0
+
+def available_options(cube: AggregateCube) -> dict:
+    # Selectable states, crop types and crops, plus the year span of the dataset
+    crops = cube.crop_table.index.get_level_values('crop').unique()
+    return {
+        'states': sorted(cube.rainfall_table.index.get_level_values('state_name').unique()),
+        'crop_types': sorted(cube.crop_table['crop_type'].dropna().unique()),
+        'crops': sorted(crops),
+        'max_year_span': year_span(cube),
+        'single_crops': sorted([c for c in crops if c not in AGGREGATE_CROP_NAMES]),
+    }
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. STRUCTURED RESULTS ---
+# ---------------------------------------------------------------------------------------------------
+
+@dataclass
+class TrendSeries:
+    # Annual average yield and rainfall, one entry per crop year
+    years: list = field(default_factory=list)
+    average_yield: list = field(default_factory=list)
+    average_rainfall: list = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not self.years
+
+    def to_frame(self) -> pd.DataFrame:
+        if self.empty: return pd.DataFrame()
+        return pd.DataFrame({'crop_year': self.years, 'average_yield': self.average_yield, 'average_rainfall': self.average_rainfall})
+
+    @classmethod
+    def from_frame(cls, trend_df: pd.DataFrame) -> 'TrendSeries':
+        if trend_df.empty: return cls()
+        return cls(
+            years=[int(y) for y in trend_df['crop_year']],
+            average_yield=[float(v) for v in trend_df['average_yield']],
+            average_rainfall=[float(v) for v in trend_df['average_rainfall']],
+        )
+
+@dataclass
+class RainfallCropComparison:
+    # Q1: average annual rainfall and top M crops of a crop type for each state
+    states: list
+    crop_type: str
+    n_years: int
+    m_crops: int
+    start_year: int
+    end_year: int
+    average_rainfall: dict   # state -> mm, None when the state has no rainfall data in the window
+    top_crops: dict          # state -> crop names ordered by production, descending
+
+@dataclass
+class DistrictExtremes:
+    # Q2: highest producing district of state_x vs lowest (non-zero where possible) district of state_y
+    crop: str
+    latest_year: int
+    max_state: str
+    max_district: str | None
+    max_production: float
+    min_state: str
+    min_district: str | None
+    min_production: float
+
+    @property
+    def production_difference(self) -> float:
+        return self.max_production - self.min_production
+
+@dataclass
+class CropClimateTrend:
+    # Q3/Q4 building block: yield/rainfall trend plus its summary statistics
+    state: str
+    label: str               # crop type (Q3) or crop name (Q4)
+    n_years: int
+    trend: TrendSeries
+    correlation: float       # Pearson (yield vs. rainfall); NaN with fewer than two years
+    average_yield: float
+    average_rainfall: float
+
+    @property
+    def yield_per_rainfall(self) -> float:
+        return self.average_yield / self.average_rainfall if self.average_rainfall else math.nan
+
+@dataclass
+class PolicyComparison:
+    # Q4: trends of the crop to promote (crop_a) and the crop to replace (crop_b) in one region
+    region: str
+    n_years: int
+    crop_a: CropClimateTrend
+    crop_b: CropClimateTrend
+
+def to_jsonable(value):
+    # Converts results (dataclasses, numpy scalars, NaN) into plain JSON-safe Python values
+    if is_dataclass(value):
+        return to_jsonable(asdict(value))
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. CORE ANALYTICAL FUNCTIONS ---
+# ---------------------------------------------------------------------------------------------------
+
+def compare_recent_avg_rainfall(cube,state_list,n_years):
+    # Calculates the average annual rainfall for a list of states
+    start_year = cube.latest_year - n_years + 1
+    avg_rainfall_result = {}
+    for state in state_list:
+        with stage('filter') as step:
+            state_years = slice_index(cube.rainfall_table, (state, slice(start_year, None)))
+            state_years = state_years[state_years['n_rainfall'] > 0]
+            step.rows = len(state_years)
+        if state_years.empty: continue
+        with stage('aggregate'):
+            state_annual_rainfall = state_years['rainfall_sum'] / state_years['n_rainfall']
+            avg_rainfall_result[state] = float(np.round(state_annual_rainfall.mean(), 2))
+    return avg_rainfall_result
+
+def get_top_m_crops(cube,state_list, crop_type , n_years, M):
+    # Identifies the top M crops (by production) of a specified crop_type
+    start_year = cube.latest_year - n_years + 1
+    top_crops_by_state = {}
+    for state in state_list:
+        with stage('filter') as step:
+            state_data = year_window(slice_index(cube.crop_table, state), start_year)
+            state_data = state_data[state_data['crop_type'] == crop_type]
+            step.rows = len(state_data)
+        with stage('aggregate') as step:
+            production_summary = state_data.groupby(level='crop', observed=True)['production'].sum()
+            step.rows = len(production_summary)
+        with stage('compute'):
+            top_m = production_summary.sort_values(ascending = False).head(M).index.tolist()
+        top_crops_by_state[state] = top_m
+    return top_crops_by_state
+
+def get_max_min_district_production(cube,state_x,state_y,crop_z):
+    # Identifies the district with the highest/lowest production (Q2)
+    latest_year = cube.latest_year
+    with stage('filter') as step:
+        df_x = slice_index(cube.district_table, (state_x, crop_z, latest_year))
+        df_y = slice_index(cube.district_table, (state_y, crop_z, latest_year))
+        step.rows = len(df_x) + len(df_y)
+    with stage('compute'):
+        if df_x.empty:
+            max_district, max_production = 'N/A', 0.0
+        else:
+            max_district = df_x['production'].idxmax()
+            max_production = df_x.loc[max_district, 'production']
+        if df_y.empty:
+            min_district, min_production = 'N/A', 0.0
+        else:
+            df_y_producers = df_y[df_y['production'] > 0]
+            min_district = df_y_producers['production'].idxmin() if not df_y_producers.empty else df_y['production'].idxmin()
+            min_production = df_y.loc[min_district, 'production']
+    return {'latest_year' : latest_year, state_x : {'district': max_district, 'production': max_production}, state_y : {'district': min_district, 'production': min_production}}
+
+def get_yield_and_rainfall_trend(cube, state_name, crop_type, n_years):
+    # Calculates the annual average crop yield and rainfall (Q3/Q4 helper)
+    start_year = cube.latest_yield_year - n_years + 1
+    with stage('filter') as step:
+        state_data = slice_index(cube.crop_table, state_name)
+        in_scope = (state_data['crop_type'] == crop_type) & (state_data.index.get_level_values('crop_year') >= start_year)
+        rows = state_data[in_scope]
+        step.rows = len(rows)
+    with stage('aggregate') as step:
+        trend_df = trend_from_measures(rows)
+        step.rows = len(trend_df)
+    return trend_df
+
+def calculate_correlation(trend_df, metric_1 = 'average_yield', metric_2 = 'average_rainfall'):
+    # Calculates the Pearson correlation coefficient
+    if trend_df.empty or len(trend_df) < 2: return np.nan
+    correlation = trend_df[metric_1].corr(trend_df[metric_2])
+    return correlation
+
+def get_single_crop_trend(cube,state_name, crop_name, n_years):
+    # Calculates the annual average crop yield and rainfall for a single crop (Q4 helper)
+    start_year = cube.latest_yield_year - n_years + 1
+    with stage('filter') as step:
+        rows = slice_index(cube.crop_table, (state_name, crop_name, slice(start_year, None)))
+        step.rows = len(rows)
+    with stage('aggregate') as step:
+        trend_df = trend_from_measures(rows)
+        step.rows = len(trend_df)
+    return trend_df
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. QUESTION API (Q1-Q4) ---
+# ---------------------------------------------------------------------------------------------------
+
+def summarize_trend(trend_df: pd.DataFrame, state: str, label: str, n_years: int, correlation: float | None = None) -> CropClimateTrend:
+    # Wraps a trend frame with its correlation (looked up from the sensitivity table when given) and period averages
+    if trend_df.empty:
+        return CropClimateTrend(state, label, n_years, TrendSeries(), math.nan, math.nan, math.nan)
+    with stage('compute'):
+        return CropClimateTrend(
+            state=state, label=label, n_years=n_years,
+            trend=TrendSeries.from_frame(trend_df),
+            correlation=float(calculate_correlation(trend_df) if correlation is None else correlation),
+            average_yield=float(trend_df['average_yield'].mean()),
+            average_rainfall=float(trend_df['average_rainfall'].mean()),
+        )
+
+def question_1(cube: AggregateCube, state_x: str, state_y: str, n_years: int, crop_type: str, m_crops: int) -> RainfallCropComparison:
+    # Q1: rainfall comparison and top M crops of crop_type over the last n_years
+    states = [state_x, state_y]
+    rainfall = compare_recent_avg_rainfall(cube, state_list=states, n_years=n_years)
+    top_crops = get_top_m_crops(cube, state_list=states, crop_type=crop_type, n_years=n_years, M=m_crops)
+    end_year = int(cube.latest_year)
+    return RainfallCropComparison(
+        states=states, crop_type=crop_type, n_years=n_years, m_crops=m_crops,
+        start_year=end_year - n_years + 1, end_year=end_year,
+        average_rainfall={state: rainfall.get(state) for state in states},
+        top_crops={state: [str(c) for c in top_crops.get(state, [])] for state in states},
+    )
+
+def question_2(cube: AggregateCube, state_x: str, state_y: str, crop_z: str) -> DistrictExtremes:
+    # Q2: max producing district in state_x vs min producing district in state_y (latest year)
+    production = get_max_min_district_production(cube, state_x=state_x, state_y=state_y, crop_z=crop_z)
+    x_data, y_data = production[state_x], production[state_y]
+    return DistrictExtremes(
+        crop=crop_z, latest_year=int(production['latest_year']),
+        max_state=state_x, max_district=None if x_data['district'] == 'N/A' else str(x_data['district']),
+        max_production=float(x_data['production']),
+        min_state=state_y, min_district=None if y_data['district'] == 'N/A' else str(y_data['district']),
+        min_production=float(y_data['production']),
+    )
+
+def question_3(cube: AggregateCube, state_name: str, crop_type: str, n_years: int) -> CropClimateTrend:
+    # Q3: yield vs. rainfall trend and correlation for a crop type in one state
+    trend_df = get_yield_and_rainfall_trend(cube, state_name=state_name, crop_type=crop_type, n_years=n_years)
+    with stage('compute'):
+        correlation = lookup_correlation(cube, 'crop_type', state_name, crop_type, n_years)
+    return summarize_trend(trend_df, state_name, crop_type, n_years, correlation)
+
+def question_4(cube: AggregateCube, region_y: str, crop_a: str, crop_b: str, n_years: int) -> PolicyComparison:
+    # Q4: side-by-side yield/rainfall evidence for promoting crop_a over crop_b in region_y
+    trend_a = get_single_crop_trend(cube, region_y, crop_a, n_years)
+    trend_b = get_single_crop_trend(cube, region_y, crop_b, n_years)
+    with stage('compute'):
+        corr_a = lookup_correlation(cube, 'crop', region_y, crop_a, n_years)
+        corr_b = lookup_correlation(cube, 'crop', region_y, crop_b, n_years)
+    return PolicyComparison(
+        region=region_y, n_years=n_years,
+        crop_a=summarize_trend(trend_a, region_y, crop_a, n_years, corr_a),
+        crop_b=summarize_trend(trend_b, region_y, crop_b, n_years, corr_b),
+    )
+
+# Question id -> function, shared by the UI, HTTP API and result caches
+QUESTION_FUNCTIONS = {'q1': question_1, 'q2': question_2, 'q3': question_3, 'q4': question_4}
+
+# Defaults pre-selected in the Streamlit UI; used to warm the result cache at start-up
+DEFAULT_QUESTION_PARAMS = {
+    'q1': {'state_x': 'Karnataka', 'state_y': 'Maharashtra', 'n_years': 10, 'crop_type': 'Oilseed', 'm_crops': 3},
+    'q2': {'state_x': 'Uttar Pradesh', 'state_y': 'Maharashtra', 'crop_z': 'Rice'},
+    'q3': {'state_name': 'Gujarat', 'crop_type': 'Oilseed', 'n_years': 10},
+    'q4': {'region_y': 'Uttar Pradesh', 'crop_a': 'Maize', 'crop_b': 'Rice', 'n_years': 10},
+}
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 5. CHART DATA (Q3/Q4) ---
+# ---------------------------------------------------------------------------------------------------
+
+def downsample_chart(chart: pd.DataFrame, max_points: int = MAX_CHART_POINTS) -> pd.DataFrame:
+    # Bounds a year-indexed chart frame to at most max_points rows. The series are split into equal buckets
+    # and each bucket keeps the rows holding every column's min and max, so spikes and dips survive
+    # (the first and last rows are always kept, hence the 2 points set aside from the budget)
+    if len(chart) <= max_points: return chart
+    values = chart.to_numpy(dtype='float64')
+    n_rows, n_columns = values.shape
+    n_buckets = (max_points - 2) // (2 * n_columns)
+    if n_buckets < 1:
+        # Too many columns to keep one min and max each: evenly spaced rows instead
+        return chart.iloc[np.unique(np.linspace(0, n_rows - 1, max_points).round().astype(int))]
+    bucket = np.arange(n_rows) * n_buckets // n_rows
+    keep = [np.array([0, n_rows - 1])]
+    for column in values.T:
+        for ranked in (np.where(np.isnan(column), np.inf, column), np.where(np.isnan(column), np.inf, -column)):
+            order = np.lexsort((ranked, bucket))
+            keep.append(order[np.r_[True, bucket[order][1:] != bucket[order][:-1]]])
+    return chart.iloc[np.unique(np.concatenate(keep))]
+
+def question_3_chart(result: CropClimateTrend, max_points: int = MAX_CHART_POINTS) -> pd.DataFrame:
+    # Year-indexed average yield and rainfall for the Q3 charts
+    if result.trend.empty: return pd.DataFrame()
+    return downsample_chart(result.trend.to_frame().set_index('crop_year'), max_points)
+
+def question_4_chart(result: PolicyComparison, max_points: int = MAX_CHART_POINTS) -> pd.DataFrame:
+    # Yield of crop_a and crop_b plus crop_a's rainfall, aligned by an outer join on crop_year
+    # (a year recorded for only one crop stays in the chart as a gap in the other series)
+    if result.crop_a.trend.empty or result.crop_b.trend.empty: return pd.DataFrame()
+    trend_a = result.crop_a.trend.to_frame().set_index('crop_year')
+    trend_b = result.crop_b.trend.to_frame().set_index('crop_year')
+    chart = pd.concat([trend_a['average_yield'].rename(result.crop_a.label), trend_b['average_yield'].rename(result.crop_b.label),
+                       trend_a['average_rainfall']], axis=1, join='outer', sort=True)
+    chart.index.name = 'crop_year'
+    return downsample_chart(chart, max_points)
@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Bounded LRU + TTL cache for question results, keyed on the normalized question parameters and
+# the dataset version. Structured results and rendered markdown are meant to live in separate
+# instances so either can be reused (or invalidated) on its own.
+
+# --- 1. CONFIGURATION ---
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. KEY NORMALIZATION ---
+# ---------------------------------------------------------------------------------------------------
+
+def normalize_value(value):
+    # Maps equivalent parameter values onto one hashable form (' Rice ' == 'Rice', np.int64(10) == 10)
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize_value(v) for v in value)
+    return value
+
+def normalize_params(params):
+    # Keyword order does not matter; positional meaning (e.g. state_x vs state_y) is kept by name
+    return tuple(sorted((name, normalize_value(value)) for name, value in params.items()))
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. RESULT CACHE ---
+# ---------------------------------------------------------------------------------------------------
+
+class ResultCache:
+    # Thread-safe LRU cache with optional TTL, hit/miss counters and dataset-version invalidation
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS, name='results'):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.dataset_version = None
+        self._entries = OrderedDict()   # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+
+    def make_key(self, question, params, dataset_version=None):
+        # dataset_version is the version of the cube the answer comes from (defaults to the cache's own)
+        return (self.dataset_version if dataset_version is None else dataset_version, question, normalize_params(params))
+
+    def set_dataset_version(self, version):
+        # Drops every entry when the dataset changes (reload / new ingestion)
+        with self._lock:
+            if version == self.dataset_version: return
+            self.dataset_version = version
+            self._clear()
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        if self._entries:
+            self.invalidations += 1
+        self._entries.clear()
+
+    def get(self, question, params, dataset_version=None):
+        # Returns (hit, value); a miss returns (False, None)
+        return self._get(self.make_key(question, params, dataset_version))
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, question, params, value, dataset_version=None):
+        self._put(self.make_key(question, params, dataset_version), value)
+
+    def _put(self, key, value):
+        with self._lock:
+            if key[0] != self.dataset_version: return  # computed against a dataset that has since been replaced
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, question, params, compute, dataset_version=None):
+        # Computes outside the lock, so a slow miss never blocks hits from other sessions.
+        # Pass the version of the cube compute() reads: a session still holding an older cube then
+        # misses and its answer is not stored under the newer version's key.
+        key = self.make_key(question, params, dataset_version)
+        hit, value = self._get(key)
+        if hit: return value
+        value = compute()
+        self._put(key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'dataset_version': self.dataset_version,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. QUESTION HELPERS ---
+# ---------------------------------------------------------------------------------------------------
+
+def cached_question(cache, cube, question, question_functions, dataset_version=None, **params):
+    # Structured result for one question, served from the cache when possible; dataset_version is the cube's version.
+    # The function sees the same normalized values the key was built from, so ' Rice' cannot cache an empty answer for 'Rice'.
+    params = {name: normalize_value(value) for name, value in params.items()}
+    return cache.get_or_compute(question, params, lambda: question_functions[question](cube, **params), dataset_version)
+
+def warm_cache(cache, cube, question_functions, default_params):
+    # Precomputes the given {question: params} answers (e.g. the UI defaults) at start-up
+    for question, params in default_params.items():
+        cached_question(cache, cube, question, question_functions, **params)
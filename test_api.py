@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import pytest
+
+from api import QueryAPI
+from query_engine import question_3, to_jsonable, year_span
+
+# The ASGI app driven directly (no server): answers match the query engine, and bad requests,
+# unknown routes and a missing data file map to 400 / 404 / 503.
+
+# --- 1. CLIENT ---
+
+def call(app, path, query_string=b'', method='GET'):
+    response = {}
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        else:
+            response['body'] = json.loads(message['body'])
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string}
+    asyncio.run(app(scope, None, send))
+    return response['status'], response['body']
+
+@pytest.fixture(scope='module')
+def api_app(master_csv):
+    app = QueryAPI(data_file=master_csv, workers=1)
+    yield app
+    app.stop()
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. RESPONSES ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_question_matches_query_engine(api_app, memory_cube):
+    status, body = call(api_app, '/q3', b'state_name=Gujarat&crop_type=Oilseed&n_years=10')
+    assert status == 200
+    assert body == json.loads(json.dumps(to_jsonable(question_3(memory_cube, 'Gujarat', 'Oilseed', 10))))
+
+@pytest.mark.parametrize('query_string, message', [
+    (b'state_name=Gujarat&crop_type=Oilseed', "Missing query parameter(s): n_years"),
+    (b'state_name=Gujarat&crop_type=Oilseed&n_years=ten', "must be of type int"),
+    (b'state_name=Gujarat&crop_type=Oilseed&n_years=0', "must be >= 1"),
+    (b'state_name=Gujarat&crop_type=Oilseed&n_years=100000', "the dataset's year span"),
+])
+def test_bad_parameters_are_400(api_app, query_string, message):
+    status, body = call(api_app, '/q3', query_string)
+    assert status == 400 and message in body['error']
+
+def test_year_span_is_allowed(api_app, memory_cube):
+    n_years = year_span(memory_cube)
+    status, _ = call(api_app, '/q3', f'state_name=Gujarat&crop_type=Oilseed&n_years={n_years}'.encode())
+    assert status == 200
+
+def test_unknown_route_is_404(api_app):
+    status, body = call(api_app, '/q5')
+    assert status == 404 and body['error'] == "Unknown route '/q5'"
+
+def test_only_get_is_supported(api_app):
+    assert call(api_app, '/q3', method='POST')[0] == 405
+
+def test_missing_data_file_is_503(tmp_path):
+    app = QueryAPI(data_file=str(tmp_path / 'missing.csv'), workers=1)
+    status, body = call(app, '/q3', b'state_name=Gujarat&crop_type=Oilseed&n_years=10')
+    assert status == 503 and 'missing.csv' in body['error']
+    assert call(app, '/health') == (200, {'status': 'ok'})
+    assert app.pool is None
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from batch import build_grid, run_sweep, sweep_question_1, sweep_question_2, sweep_question_3, sweep_question_4
+from query_engine import question_1, question_2, question_3, question_4
+
+# Every row of the vectorized sweeps against the single-combination question_N answers.
+
+N_YEARS = [1, 5, 10]
+
+@pytest.fixture(scope='module')
+def grid(memory_cube):
+    return build_grid(memory_cube)
+
+def missing_as_none(value):
+    return None if pd.isna(value) else value
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 1. SWEEPS == question_N ---
+# ---------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('n_years', N_YEARS)
+def test_sweep_question_1(memory_cube, grid, n_years):
+    sweep = sweep_question_1(memory_cube, grid['states'], grid['crop_types'], n_years, 3)
+    assert len(sweep) == len(grid['states']) * (len(grid['states']) - 1) * len(grid['crop_types'])
+    for row in sweep.itertuples():
+        expected = question_1(memory_cube, row.state_x, row.state_y, n_years, row.crop_type, 3)
+        assert (row.start_year, row.end_year) == (expected.start_year, expected.end_year)
+        for state, avg_rainfall, top_crops in ((row.state_x, row.avg_rainfall_x, row.top_crops_x), (row.state_y, row.avg_rainfall_y, row.top_crops_y)):
+            assert missing_as_none(avg_rainfall) == expected.average_rainfall[state]
+            assert missing_as_none(top_crops) == (', '.join(expected.top_crops[state]) or None)
+
+def test_sweep_question_2(memory_cube, grid):
+    sweep = sweep_question_2(memory_cube, grid['states'], grid['crops'])
+    assert len(sweep) == len(grid['states']) * (len(grid['states']) - 1) * len(grid['crops'])
+    for row in sweep.itertuples():
+        expected = question_2(memory_cube, row.state_x, row.state_y, row.crop)
+        assert (missing_as_none(row.max_district), missing_as_none(row.min_district)) == (expected.max_district, expected.min_district)
+        assert np.isclose(row.production_difference, expected.production_difference)
+
+@pytest.mark.parametrize('n_years', N_YEARS)
+def test_sweep_question_3(memory_cube, grid, n_years):
+    sweep = sweep_question_3(memory_cube, grid['states'], grid['crop_types'], n_years)
+    assert len(sweep)
+    for row in sweep.itertuples():
+        expected = question_3(memory_cube, row.state_name, row.crop_type, n_years)
+        assert np.isclose(row.correlation, expected.correlation, equal_nan=True)
+        assert np.isclose(row.average_yield, expected.average_yield)
+        assert np.isclose(row.average_rainfall, expected.average_rainfall, equal_nan=True)
+
+@pytest.mark.parametrize('n_years', N_YEARS)
+def test_sweep_question_4(memory_cube, grid, n_years):
+    sweep = sweep_question_4(memory_cube, grid['states'], grid['crops'], n_years)
+    assert len(sweep)
+    for row in sweep.itertuples():
+        expected = question_4(memory_cube, row.region, row.crop_a, row.crop_b, n_years)
+        assert np.isclose(row.correlation_a, expected.crop_a.correlation, equal_nan=True)
+        assert np.isclose(row.correlation_b, expected.crop_b.correlation, equal_nan=True)
+        assert np.isclose(row.average_yield_a, expected.crop_a.average_yield)
+        assert np.isclose(row.average_rainfall_b, expected.crop_b.average_rainfall, equal_nan=True)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. run_sweep ---
+# ---------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet'])
+def test_run_sweep_writes_every_block(memory_cube, grid, tmp_path, fmt):
+    paths = run_sweep(str(tmp_path), questions=[2, 3], n_years_list=[5, 10], fmt=fmt, cube=memory_cube)
+    read = pd.read_csv if fmt == 'csv' else pd.read_parquet
+    q3 = read(paths[3])
+    assert sorted(q3['n_years'].unique()) == [5, 10]
+    assert len(read(paths[2])) == len(sweep_question_2(memory_cube, grid['states'], grid['crops']))
+
+def test_run_sweep_workers_match_in_process(master_csv, memory_cube, tmp_path):
+    in_process = run_sweep(str(tmp_path / 'a'), questions=[1], n_years_list=[5, 10], cube=memory_cube)
+    pooled = run_sweep(str(tmp_path / 'b'), questions=[1], n_years_list=[5, 10], workers=2, data_file=master_csv)
+    keys = ['n_years', 'state_x', 'state_y', 'crop_type']
+    expected = pd.read_csv(in_process[1]).sort_values(keys).reset_index(drop=True)
+    actual = pd.read_csv(pooled[1]).sort_values(keys).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected)
+
+def test_cube_with_workers_is_refused(memory_cube, tmp_path):
+    with pytest.raises(ValueError):
+        run_sweep(str(tmp_path), cube=memory_cube, workers=2)
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from chunked import load_cube_chunked
+from conftest import assert_tables_equal, generate_master_df
+from query_engine import load_cube, question_1, question_2
+
+# The out-of-core cube, scanned in small chunks from the CSV, its columnar cache or the partitioned
+# store, equals the in-memory cube, with and without pushed-down predicates.
+
+def in_scope(table, states=None, crops=None, start_year=None, end_year=None):
+    # Rows of an unfiltered cube table that fall inside the predicates
+    mask = np.ones(len(table), dtype=bool)
+    for level, values in (('state_name', states), ('crop', crops)):
+        if values is not None:
+            mask &= table.index.get_level_values(level).isin(values)
+    years = table.index.get_level_values('crop_year')
+    if start_year is not None: mask &= years >= start_year
+    if end_year is not None: mask &= years <= end_year
+    return table[mask]
+
+@pytest.fixture(scope='module', params=['csv', 'parquet', 'store'])
+def chunk_source(request, master_csv, memory_cube, tmp_path_factory):
+    # The CSV scan runs on a copy without a columnar cache; master_csv has one once memory_cube is built
+    if request.param == 'csv':
+        path = tmp_path_factory.mktemp('csv') / 'uncached.csv'
+        generate_master_df().to_csv(path, index=False)
+        return str(path)
+    return master_csv if request.param == 'parquet' else request.getfixturevalue('seeded_store')
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- CHUNKED CUBE == IN-MEMORY CUBE ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_chunked_cube_matches_memory_cube(chunk_source, memory_cube):
+    cube = load_cube_chunked(chunk_source, chunk_rows=500)
+    for name in ('district_table', 'crop_table', 'rainfall_table'):
+        assert_tables_equal(getattr(cube, name), getattr(memory_cube, name))
+    assert (cube.latest_year, cube.latest_yield_year) == (memory_cube.latest_year, memory_cube.latest_yield_year)
+    assert type(cube.latest_year) is int and type(cube.latest_yield_year) is int
+
+@pytest.mark.parametrize('predicates', [
+    {'states': ['Karnataka', 'Gujarat']},
+    {'start_year': 2005, 'end_year': 2012},
+    {'states': ['Maharashtra'], 'crops': ['Rice', 'Groundnut', 'Coconut'], 'start_year': 2000},
+])
+def test_chunked_cube_with_predicates(chunk_source, memory_cube, predicates):
+    cube = load_cube_chunked(chunk_source, chunk_rows=500, **predicates)
+    tables = ('district_table', 'crop_table') if 'crops' in predicates else ('district_table', 'crop_table', 'rainfall_table')
+    for name in tables:
+        assert_tables_equal(getattr(cube, name), in_scope(getattr(memory_cube, name), **predicates))
+    # The Q1-Q4 windows always come from the whole dataset
+    assert (cube.latest_year, cube.latest_yield_year) == (memory_cube.latest_year, memory_cube.latest_yield_year)
+
+def test_chunked_mode_answers_match(master_csv, memory_cube):
+    cube = load_cube(master_csv, mode='chunked')
+    assert question_1(cube, 'Karnataka', 'Gujarat', 10, 'Cereal', 3) == question_1(memory_cube, 'Karnataka', 'Gujarat', 10, 'Cereal', 3)
+    assert question_2(cube, 'Karnataka', 'Gujarat', 'Rice') == question_2(memory_cube, 'Karnataka', 'Gujarat', 'Rice')
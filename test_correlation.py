@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import STATES
+from correlation import compute_sensitivity, correlate_rows, lookup_correlation, pearson_rows, rolling_correlation, spearman_rows
+from query_engine import calculate_correlation, get_single_crop_trend, get_yield_and_rainfall_trend
+
+# The (series x year) coefficients against per-trend pandas computations: calculate_correlation for
+# Pearson, DataFrame.corr for Spearman and Series.rolling().corr for the rolling windows.
+
+TREND_HELPERS = {'crop': get_single_crop_trend, 'crop_type': get_yield_and_rainfall_trend}
+
+def series_trends(cube, level, n_years):
+    # (state, label) -> trend frame from the Q3/Q4 helpers, for every series of the level
+    table = compute_sensitivity(cube, level, n_years)
+    assert len(table)
+    for row in table.itertuples():
+        yield row, TREND_HELPERS[level](cube, row.state_name, row.label, n_years)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 1. ROW KERNELS ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_kernels_match_numpy_and_pandas():
+    rng = np.random.default_rng(1)
+    x, y = rng.normal(size=(6, 12)), rng.normal(size=(6, 12))
+    x[0, 3] = y[1, 5] = np.nan
+    r, n = pearson_rows(x, y)
+    rho, _ = spearman_rows(x, y)
+    for i in range(len(x)):
+        frame = pd.DataFrame({'x': x[i], 'y': y[i]}).dropna()
+        assert n[i] == len(frame)
+        assert np.isclose(r[i], np.corrcoef(frame['x'], frame['y'])[0, 1])
+        assert np.isclose(rho[i], frame.corr(method='spearman').at['x', 'y'])
+
+def test_degenerate_rows_are_nan():
+    x = np.array([[1.0, 2.0, 3.0], [1.0, np.nan, np.nan], [2.0, 2.0, 2.0]])
+    y = np.array([[2.0, 4.0, 7.0], [3.0, 4.0, 5.0], [1.0, 2.0, 3.0]])
+    r, n = pearson_rows(x, y)
+    assert np.isfinite(r[0]) and np.isnan(r[1]) and np.isnan(r[2])  # one pair; constant yield
+    assert list(n) == [3, 1, 3]
+
+def test_unknown_method_is_refused():
+    with pytest.raises(ValueError):
+        correlate_rows(np.zeros((1, 3)), np.zeros((1, 3)), method='kendall')
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. SENSITIVITY TABLES ---
+# ---------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('level', ['crop', 'crop_type'])
+@pytest.mark.parametrize('n_years', [1, 5, 10, 100])
+def test_sensitivity_matches_trend_helpers(memory_cube, level, n_years):
+    for row, trend in series_trends(memory_cube, level, n_years):
+        assert row.state_name in STATES
+        assert np.isclose(row.pearson, calculate_correlation(trend), equal_nan=True)
+        expected_spearman = trend[['average_yield', 'average_rainfall']].corr(method='spearman').iat[0, 1] if len(trend) >= 2 else np.nan
+        assert np.isclose(row.spearman, expected_spearman, equal_nan=True)
+        assert row.years_observed == len(trend)
+        assert np.isclose(row.average_yield, trend['average_yield'].mean())
+
+def test_lookup_correlation(memory_cube):
+    trend = get_single_crop_trend(memory_cube, 'Gujarat', 'Rice', 10)
+    assert np.isclose(lookup_correlation(memory_cube, 'crop', 'Gujarat', 'Rice', 10), calculate_correlation(trend))
+    assert np.isnan(lookup_correlation(memory_cube, 'crop', 'Gujarat', 'Barley', 10))
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. ROLLING WINDOWS ---
+# ---------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('window', [3, 5])
+def test_rolling_correlation_matches_pandas(memory_cube, window):
+    rolled = rolling_correlation(memory_cube, 'crop', window).set_index(['state_name', 'crop', 'window_end_year'])
+    years = rolled.index.get_level_values('window_end_year')
+    all_years = np.arange(years.min() - window + 1, years.max() + 1)
+    for state_name in STATES:
+        for crop in ('Rice', 'Groundnut', 'Coconut'):
+            trend = get_single_crop_trend(memory_cube, state_name, crop, 100).set_index('crop_year').reindex(all_years)
+            expected = trend['average_yield'].rolling(window).corr(trend['average_rainfall']).iloc[window - 1:]
+            actual = rolled.xs((state_name, crop), level=['state_name', 'crop'])['pearson']
+            assert np.allclose(actual.to_numpy(), expected.to_numpy(), equal_nan=True)
+
+def test_rolling_window_longer_than_data(memory_cube):
+    assert rolling_correlation(memory_cube, 'crop', window=5, n_years=3).empty
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import math
+import socket
+
+import pandas as pd
+import pytest
+
+import harvester
+from ingest import normalize_agri_batch
+from mock_datagov import slice_records, start_mock_server
+from partition_store import read_manifest, read_pending
+
+# A harvest against the mock data.gov.in server with injected failures, interrupted after a batch
+# reached the store but before it was checkpointed, then resumed: every record is stored exactly once.
+
+HARVEST_TARGETS = {'Uttar Pradesh': ['MEERUT', 'AGRA'], 'Madhya Pradesh': ['HOSHANGABAD']}
+HARVEST_YEARS = range(2008, 2012)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def expected_harvest_rows():
+    records = [record for state, districts in HARVEST_TARGETS.items() for district in districts
+               for year in HARVEST_YEARS for record in slice_records(state, district, year)]
+    return normalize_agri_batch(pd.DataFrame(records))
+
+def test_harvest_resumes_without_duplicates(tmp_path, monkeypatch):
+    monkeypatch.setattr(harvester, 'BACKOFF_BASE', 0.001)
+    store_dir, checkpoint_path = str(tmp_path / 'store'), str(tmp_path / 'checkpoint.json')
+    harvest_options = dict(targets=HARVEST_TARGETS, years=HARVEST_YEARS, concurrency=4, rate=0, flush_rows=300)
+    mark_done, calls = harvester.Checkpoint.mark_done, []
+
+    def failing_mark_done(checkpoint, keys, rows):
+        # The second batch reaches the store, then the process "dies" before it is checkpointed
+        calls.append(keys)
+        if len(calls) == 2: raise OSError("simulated crash")
+        return mark_done(checkpoint, keys, rows)
+
+    async def harvest():
+        port = free_port()
+        runner = await start_mock_server(port=port, failure_rate=0.2, seed=1)
+        base_url = f"http://127.0.0.1:{port}/resource"
+        try:
+            monkeypatch.setattr(harvester.Checkpoint, 'mark_done', failing_mark_done)
+            with pytest.raises(OSError):
+                await harvester.run_harvest('test-key', store_dir, checkpoint_path, base_url=base_url, **harvest_options)
+            monkeypatch.setattr(harvester.Checkpoint, 'mark_done', mark_done)
+            # Slices that ran out of retries are left out of the checkpoint and picked up by the next run
+            for _ in range(5):
+                stats = await harvester.run_harvest('test-key', store_dir, checkpoint_path, base_url=base_url, **harvest_options)
+                if not stats['failed_slices']: return stats
+            return stats
+        finally:
+            await runner.cleanup()
+
+    stats = asyncio.run(harvest())
+    assert stats['failed_slices'] == 0 and stats['skipped_slices'] > 0
+
+    manifest = read_manifest(store_dir)
+    expected = expected_harvest_rows()
+    stored = read_pending(store_dir, manifest)  # no rainfall in this store, so every row is pending
+    assert not manifest['partitions']
+    assert len(stored) == len(expected)
+    assert math.isclose(stored['production'].sum(), expected['production'].sum())
+    with open(checkpoint_path) as handle:
+        checkpoint = json.load(handle)
+    assert len(checkpoint['done']) == len(harvester.harvest_slices(HARVEST_TARGETS, HARVEST_YEARS))
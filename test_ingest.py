@@ -0,0 +1,165 @@
+import pandas as pd
+import pytest
+
+import ingest
+from conftest import assert_tables_equal
+from ingest import ingest_batches, seed_store
+from partition_store import load_store_cube, read_manifest
+from query_engine import load_cube
+
+# Incremental ingestion into the partitioned store: rainfall that adds or corrects a sub-division
+# rebuilds the stored partitions, agriculture rows without rainfall wait as pending rows, and the
+# resulting cube does not depend on how the batches were split or ordered.
+
+# --- 1. BATCHES ---
+
+def agri_batch(districts=('HASSAN', 'mysore', 'HASSAN'), state_name='Karnataka', crop_year=2010):
+    return pd.DataFrame({
+        'state_name': [state_name] * len(districts), 'district_name': list(districts), 'crop_year': [crop_year] * len(districts),
+        'season': ['Kharif'] * len(districts), 'crop': ['PADDY'] * len(districts),
+        'area_': ['100'] * len(districts), 'production_': ['300'] * len(districts),
+    })
+
+def rainfall_batch(*rows):
+    # rows: (sub-division, year, annual rainfall)
+    return pd.DataFrame({
+        'SUBDIVISION': [row[0] for row in rows], 'YEAR': [row[1] for row in rows], 'ANNUAL': [row[2] for row in rows],
+        'JJAS': [row[2] * 0.7 for row in rows], 'OND': [row[2] * 0.1 for row in rows],
+    })
+
+def cube_tables(store_dir):
+    cube, _ = load_store_cube(store_dir)
+    return {name: getattr(cube, name).sort_index() for name in ('district_table', 'crop_table', 'rainfall_table')}
+
+def assert_same_cube(store_a, store_b):
+    tables_a, tables_b = cube_tables(store_a), cube_tables(store_b)
+    for name in tables_a:
+        pd.testing.assert_frame_equal(tables_a[name], tables_b[name], check_categorical=False)
+
+def district_rainfall(store_dir, district_name, state_name='Karnataka', crop_year=2010):
+    table = cube_tables(store_dir)['district_table']
+    row = table.xs((state_name, 'Rice', crop_year, district_name), level=['state_name', 'crop', 'crop_year', 'district_name'])
+    return float(row['rainfall_sum'].iloc[0] / row['n_rainfall'].iloc[0])
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. REBUILDS ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_rainfall_after_agri_equals_rainfall_first(tmp_path):
+    # A new sub-division and a correction arriving after the agriculture rows rebuild their partitions
+    late, early = str(tmp_path / 'late'), str(tmp_path / 'early')
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=late)
+    ingest_batches(agri=agri_batch(), store_dir=late)
+    report = ingest_batches(rainfall=rainfall_batch(('South Interior Karnataka', 2010, 900), ('Coastal Karnataka', 2010, 2500)), store_dir=late)
+    assert report['rebuilt_partitions'] == ['Karnataka 2010']
+    assert report['rainfall_rows'] == 2
+
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 2500), ('South Interior Karnataka', 2010, 900)), store_dir=early)
+    ingest_batches(agri=agri_batch(), store_dir=early)
+    assert_same_cube(late, early)
+
+def test_unchanged_rainfall_rebuilds_nothing(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), agri=agri_batch(), store_dir=store_dir)
+    version = read_manifest(store_dir)['version']
+    report = ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=store_dir)
+    assert report['rebuilt_partitions'] == [] and report['rainfall_rows'] == 0
+    assert read_manifest(store_dir)['version'] == version
+
+def test_correction_and_new_rows_in_one_call(tmp_path):
+    # The rebuilt partition must also hold the new rows, with the corrected rainfall for every district
+    store_dir = str(tmp_path / 'store')
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 1000)), agri=agri_batch(['Hassan']), store_dir=store_dir)
+    report = ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), agri=agri_batch(['Mysore']), store_dir=store_dir)
+    assert report['rebuilt_partitions'] == ['Karnataka 2010'] and report['rainfall_rows'] == 1
+    assert district_rainfall(store_dir, 'Hassan') == district_rainfall(store_dir, 'Mysore') == 3000
+
+    expected = str(tmp_path / 'expected')
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), agri=agri_batch(['Hassan', 'Mysore']), store_dir=expected)
+    assert_same_cube(store_dir, expected)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. PENDING ROWS ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_agri_waits_for_its_rainfall(tmp_path):
+    store_dir = str(tmp_path / 'store')
+    first = ingest_batches(agri=agri_batch(), store_dir=store_dir)
+    second = ingest_batches(agri=agri_batch(['Tumkur'], crop_year=2011), store_dir=store_dir)
+    assert first['stored_rows'] == second['stored_rows'] == 0
+    assert second['pending_agri_rows'] == 4
+    assert len(read_manifest(store_dir)['pending']) == 2  # one file per batch; earlier files are not rewritten
+
+    report = ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=store_dir)
+    assert report['stored_rows'] == 3 and report['pending_agri_rows'] == 1
+    manifest = read_manifest(store_dir)
+    assert len(manifest['pending']) == 1 and len(manifest['partitions']) == 1
+
+    expected = str(tmp_path / 'expected')
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), agri=agri_batch(), store_dir=expected)
+    assert_same_cube(store_dir, expected)
+
+@pytest.mark.parametrize('split', [False, True])
+def test_pending_rows_are_materialized_once(tmp_path, split):
+    store_dir = str(tmp_path / 'store')
+    ingest_batches(agri=agri_batch(), store_dir=store_dir)
+    rainfall = rainfall_batch(('Coastal Karnataka', 2010, 3000), ('South Interior Karnataka', 2010, 900))
+    if split:
+        ingest_batches(rainfall=rainfall.iloc[:1], store_dir=store_dir)
+        ingest_batches(rainfall=rainfall.iloc[1:], store_dir=store_dir)
+    else:
+        ingest_batches(rainfall=rainfall, store_dir=store_dir)
+    manifest = read_manifest(store_dir)
+    assert manifest['pending'] == []
+    assert sum(entry['rows'] for entry in manifest['partitions'].values()) == 3 * 2  # 3 rows x 2 sub-divisions
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. INTERRUPTED INGESTIONS ---
+# ---------------------------------------------------------------------------------------------------
+
+def fail_next_commit(monkeypatch):
+    # The next ingestion dies right before its manifest write, after every file has been written
+    commit_version = ingest.commit_version
+    def failing_commit(*args, **kwargs):
+        monkeypatch.setattr(ingest, 'commit_version', commit_version)
+        raise OSError("simulated crash")
+    monkeypatch.setattr(ingest, 'commit_version', failing_commit)
+
+def test_retried_correction_is_applied(tmp_path, monkeypatch):
+    store_dir = str(tmp_path / 'store')
+    ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 1000)), agri=agri_batch(['Hassan']), store_dir=store_dir)
+    fail_next_commit(monkeypatch)
+    with pytest.raises(OSError):
+        ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=store_dir)
+    assert district_rainfall(store_dir, 'Hassan') == 1000  # still the previous version
+
+    report = ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=store_dir)
+    assert report['rebuilt_partitions'] == ['Karnataka 2010'] and report['rainfall_rows'] == 1
+    assert district_rainfall(store_dir, 'Hassan') == 3000
+
+def test_retried_rainfall_completes_pending_rows(tmp_path, monkeypatch):
+    store_dir = str(tmp_path / 'store')
+    ingest_batches(agri=agri_batch(), store_dir=store_dir)
+    fail_next_commit(monkeypatch)
+    with pytest.raises(OSError):
+        ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=store_dir)
+    report = ingest_batches(rainfall=rainfall_batch(('Coastal Karnataka', 2010, 3000)), store_dir=store_dir)
+    assert report['stored_rows'] == 3 and report['pending_agri_rows'] == 0
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 5. SEEDING ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_seeded_store_matches_memory_cube(seeded_store, memory_cube):
+    cube = load_cube(seeded_store)
+    for name in ('district_table', 'crop_table', 'rainfall_table'):
+        assert_tables_equal(getattr(cube, name), getattr(memory_cube, name))
+    assert (cube.latest_year, cube.latest_yield_year) == (memory_cube.latest_year, memory_cube.latest_yield_year)
+
+def test_seeding_twice_is_refused(seeded_store, master_csv):
+    with pytest.raises(ValueError):
+        seed_store(master_csv, seeded_store)
@@ -0,0 +1,164 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import CROPS, STATES, YEARS
+from query_engine import (
+    CropClimateTrend, PolicyComparison, TrendSeries, compare_recent_avg_rainfall, downsample_chart,
+    get_max_min_district_production, get_single_crop_trend, get_top_m_crops, get_yield_and_rainfall_trend,
+    question_3, question_3_chart, question_4_chart,
+)
+
+# The cube-backed Q1-Q4 helpers against the row-masking functions app.py used before the cube,
+# which filtered the full master frame on every call.
+
+# --- 1. ROW-MASKING REFERENCES ---
+
+def masked_recent_avg_rainfall(df, state_list, n_years):
+    start_year = df['crop_year'].max() - n_years + 1
+    filtered_df = df[(df['state_name'].isin(state_list)) & (df['crop_year'] >= start_year)]
+    state_annual_rainfall = filtered_df.groupby(['state_name', 'crop_year'])['annual_rainfall_mm'].mean().reset_index()
+    return state_annual_rainfall.groupby('state_name')['annual_rainfall_mm'].mean().round(2).to_dict()
+
+def masked_top_m_crops(df, state_list, crop_type, n_years, M):
+    start_year = df['crop_year'].max() - n_years + 1
+    filtered_df = df[(df['state_name'].isin(state_list)) & (df['crop_type'] == crop_type) & (df['crop_year'] >= start_year)]
+    production_summary = filtered_df.groupby(['state_name', 'crop'])['production'].sum().reset_index()
+    return {state: production_summary[production_summary['state_name'] == state].sort_values(by='production', ascending=False).head(M)['crop'].tolist()
+            for state in state_list}
+
+def masked_max_min_district_production(df, state_x, state_y, crop_z):
+    # (the lowest producer is looked up in the producers' own index; the original raised KeyError there)
+    latest_year = df['crop_year'].max()
+    filtered_df = df[(df['crop_year'] == latest_year) & (df['crop'] == crop_z)]
+    district_summary = filtered_df.groupby(['state_name', 'district_name'])['production'].sum().reset_index()
+    df_x = district_summary[district_summary['state_name'] == state_x]
+    if df_x.empty:
+        max_district, max_production = 'N/A', 0.0
+    else:
+        max_row = df_x.loc[df_x['production'].idxmax()]
+        max_district, max_production = max_row['district_name'], max_row['production']
+    df_y = district_summary[district_summary['state_name'] == state_y]
+    if df_y.empty:
+        min_district, min_production = 'N/A', 0.0
+    else:
+        df_y_producers = df_y[df_y['production'] > 0]
+        min_row = df_y_producers.loc[df_y_producers['production'].idxmin()] if not df_y_producers.empty else df_y.loc[df_y['production'].idxmin()]
+        min_district, min_production = min_row['district_name'], min_row['production']
+    return {'latest_year': latest_year, state_x: {'district': max_district, 'production': max_production},
+            state_y: {'district': min_district, 'production': min_production}}
+
+def masked_trend(df, state_name, column, value, n_years):
+    # get_yield_and_rainfall_trend (column='crop_type') and get_single_crop_trend (column='crop'),
+    # with the full-table copy and yield recomputation they used to make on every call
+    df_with_yield = df[df['area'] > 0].copy()
+    df_with_yield['yield'] = df_with_yield['production'] / df_with_yield['area']
+    start_year = df_with_yield['crop_year'].max() - n_years + 1
+    filtered_df = df_with_yield[(df_with_yield['state_name'] == state_name) & (df_with_yield[column] == value) & (df_with_yield['crop_year'] >= start_year)]
+    if filtered_df.empty: return pd.DataFrame()
+    return filtered_df.groupby('crop_year').agg(average_yield=('yield', 'mean'), average_rainfall=('annual_rainfall_mm', 'mean')).reset_index()
+
+def assert_trends_equal(actual, expected):
+    if expected.empty:
+        assert actual.empty
+        return
+    assert list(actual['crop_year']) == list(expected['crop_year'])
+    for col in ('average_yield', 'average_rainfall'):
+        assert np.allclose(actual[col], expected[col], equal_nan=True)
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. Q1 / Q2 ---
+# ---------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('n_years', [1, 3, 10, 30])
+def test_question_1_matches_masking(memory_cube, raw_df, n_years):
+    states = sorted(STATES)
+    expected = masked_recent_avg_rainfall(raw_df, states, n_years)
+    actual = compare_recent_avg_rainfall(memory_cube, states, n_years)
+    assert actual.keys() == expected.keys()
+    assert all(math.isclose(actual[state], expected[state], abs_tol=1e-6) for state in states)
+    for crop_type in ('Cereal', 'Oilseed', 'Pulse', 'Commercial'):
+        assert get_top_m_crops(memory_cube, states, crop_type, n_years, 3) == masked_top_m_crops(raw_df, states, crop_type, n_years, 3)
+
+@pytest.mark.parametrize('crop', CROPS + ['Barley'])
+def test_question_2_matches_masking(memory_cube, raw_df, crop):
+    for state_x in STATES:
+        for state_y in STATES:
+            if state_x == state_y: continue
+            assert get_max_min_district_production(memory_cube, state_x, state_y, crop) == \
+                masked_max_min_district_production(raw_df, state_x, state_y, crop)
+
+def test_latest_yield_year_skips_uncropped_years(memory_cube):
+    # The last generated year has no cropped area, so Q3/Q4 windows end a year earlier than Q1/Q2
+    assert memory_cube.latest_year == YEARS[-1]
+    assert memory_cube.latest_yield_year == YEARS[-1] - 1
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. Q3 / Q4 TRENDS ---
+# ---------------------------------------------------------------------------------------------------
+
+@pytest.mark.parametrize('n_years', [1, 5, 10, 30])
+def test_questions_3_and_4_match_masking(memory_cube, raw_df, n_years):
+    for state_name in STATES:
+        for crop_type in ('Cereal', 'Oilseed', 'Vegetable', 'Fruit'):
+            assert_trends_equal(get_yield_and_rainfall_trend(memory_cube, state_name, crop_type, n_years),
+                                masked_trend(raw_df, state_name, 'crop_type', crop_type, n_years))
+        for crop in CROPS:
+            assert_trends_equal(get_single_crop_trend(memory_cube, state_name, crop, n_years),
+                                masked_trend(raw_df, state_name, 'crop', crop, n_years))
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 4. CHART DATA ---
+# ---------------------------------------------------------------------------------------------------
+
+def year_chart(n_rows, n_columns, seed=0):
+    rng = np.random.default_rng(seed)
+    chart = pd.DataFrame(rng.normal(size=(n_rows, n_columns)), index=pd.RangeIndex(1900, 1900 + n_rows, name='crop_year'))
+    chart.iloc[rng.integers(0, n_rows, size=n_rows // 10), 0] = np.nan
+    return chart
+
+@pytest.mark.parametrize('n_rows, n_columns, max_points', [(1000, 2, 240), (1000, 3, 240), (241, 3, 240), (5000, 3, 50), (1000, 40, 60)])
+def test_downsample_chart_is_bounded(n_rows, n_columns, max_points):
+    chart = year_chart(n_rows, n_columns)
+    sampled = downsample_chart(chart, max_points)
+    assert len(sampled) <= max_points
+    assert sampled.index.is_monotonic_increasing and sampled.index.is_unique
+    assert sampled.index[0] == chart.index[0] and sampled.index[-1] == chart.index[-1]
+    pd.testing.assert_frame_equal(sampled, chart.loc[sampled.index])
+    if 2 + 2 * n_columns <= max_points:
+        # Every column's extremes survive
+        for column in chart:
+            assert chart[column].idxmax() in sampled.index and chart[column].idxmin() in sampled.index
+
+def test_short_chart_is_untouched():
+    chart = year_chart(30, 3)
+    assert downsample_chart(chart) is chart
+
+def test_question_3_chart(memory_cube):
+    result = question_3(memory_cube, 'Gujarat', 'Cereal', 10)
+    chart = question_3_chart(result)
+    assert list(chart.index) == result.trend.years
+    assert list(chart['average_yield']) == result.trend.average_yield
+
+def crop_trend(label, years):
+    trend = TrendSeries(years=list(years), average_yield=[float(y - 2000) for y in years], average_rainfall=[float(y) for y in years])
+    # (the summary statistics are not charted)
+    return CropClimateTrend(state='Gujarat', label=label, n_years=10, trend=trend, correlation=np.nan, average_yield=np.nan, average_rainfall=np.nan)
+
+def test_question_4_chart_keeps_years_of_either_crop():
+    result = PolicyComparison(region='Gujarat', n_years=10, crop_a=crop_trend('Maize', [2001, 2002, 2004]), crop_b=crop_trend('Rice', [2002, 2003, 2004]))
+    chart = question_4_chart(result)
+    assert list(chart.index) == [2001, 2002, 2003, 2004]
+    assert list(chart.columns) == ['Maize', 'Rice', 'average_rainfall']
+    assert chart['Maize'].isna().tolist() == [False, False, True, False]
+    assert chart['Rice'].isna().tolist() == [True, False, False, False]
+    assert chart.loc[2004].tolist() == [4.0, 4.0, 2004.0]
+
+def test_question_4_chart_without_one_crop_is_empty():
+    result = PolicyComparison(region='Gujarat', n_years=10, crop_a=crop_trend('Maize', [2001]), crop_b=crop_trend('Rice', []))
+    assert question_4_chart(result).empty
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+import result_cache
+from query_engine import QUESTION_FUNCTIONS, question_3
+from result_cache import ResultCache, cached_question, warm_cache
+
+# LRU / TTL eviction, key normalization and dataset-version invalidation of the result cache.
+
+class Clock:
+    # Stands in for the time module inside result_cache
+    def __init__(self):
+        self.now = 0.0
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, 'time', clock)
+    return clock
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 1. EVICTION ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put('q3', {'n_years': 1}, 'a')
+    cache.put('q3', {'n_years': 2}, 'b')
+    assert cache.get('q3', {'n_years': 1}) == (True, 'a')  # 1 is now more recent than 2
+    cache.put('q3', {'n_years': 3}, 'c')
+    assert cache.get('q3', {'n_years': 2}) == (False, None)
+    assert cache.get('q3', {'n_years': 1}) == (True, 'a')
+    assert cache.get('q3', {'n_years': 3}) == (True, 'c')
+    assert cache.stats()['evictions'] == 1 and cache.stats()['entries'] == 2
+
+def test_expired_entry_is_recomputed(clock):
+    cache = ResultCache(ttl_seconds=60)
+    calls = []
+    compute = lambda: calls.append(1) or len(calls)
+    assert cache.get_or_compute('q1', {}, compute) == 1
+    clock.now = 60
+    assert cache.get_or_compute('q1', {}, compute) == 1
+    clock.now = 61
+    assert cache.get_or_compute('q1', {}, compute) == 2
+    assert cache.stats()['expirations'] == 1
+
+def test_no_ttl_never_expires(clock):
+    cache = ResultCache(ttl_seconds=None)
+    cache.put('q1', {}, 'a')
+    clock.now = 1e9
+    assert cache.get('q1', {}) == (True, 'a')
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 2. KEYS AND DATASET VERSIONS ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_equivalent_parameters_share_a_key():
+    cache = ResultCache()
+    cache.put('q3', {'state_name': ' Gujarat ', 'n_years': np.int64(10)}, 'a')
+    assert cache.get('q3', {'n_years': 10, 'state_name': 'Gujarat'}) == (True, 'a')
+    assert cache.get('q4', {'n_years': 10, 'state_name': 'Gujarat'}) == (False, None)
+
+def test_new_dataset_version_drops_every_entry():
+    cache = ResultCache()
+    cache.set_dataset_version('v1')
+    cache.put('q1', {}, 'a')
+    cache.set_dataset_version('v1')
+    assert cache.get('q1', {}) == (True, 'a')
+    cache.set_dataset_version('v2')
+    assert cache.get('q1', {}) == (False, None)
+    assert cache.stats()['invalidations'] == 1
+
+def test_answer_for_another_version_is_not_stored():
+    # A session still holding the old cube computes after the reload: its answer must not be served for v2
+    cache = ResultCache()
+    cache.set_dataset_version('v2')
+    assert cache.get_or_compute('q1', {}, lambda: 'old', dataset_version='v1') == 'old'
+    cache.put('q1', {}, 'old', dataset_version='v1')
+    assert cache.stats()['entries'] == 0
+    assert cache.get_or_compute('q1', {}, lambda: 'new', dataset_version='v2') == 'new'
+    assert cache.get('q1', {}) == (True, 'new')
+
+
+# ---------------------------------------------------------------------------------------------------
+# --- 3. QUESTION HELPERS ---
+# ---------------------------------------------------------------------------------------------------
+
+def test_cached_question_normalizes_before_computing(memory_cube):
+    cache = ResultCache()
+    result = cached_question(cache, memory_cube, 'q3', QUESTION_FUNCTIONS, state_name='Gujarat ', crop_type='Oilseed', n_years=10)
+    assert result == question_3(memory_cube, 'Gujarat', 'Oilseed', 10)
+    assert cached_question(cache, memory_cube, 'q3', QUESTION_FUNCTIONS, state_name='Gujarat', crop_type='Oilseed', n_years=10) is result
+
+def test_warm_cache(memory_cube):
+    cache = ResultCache()
+    warm_cache(cache, memory_cube, QUESTION_FUNCTIONS, {'q3': {'state_name': 'Gujarat', 'crop_type': 'Oilseed', 'n_years': 10}})
+    assert cache.get('q3', {'state_name': 'Gujarat', 'crop_type': 'Oilseed', 'n_years': 10})[0]